@@ -53,6 +53,11 @@ ADMIN_EMAIL = 'xok1611995@yandex.ru'
 BASE_URL = os.environ.get('BASE_URL', 'http://127.0.0.1:8000' if DEBUG else 'https://single-point-of-contact-570955226190.herokuapp.com')
 
 EMAIL_TIMEOUT = 10
+# Уведомления на ADMIN_EMAIL: immediate, hourly или daily. Сводки отправляет
+# процесс планировщика (scheduler в Procfile): без него они не уходят
+ADMIN_NOTIFICATION_FREQUENCY = os.environ.get('ADMIN_NOTIFICATION_FREQUENCY', 'immediate')
+# Сколько дней хранить уже отправленные события уведомлений
+NOTIFICATION_EVENT_RETENTION_DAYS = 30
 
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'knowledgebase:home'
@@ -71,12 +76,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'knowledgebase.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'knowledgebase.throttling.APIThrottleMiddleware',
+    'knowledgebase.middleware.ReplicaPinningMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'portal.middleware.UserProfileMiddleware',
+    'knowledgebase.middleware.RequestProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'knowledgebase.middleware.LimitedModeMiddleware',
@@ -88,8 +98,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'knowledgebase/templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Скомпилированные шаблоны переиспользуются между запросами
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -136,6 +152,61 @@ else:
         }
     }
 
+# Реплики только для чтения: DATABASE_REPLICA_URLS=postgres://...,postgres://...
+# Для локальной проверки подойдут две SQLite-базы: sqlite:////path/to/replica.sqlite3
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()
+]
+DATABASE_REPLICAS = []
+for replica_index, replica_url in enumerate(DATABASE_REPLICA_URLS, start=1):
+    replica_alias = f'replica_{replica_index}'
+    DATABASES[replica_alias] = dj_database_url.parse(
+        replica_url,
+        conn_max_age=600,
+        conn_health_checks=True,
+    )
+    DATABASES[replica_alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(replica_alias)
+
+DATABASE_ROUTERS = ['knowledgebase.db_router.PrimaryReplicaRouter']
+# Сколько секунд после записи пользователь читает только из основной базы
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get('DATABASE_REPLICA_PIN_SECONDS', '5'))
+# Реплика с большим отставанием исключается из ротации
+DATABASE_REPLICA_MAX_LAG_SECONDS = float(os.environ.get('DATABASE_REPLICA_MAX_LAG_SECONDS', '5'))
+DATABASE_REPLICA_CHECK_INTERVAL = 10
+
+# Поиск дубликатов заявок: минимальная доля совпавших MinHash-значений
+DUPLICATE_SIMILARITY_THRESHOLD = 0.5
+DUPLICATE_INDEX_REBUILD_SECONDS = 600
+
+# Подсказки статей: как часто каждый воркер сверяет версию индекса с базой, секунд
+SUGGEST_VERSION_TTL = 5
+
+# Общий кеш процессов: Redis, если задан REDIS_URL (нужен для троттлинга между воркерами)
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# Ограничение частоты (token bucket): '<число>/<s|min|hour|day>', по IP и по пользователю
+THROTTLE_RATES = {
+    'request_api_ip': os.environ.get('THROTTLE_REQUEST_API_IP', '300/min'),
+    'request_api_user': os.environ.get('THROTTLE_REQUEST_API_USER', '120/min'),
+    'comment_ip': os.environ.get('THROTTLE_COMMENT_IP', '60/min'),
+    'comment_user': os.environ.get('THROTTLE_COMMENT_USER', '20/min'),
+}
+# Число доверенных прокси перед приложением (для X-Forwarded-For)
+THROTTLE_NUM_PROXIES = int(os.environ.get('THROTTLE_NUM_PROXIES', '0'))
+
+# Публичные страницы базы знаний для анонимных пользователей: браузер всегда
+# перепроверяет страницу (дешевый ответ 304), общий прокси может хранить ее недолго
+KB_PUBLIC_CACHE_MAX_AGE = 0
+KB_PUBLIC_CACHE_SHARED_MAX_AGE = int(os.environ.get('KB_PUBLIC_CACHE_SHARED_MAX_AGE', '60'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -186,6 +257,8 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Файлы без ссылок из статей удаляются не раньше этого срока после последней загрузки
+MEDIA_BLOB_GRACE_SECONDS = 3600
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -217,4 +290,42 @@ LOGGING = {
         },
     },
 }
+
+# Время жизни закешированного профиля пользователя (роль, отдел)
+PROFILE_CACHE_TIMEOUT = 300
+
+# Периодические задачи: создаются командой run_scheduler, если их еще нет в базе,
+# дальше расписание редактируется в админке
+SCHEDULED_JOBS = [
+    {'name': 'Резервная копия базы', 'command': 'backup', 'schedule': '0 3 * * *'},
+    {'name': 'Сверка счетчиков назначений', 'command': 'reconcile_assignment_counters', 'schedule': '30 3 * * *'},
+    {'name': 'Пересчет статистики заявок', 'command': 'rollup_request_stats', 'schedule': '0 4 * * *'},
+    {'name': 'Напоминание о новых заявках', 'command': 'remind_stale_requests', 'schedule': '0 9 * * 1-5'},
+    {'name': 'Очистка истекших сессий', 'command': 'clearsessions', 'schedule': '@daily'},
+    {'name': 'Архивация закрытых заявок', 'command': 'archive_requests', 'schedule': '0 2 * * 0'},
+    {'name': 'Перерасчет тегов статей', 'command': 'retag_articles', 'schedule': '0 5 * * *'},
+    {'name': 'Почасовая сводка уведомлений', 'command': 'send_notification_digests',
+     'arguments': ['--frequency', 'hourly'], 'schedule': '@hourly'},
+    {'name': 'Ежедневная сводка уведомлений', 'command': 'send_notification_digests',
+     'arguments': ['--frequency', 'daily'], 'schedule': '0 8 * * *'},
+    {'name': 'Очистка медиафайлов без ссылок', 'command': 'cleanup_media_blobs', 'schedule': '30 5 * * *'},
+]
+# Аренда задачи узлом; пока задача выполняется, узел продлевает ее каждую треть срока,
+# после падения узла задачу подхватит другой
+SCHEDULER_LEASE_SECONDS = 300
+STALE_REQUEST_HOURS = 24
+# Закрытые заявки старше этого срока переносятся в архивные таблицы
+REQUEST_ARCHIVE_AFTER_DAYS = 180
+
+# Профилирование запросов сотрудников (X-Profile-Request: 1 или ?_profile=1)
+REQUEST_PROFILING_ENABLED = os.environ.get('REQUEST_PROFILING_ENABLED', 'False') == 'True'
+REQUEST_PROFILE_DIR = LOGS_DIR / 'profiles'
+REQUEST_PROFILE_KEEP = 100
+REQUEST_PROFILE_SAMPLE_INTERVAL = 0.005
+
+# Метрики Prometheus (/metrics): заголовок Authorization: Bearer <METRICS_TOKEN>;
+# без токена метрики доступны только при DEBUG
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 LIMITED_MODE = False
\ No newline at end of file
@@ -1,10 +1,12 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.contrib.auth import views as auth_views
 from django.contrib import admin
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.shortcuts import redirect
+from knowledgebase.media_storage import BLOB_DIR, BLOB_PATH_RE
+from knowledgebase.views import healthz, media_blob, metrics_view, readyz
 
 def redirect_to_login(request):
     # При первом заходе — сразу на страницу входа
@@ -16,6 +18,11 @@ urlpatterns = [
 
     path('admin/', admin.site.urls),
 
+    # Мониторинг
+    path('metrics', metrics_view, name='metrics'),
+    path('healthz', healthz, name='healthz'),
+    path('readyz', readyz, name='readyz'),
+
     # Портал самообслуживания
     path('portal/', include(('portal.urls', 'portal'), namespace='portal')),
 
@@ -39,13 +46,17 @@ urlpatterns = [
     path('accounts/reset/done/', auth_views.PasswordResetCompleteView.as_view(), name='password_reset_complete'),
 ]
 
+# Медиа статей по хешу содержимого: неизменяемые URL с долгим кешированием
+urlpatterns += [
+    re_path(rf'^media/{BLOB_DIR}/(?P<path>{BLOB_PATH_RE})$', media_blob, name='media-blob'),
+]
+
 # Раздача статических и медиа файлов
 if settings.DEBUG:
     urlpatterns += staticfiles_urlpatterns()
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 else:
     from django.views.static import serve
-    from django.urls import re_path
     urlpatterns += [
         re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
     ]
@@ -0,0 +1,26 @@
+"""
+Настройки gunicorn (файл подхватывается из текущего каталога автоматически).
+
+Метрики Prometheus собираются со всех воркеров: каждый процесс пишет значения
+в каталог PROMETHEUS_MULTIPROC_DIR, /metrics любого воркера суммирует их.
+Каталог очищается при старте мастера, файлы завершившихся воркеров
+помечаются в child_exit.
+"""
+import os
+import shutil
+import tempfile
+
+# Переменная должна быть задана до импорта приложения воркерами
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'prometheus-multiproc'))
+
+
+def on_starting(server):
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    # Значения прошлого запуска мастера не должны попасть в суммы
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,10 +1,13 @@
 from django.contrib import admin
-from .models import Article, Request, Comment
+from .models import (
+    Article, ArchivedRequest, MediaBlob, Request, Comment, NotificationEvent, NotificationPreference,
+    RequestStatusEvent, ScheduledJob, Tag,
+)
 
 
 @admin.register(Article)
 class ArticleAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'pub_date', 'has_image', 'has_video', 'has_audio')
+    list_display = ('title', 'author', 'pub_date', 'comment_count', 'last_activity_at', 'has_image', 'has_video', 'has_audio')
     search_fields = ('title', 'content', 'author__username', 'author__email')
     list_filter = ('pub_date', 'author')
     ordering = ('-pub_date',)
@@ -35,16 +38,37 @@ class ArticleAdmin(admin.ModelAdmin):
     has_audio.short_description = 'Аудио'
 
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'article_count')
+    search_fields = ('name',)
+    ordering = ('-article_count', 'name')
+    readonly_fields = ('article_count',)
+
+
+class RequestStatusEventInline(admin.TabularInline):
+    model = RequestStatusEvent
+    extra = 0
+    can_delete = False
+    fields = ('changed_at', 'from_status', 'to_status', 'changed_by', 'seconds_in_previous_status', 'is_first_response')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Request)
 class RequestAdmin(admin.ModelAdmin):
-    list_display = ('title', 'created_by', 'category', 'status', 'created_at', 'updated_at', 'comment_count')
+    list_display = ('title', 'created_by', 'assignee', 'category', 'status', 'created_at', 'updated_at', 'comment_count', 'last_activity_at')
     list_filter = ('status', 'category', 'created_at', 'created_by')
     search_fields = ('title', 'description', 'created_by__username', 'created_by__email')
     ordering = ('-created_at',)
     readonly_fields = ('created_at', 'updated_at')
+    raw_id_fields = ('assignee', 'duplicate_of')
+    inlines = [RequestStatusEventInline]
     fieldsets = (
         ('Основная информация', {
-            'fields': ('title', 'description', 'category', 'status', 'created_by')
+            'fields': ('title', 'description', 'category', 'status', 'created_by', 'assignee', 'duplicate_of')
         }),
         ('Даты', {
             'fields': ('created_at', 'updated_at'),
@@ -52,9 +76,16 @@ class RequestAdmin(admin.ModelAdmin):
         }),
     )
 
-    def comment_count(self, obj):
-        return obj.comments.count()
-    comment_count.short_description = 'Комментариев'
+    def save_model(self, request, obj, form, change):
+        if change and 'status' in form.changed_data:
+            from .utils import apply_status_transition
+            new_status = obj.status
+            obj.status = form.initial['status']
+            apply_status_transition(obj, new_status, request.user)
+            if set(form.changed_data) - {'status'}:
+                super().save_model(request, obj, form, change)
+        else:
+            super().save_model(request, obj, form, change)
 
 
 @admin.register(Comment)
@@ -68,3 +99,97 @@ class CommentAdmin(admin.ModelAdmin):
     def text_preview(self, obj):
         return obj.text[:50] + '...' if len(obj.text) > 50 else obj.text
     text_preview.short_description = 'Текст'
+
+
+@admin.register(ScheduledJob)
+class ScheduledJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'name', 'command', 'schedule', 'enabled', 'next_run_at', 'last_run_at', 'last_status',
+        'last_duration', 'average_duration', 'run_count', 'failure_count', 'locked_by',
+    )
+    list_filter = ('enabled', 'last_status')
+    search_fields = ('name', 'command')
+    readonly_fields = (
+        'last_run_at', 'last_status', 'last_duration', 'last_error', 'run_count', 'failure_count',
+        'total_duration', 'locked_by', 'locked_until',
+    )
+    actions = ['run_now']
+
+    def average_duration(self, obj):
+        value = obj.average_duration
+        return round(value, 2) if value is not None else None
+    average_duration.short_description = 'Средняя длительность, с'
+
+    def save_model(self, request, obj, form, change):
+        if 'schedule' in form.changed_data or obj.next_run_at is None:
+            from .scheduler import next_run
+            obj.next_run_at = next_run(obj.schedule)
+        super().save_model(request, obj, form, change)
+
+    def run_now(self, request, queryset):
+        from django.utils import timezone
+        updated = queryset.update(next_run_at=timezone.now())
+        self.message_user(request, f'Задач поставлено на ближайший запуск: {updated}')
+    run_now.short_description = 'Запустить при следующем опросе планировщика'
+
+
+@admin.register(ArchivedRequest)
+class ArchivedRequestAdmin(admin.ModelAdmin):
+    list_display = ('id', 'title', 'status', 'category', 'created_by', 'created_at', 'archived_at')
+    list_filter = ('status', 'category', 'archived_at')
+    search_fields = ('title', 'description')
+    actions = ['restore']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def restore(self, request, queryset):
+        from .archive import restore_request
+        restored = 0
+        for pk in queryset.values_list('pk', flat=True):
+            restore_request(pk)
+            restored += 1
+        self.message_user(request, f'Восстановлено заявок: {restored}')
+    restore.short_description = 'Вернуть в рабочую таблицу'
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'ref_count', 'created_at', 'touched_at')
+    search_fields = ('name',)
+    ordering = ('-created_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # Файлы без ссылок удаляет команда cleanup_media_blobs
+        return False
+
+
+@admin.register(NotificationPreference)
+class NotificationPreferenceAdmin(admin.ModelAdmin):
+    list_display = ('user', 'frequency')
+    list_filter = ('frequency',)
+    search_fields = ('user__username', 'user__email')
+    raw_id_fields = ('user',)
+
+
+@admin.register(NotificationEvent)
+class NotificationEventAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'subject', 'frequency', 'created_at', 'sent_at')
+    list_filter = ('frequency', 'sent_at')
+    search_fields = ('recipient', 'subject')
+    ordering = ('-created_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
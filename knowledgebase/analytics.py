@@ -0,0 +1,153 @@
+"""
+Предагрегированная статистика заявок.
+
+``RequestDailyStat`` поддерживается сигналами при создании, изменении статуса
+или категории и удалении заявки; команда ``rollup_request_stats`` пересчитывает
+из исходных данных последние дни и дни создания заявок, статус которых менялся
+за это время. Временные ряды за длинные периоды
+собираются из дневных строк векторно через NumPy.
+"""
+import datetime
+
+import numpy as np
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ArchivedRequest, Request, RequestDailyStat, RequestStatusEvent
+
+
+GROUP_FIELDS = {
+    'category': 'category',
+    'status': 'status',
+    'department': 'department_id',
+}
+INTERVALS = ('day', 'week', 'month')
+
+
+def creator_department_id(user_id):
+    if not user_id:
+        return None
+    from portal.models import UserProfile
+    return UserProfile.objects.filter(user_id=user_id).values_list('department_id', flat=True).first()
+
+
+def rollup_key(request_obj, department_id):
+    return {
+        'date': timezone.localdate(request_obj.created_at),
+        'category': request_obj.category,
+        'status': request_obj.status,
+        'department_id': department_id,
+    }
+
+
+def bump(key, delta):
+    """Атомарно изменяет счетчик дневной строки, создавая ее при необходимости"""
+    lookup = dict(key)
+    if lookup['department_id'] is None:
+        del lookup['department_id']
+        lookup['department__isnull'] = True
+    updated = RequestDailyStat.objects.filter(**lookup).update(count=F('count') + delta)
+    if updated or delta <= 0:
+        return
+    try:
+        with transaction.atomic():
+            RequestDailyStat.objects.create(count=delta, **key)
+    except IntegrityError:
+        RequestDailyStat.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def rebuild_range(start, end):
+    """Пересчитывает дневные строки за [start, end] по рабочей и архивной таблицам заявок"""
+    from portal.models import UserProfile
+
+    tz = timezone.get_current_timezone()
+    start_dt = timezone.make_aware(datetime.datetime.combine(start, datetime.time.min), tz)
+    end_dt = timezone.make_aware(datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min), tz)
+    rows = []
+    # Перенесенные в архив заявки по-прежнему входят в статистику
+    for model in (Request, ArchivedRequest):
+        rows.extend(
+            model.objects.filter(created_at__gte=start_dt, created_at__lt=end_dt)
+            .annotate(day=TruncDate('created_at', tzinfo=tz))
+            .values('day', 'category', 'status', 'created_by_id')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+    departments = dict(
+        UserProfile.objects.filter(user_id__in={row['created_by_id'] for row in rows if row['created_by_id']})
+        .values_list('user_id', 'department_id')
+    )
+    buckets = {}
+    for row in rows:
+        key = (row['day'], row['category'], row['status'], departments.get(row['created_by_id']))
+        buckets[key] = buckets.get(key, 0) + row['total']
+
+    with transaction.atomic():
+        RequestDailyStat.objects.filter(date__gte=start, date__lte=end).delete()
+        RequestDailyStat.objects.bulk_create([
+            RequestDailyStat(date=day, category=category, status=status, department_id=department_id, count=total)
+            for (day, category, status, department_id), total in buckets.items()
+        ], batch_size=1000)
+    return len(buckets)
+
+
+def touched_days(since):
+    """Дни создания заявок (рабочих и архивных), статус которых менялся начиная с since"""
+    tz = timezone.get_current_timezone()
+    request_ids = RequestStatusEvent.objects.filter(changed_at__gte=since).values('request_id')
+    days = set()
+    for model in (Request, ArchivedRequest):
+        days.update(
+            model.objects.filter(pk__in=request_ids)
+            .annotate(day=TruncDate('created_at', tzinfo=tz))
+            .values_list('day', flat=True)
+            .distinct()
+            .order_by()
+        )
+    return days
+
+
+def time_series(start, end, group_by=None, interval='day', filters=None):
+    """
+    Временной ряд по дневным строкам: {'labels': [...], 'series': {группа: [...]}}.
+    Для interval='week'/'month' дни сворачиваются через np.add.reduceat.
+    """
+    group_field = GROUP_FIELDS.get(group_by)
+    stats = RequestDailyStat.objects.filter(date__gte=start, date__lte=end, **(filters or {}))
+    values = ['date', group_field] if group_field else ['date']
+    rows = list(stats.values_list(*values).annotate(total=Sum('count')).order_by())
+
+    days = (end - start).days + 1
+    group_keys = sorted({row[1] for row in rows if group_field}, key=lambda value: (value is None, str(value)))
+    if not group_field:
+        group_keys = ['total']
+    group_index = {key: position for position, key in enumerate(group_keys)}
+
+    matrix = np.zeros((len(group_keys), days), dtype=np.int64)
+    if rows:
+        day_offsets = np.fromiter(((row[0] - start).days for row in rows), dtype=np.int64, count=len(rows))
+        groups = np.fromiter(
+            (group_index[row[1]] if group_field else 0 for row in rows), dtype=np.int64, count=len(rows)
+        )
+        totals = np.fromiter((row[-1] for row in rows), dtype=np.int64, count=len(rows))
+        np.add.at(matrix, (groups, day_offsets), totals)
+
+    dates = [start + datetime.timedelta(days=offset) for offset in range(days)]
+    if interval == 'week':
+        boundaries = [offset for offset, day in enumerate(dates) if offset == 0 or day.weekday() == 0]
+    elif interval == 'month':
+        boundaries = [offset for offset, day in enumerate(dates) if offset == 0 or day.day == 1]
+    else:
+        boundaries = list(range(days))
+    if days and boundaries != list(range(days)):
+        matrix = np.add.reduceat(matrix, boundaries, axis=1)
+
+    return {
+        'labels': [dates[offset].isoformat() for offset in boundaries] if days else [],
+        'series': {
+            str(key) if key is not None else 'none': matrix[position].tolist()
+            for position, key in enumerate(group_keys)
+        },
+    }
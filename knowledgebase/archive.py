@@ -0,0 +1,103 @@
+"""
+Перенос закрытых заявок в архивные таблицы.
+
+Заявки в статусах «Завершена» и «Отменена», не менявшие статус дольше порога,
+переносятся пачками: каждая пачка копируется в ``ArchivedRequest`` и
+``ArchivedComment`` и удаляется из рабочих таблиц в одной транзакции. id
+сохраняются, поэтому ссылки на заявку и история статусов остаются
+действительными. Пока идет перенос, сигналы удаления не трогают дневную
+статистику и счетчики — заявка не исчезает, а меняет таблицу.
+"""
+import datetime
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.utils import timezone
+
+from .duplicates import text_signature
+from .models import ArchivedComment, ArchivedRequest, Comment, Request
+
+
+CLOSED_STATUSES = ('Completed', 'Cancelled')
+
+REQUEST_FIELDS = [
+    'id', 'title', 'description', 'category', 'status', 'created_at', 'updated_at',
+    'created_by_id', 'assignee_id', 'duplicate_of_id', 'comment_count', 'last_activity_at',
+    'status_changed_at', 'first_response_at', 'version',
+]
+COMMENT_FIELDS = ['id', 'request_id', 'user_id', 'text', 'created_at']
+
+_moving = ContextVar('request_archive_moving', default=False)
+
+
+def is_moving():
+    return _moving.get()
+
+
+@contextmanager
+def _moving_rows():
+    token = _moving.set(True)
+    try:
+        yield
+    finally:
+        _moving.reset(token)
+
+
+def archivable_requests(older_than_days):
+    cutoff = timezone.now() - datetime.timedelta(days=older_than_days)
+    return (
+        Request.objects.filter(status__in=CLOSED_STATUSES, status_changed_at__lt=cutoff)
+        # Заявка, на которую ссылаются рабочие дубликаты, остается в рабочей таблице
+        .filter(duplicates__isnull=True)
+        .order_by('id')
+    )
+
+
+def archive_batch(ids):
+    """Переносит заявки ids с комментариями в архив; возвращает число перенесенных"""
+    with transaction.atomic(), _moving_rows():
+        rows = list(
+            Request.objects.select_for_update()
+            .filter(pk__in=ids, status__in=CLOSED_STATUSES)
+            .values(*REQUEST_FIELDS)
+        )
+        if not rows:
+            return 0
+        moved_ids = [row['id'] for row in rows]
+        ArchivedRequest.objects.bulk_create([ArchivedRequest(**row) for row in rows])
+        ArchivedComment.objects.bulk_create(
+            [ArchivedComment(**row) for row in Comment.objects.filter(request_id__in=moved_ids).values(*COMMENT_FIELDS)],
+            batch_size=1000,
+        )
+        Comment.objects.filter(request_id__in=moved_ids).delete()
+        Request.objects.filter(pk__in=moved_ids).delete()
+    return len(moved_ids)
+
+
+def archive_requests(older_than_days, batch_size=500, limit=None):
+    """Переносит подходящие заявки пачками по batch_size в отдельных транзакциях"""
+    ids = list(archivable_requests(older_than_days).values_list('id', flat=True)[:limit])
+    moved = 0
+    for start in range(0, len(ids), batch_size):
+        moved += archive_batch(ids[start:start + batch_size])
+    return moved
+
+
+def restore_request(request_id):
+    """Возвращает заявку с комментариями из архива в рабочие таблицы"""
+    with transaction.atomic(), _moving_rows():
+        archived = ArchivedRequest.objects.select_for_update().get(pk=request_id)
+        values = {field: getattr(archived, field) for field in REQUEST_FIELDS}
+        if values['duplicate_of_id'] and not Request.objects.filter(pk=values['duplicate_of_id']).exists():
+            values['duplicate_of_id'] = None
+        restored = Request(**values)
+        restored.text_signature = text_signature(restored.title, restored.description)
+        # bulk_create не вызывает сигналы: заявка уже учтена в статистике
+        Request.objects.bulk_create([restored])
+        Comment.objects.bulk_create([
+            Comment(**{field: getattr(comment, field) for field in COMMENT_FIELDS})
+            for comment in archived.comments.all()
+        ], batch_size=1000)
+        archived.delete()
+    return Request.objects.get(pk=request_id)
@@ -0,0 +1,182 @@
+"""
+Массовые операции над заявками: смена статуса и удаление.
+
+Каждая операция выполняется в одной транзакции: строки блокируются одним
+SELECT, изменяются одним ``UPDATE ... WHERE id IN`` (или ``DELETE``), события
+истории статусов пишутся одним ``bulk_create``. Дневная статистика и счетчики
+открытых заявок исполнителей пересчитываются сгруппированными дельтами, а не
+сигналами по каждой строке. Результат — исход для каждого переданного id.
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import analytics
+from .models import Comment, Request, RequestStatusEvent
+from .utils import OPEN_STATUSES
+
+
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+DELETED = 'deleted'
+NOT_FOUND = 'not_found'
+
+MAX_BULK_IDS = 1000
+
+ROW_FIELDS = [
+    'id', 'title', 'category', 'status', 'created_at', 'status_changed_at',
+    'first_response_at', 'created_by_id', 'assignee_id',
+]
+
+_running = ContextVar('request_bulk_running', default=False)
+
+
+def in_progress():
+    """Идет массовая операция: построчные сигналы не должны править счетчики"""
+    return _running.get()
+
+
+@contextmanager
+def _bulk_rows():
+    token = _running.set(True)
+    try:
+        yield
+    finally:
+        _running.reset(token)
+
+
+def parse_ids(values):
+    """Список уникальных id из строк формы/JSON; ValueError при мусоре или превышении лимита"""
+    ids = list(dict.fromkeys(int(value) for value in values))
+    if not ids:
+        raise ValueError('Не выбрано ни одной заявки')
+    if len(ids) > MAX_BULK_IDS:
+        raise ValueError(f'За один раз можно обработать не более {MAX_BULK_IDS} заявок')
+    return ids
+
+
+def _outcomes(ids, results):
+    return [{'id': request_id, 'result': results.get(request_id, NOT_FOUND)} for request_id in ids]
+
+
+def _department_ids(rows):
+    from portal.models import UserProfile
+    creator_ids = {row['created_by_id'] for row in rows if row['created_by_id']}
+    return dict(
+        UserProfile.objects.filter(user_id__in=creator_ids).values_list('user_id', 'department_id')
+    )
+
+
+def _rollup_key(row, department_ids, status):
+    return {
+        'date': timezone.localdate(row['created_at']),
+        'category': row['category'],
+        'status': status,
+        'department_id': department_ids.get(row['created_by_id']),
+    }
+
+
+def _apply_rollup(deltas):
+    for key, delta in deltas.items():
+        if delta:
+            analytics.bump(dict(zip(('date', 'category', 'status', 'department_id'), key)), delta)
+
+
+def _apply_open_tickets(deltas):
+    """Одна UPDATE на каждое значение дельты, а не на каждую заявку"""
+    from portal.models import UserProfile
+    users_by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            users_by_delta[delta].append(user_id)
+    for delta, user_ids in users_by_delta.items():
+        UserProfile.objects.filter(user_id__in=user_ids).update(
+            open_ticket_count=Greatest(F('open_ticket_count') + delta, Value(0)),
+        )
+
+
+def bulk_change_status(ids, new_status, user=None):
+    """
+    Меняет статус заявок ids на new_status.
+    Возвращает (исходы по каждому id, измененные строки со старым статусом).
+    """
+    if new_status not in dict(Request.STATUS_CHOICES):
+        raise ValueError('Неверный статус')
+
+    now = timezone.now()
+    changed_by = user if user is not None and user.is_authenticated else None
+    with transaction.atomic():
+        rows = list(Request.objects.select_for_update().filter(pk__in=ids).values(*ROW_FIELDS))
+        results = {row['id']: UNCHANGED for row in rows}
+        changed = [row for row in rows if row['status'] != new_status]
+        if not changed:
+            return _outcomes(ids, results), []
+
+        RequestStatusEvent.objects.bulk_create([
+            RequestStatusEvent(
+                request_id=row['id'],
+                from_status=row['status'],
+                to_status=new_status,
+                category=row['category'],
+                changed_by=changed_by,
+                changed_at=now,
+                seconds_in_previous_status=max(int((now - row['status_changed_at']).total_seconds()), 0),
+                seconds_since_created=max(int((now - row['created_at']).total_seconds()), 0),
+                is_first_response=row['status'] == 'New' and row['first_response_at'] is None,
+            )
+            for row in changed
+        ])
+        Request.objects.filter(pk__in=[row['id'] for row in changed]).update(
+            status=new_status,
+            status_changed_at=now,
+            updated_at=now,
+            version=F('version') + 1,
+            first_response_at=Case(
+                When(status='New', first_response_at__isnull=True, then=Value(now)),
+                default=F('first_response_at'),
+            ),
+        )
+
+        department_ids = _department_ids(changed)
+        rollup = Counter()
+        open_tickets = Counter()
+        now_open = new_status in OPEN_STATUSES
+        for row in changed:
+            results[row['id']] = UPDATED
+            rollup[tuple(_rollup_key(row, department_ids, row['status']).values())] -= 1
+            rollup[tuple(_rollup_key(row, department_ids, new_status).values())] += 1
+            was_open = row['status'] in OPEN_STATUSES
+            if row['assignee_id'] and was_open != now_open:
+                open_tickets[row['assignee_id']] += 1 if now_open else -1
+        _apply_rollup(rollup)
+        _apply_open_tickets(open_tickets)
+    return _outcomes(ids, results), changed
+
+
+def bulk_delete(ids):
+    """Удаляет заявки ids вместе с комментариями и историей статусов; возвращает исходы по каждому id"""
+    with transaction.atomic(), _bulk_rows():
+        rows = list(Request.objects.select_for_update().filter(pk__in=ids).values(*ROW_FIELDS))
+        if not rows:
+            return _outcomes(ids, {})
+        deleted_ids = [row['id'] for row in rows]
+
+        department_ids = _department_ids(rows)
+        rollup = Counter()
+        open_tickets = Counter()
+        for row in rows:
+            rollup[tuple(_rollup_key(row, department_ids, row['status']).values())] -= 1
+            if row['assignee_id'] and row['status'] in OPEN_STATUSES:
+                open_tickets[row['assignee_id']] -= 1
+
+        RequestStatusEvent.objects.filter(request_id__in=deleted_ids).delete()
+        Comment.objects.filter(request_id__in=deleted_ids).delete()
+        Request.objects.filter(pk__in=deleted_ids).delete()
+        _apply_rollup(rollup)
+        _apply_open_tickets(open_tickets)
+    return _outcomes(ids, {request_id: DELETED for request_id in deleted_ids})
@@ -0,0 +1,69 @@
+"""
+Оптимистическая блокировка записей по номеру версии.
+
+Форма или клиент API запоминает версию прочитанной записи и возвращает ее
+при сохранении. Запись обновляется одним ``UPDATE ... WHERE id = ? AND
+version = ?`` только по измененным полям; если за это время запись успел
+изменить кто-то другой, строка не обновится и будет выброшено
+``VersionConflict`` — без блокировок строк на время редактирования.
+"""
+from django.db import models, router, transaction
+
+
+class VersionConflict(Exception):
+    """Запись изменена другим пользователем после того, как ее прочитали"""
+
+    def __init__(self, instance, expected_version):
+        self.instance = instance
+        self.expected_version = expected_version
+        super().__init__(
+            f'{instance._meta.verbose_name} #{instance.pk} уже изменена '
+            f'(ожидалась версия {expected_version})'
+        )
+
+    def current(self):
+        """Актуальное состояние записи из базы (None, если ее удалили)"""
+        return type(self.instance)._default_manager.filter(pk=self.instance.pk).first()
+
+
+class VersionedModel(models.Model):
+    version = models.PositiveIntegerField(default=1, editable=False, verbose_name='Версия')
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # Полное сохранение (админка, формы без проверки версии) тоже меняет версию,
+        # чтобы открытые у других пользователей формы увидели конфликт
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            self.version += 1
+        super().save(*args, **kwargs)
+
+    def save_versioned(self, update_fields, expected_version=None):
+        """
+        Сохраняет только update_fields, если версия в базе равна expected_version
+        (по умолчанию — версии, с которой запись была прочитана), и увеличивает ее.
+        """
+        expected = self.version if expected_version is None else int(expected_version)
+        self.version = expected + 1
+        self._expected_version = expected
+        try:
+            # Отдельная точка сохранения: конфликт не портит внешнюю транзакцию
+            with transaction.atomic(using=router.db_for_write(type(self), instance=self)):
+                self.save(update_fields=[*update_fields, 'version'])
+        except VersionConflict:
+            self.version = expected
+            raise
+        finally:
+            del self._expected_version
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = getattr(self, '_expected_version', None)
+        if expected is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        updated = super()._do_update(
+            base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update,
+        )
+        if not updated:
+            raise VersionConflict(self, expected)
+        return updated
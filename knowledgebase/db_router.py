@@ -0,0 +1,151 @@
+"""
+Маршрутизация запросов к БД между основной базой и репликами.
+
+Чтение уходит на реплику только внутри безопасных GET-представлений,
+помеченных декоратором ``replica_reads``, или в блоке ``use_replica()``
+(отчёты, management-команды). Всё остальное, включая любые записи,
+обслуживает ``default``.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE_NAME = 'db_pin'
+
+
+class RoutingState:
+    """Состояние маршрутизации в рамках одного HTTP-запроса или блока кода"""
+
+    __slots__ = ('replica_ok', 'pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.replica_ok = False
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+# alias -> (время проверки, реплика исправна)
+_replica_health = {}
+
+
+def get_state():
+    return _state.get()
+
+
+def begin_request(pinned=False):
+    """Начинает новый контекст маршрутизации, возвращает токен для сброса"""
+    return _state.set(RoutingState(pinned=pinned))
+
+
+def end_request(token):
+    _state.reset(token)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def replica_lag(alias):
+    """
+    Отставание реплики в секундах (0 для СУБД без физической репликации).
+    Если реплика применила весь полученный WAL, она не отстает: время последней
+    примененной транзакции при простое основной базы растет без ограничений.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+        )
+        return float(cursor.fetchone()[0])
+
+
+def replica_is_healthy(alias):
+    """Проверка отставания с кешированием результата на DATABASE_REPLICA_CHECK_INTERVAL секунд"""
+    interval = getattr(settings, 'DATABASE_REPLICA_CHECK_INTERVAL', 10)
+    now = time.monotonic()
+    cached = _replica_health.get(alias)
+    if cached and now - cached[0] < interval:
+        return cached[1]
+
+    max_lag = getattr(settings, 'DATABASE_REPLICA_MAX_LAG_SECONDS', 5)
+    try:
+        healthy = replica_lag(alias) <= max_lag
+    except Exception:
+        healthy = False
+    _replica_health[alias] = (now, healthy)
+    return healthy
+
+
+def reset_replica_health():
+    _replica_health.clear()
+
+
+def choose_replica():
+    """Случайная исправная реплика или None, если таких нет"""
+    candidates = [alias for alias in replica_aliases() if replica_is_healthy(alias)]
+    if not candidates:
+        return None
+    return random.choice(candidates)
+
+
+class PrimaryReplicaRouter:
+    """Роутер: записи всегда в default, чтение — на реплику, если это разрешено контекстом"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica_ok or state.pinned or state.wrote:
+            return None
+        return choose_replica()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # После записи дочитываем из основной базы до конца запроса
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+def replica_reads(view_func):
+    """Разрешает чтение с реплики для безопасных запросов незакреплённого пользователя"""
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        state = _state.get()
+        if state is None or request.method not in SAFE_METHODS:
+            return view_func(request, *args, **kwargs)
+        previous = state.replica_ok
+        state.replica_ok = True
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            state.replica_ok = previous
+    return _wrapped
+
+
+@contextmanager
+def use_replica():
+    """Блок кода (отчёты, выгрузки), читающий с реплики"""
+    token = _state.set(RoutingState())
+    _state.get().replica_ok = True
+    try:
+        yield
+    finally:
+        _state.reset(token)
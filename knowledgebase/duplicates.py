@@ -0,0 +1,173 @@
+"""
+Поиск дубликатов заявок по MinHash-сигнатурам названия и описания.
+
+Сигнатура считается при сохранении заявки и хранится в ``Request.text_signature``.
+Индекс открытых заявок живёт в памяти процесса и догружает изменения
+по ``updated_at``, поэтому поиск — это векторное сравнение NumPy без похода
+по всей таблице.
+"""
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+
+SIGNATURE_SIZE = 64
+OPEN_STATUSES = ('New', 'In Progress')
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20240611)
+_HASH_A = _rng.randint(1, _MERSENNE_PRIME, size=SIGNATURE_SIZE).astype(np.uint64)
+_HASH_B = _rng.randint(0, _MERSENNE_PRIME, size=SIGNATURE_SIZE).astype(np.uint64)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _shingles(text):
+    """Слова и пары соседних слов — устойчивы к перестановкам и опечаткам в одном слове"""
+    words = [word for word in _TOKEN_RE.findall(text.lower()) if len(word) > 2]
+    shingles = set(words)
+    shingles.update(f'{a} {b}' for a, b in zip(words, words[1:]))
+    return shingles
+
+
+def text_signature(title, description):
+    """MinHash-сигнатура текста заявки в виде bytes (SIGNATURE_SIZE x uint32)"""
+    shingles = _shingles(f'{title} {description}')
+    if not shingles:
+        return None
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    permuted = (_HASH_A[:, None] * hashes[None, :] + _HASH_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1).astype(np.uint32).tobytes()
+
+
+def _to_array(signature):
+    return np.frombuffer(bytes(signature), dtype=np.uint32)
+
+
+class DuplicateIndex:
+    """Матрица сигнатур открытых заявок с инкрементальной догрузкой изменений"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._ids = np.empty(0, dtype=np.int64)
+        self._signatures = np.empty((0, SIGNATURE_SIZE), dtype=np.uint32)
+        self._positions = {}
+        self._watermark = None
+        self._built_at = None
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def _rebuild(self):
+        from .models import Request
+
+        started_at = timezone.now()
+        rows = list(
+            Request.objects.filter(status__in=OPEN_STATUSES, text_signature__isnull=False)
+            .values_list('id', 'text_signature')
+            .iterator(chunk_size=5000)
+        )
+        self._ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        self._signatures = np.empty((len(rows), SIGNATURE_SIZE), dtype=np.uint32)
+        for position, row in enumerate(rows):
+            self._signatures[position] = _to_array(row[1])
+        self._positions = {int(request_id): position for position, request_id in enumerate(self._ids)}
+        self._watermark = started_at
+        self._built_at = time.monotonic()
+
+    def _apply_changes(self):
+        from .models import Request
+
+        changes = Request.objects.filter(updated_at__gte=self._watermark)
+        appended_ids, appended_signatures = [], []
+        for request_id, signature, status, updated_at in changes.values_list(
+            'id', 'text_signature', 'status', 'updated_at'
+        ):
+            position = self._positions.get(request_id)
+            is_open = status in OPEN_STATUSES and signature is not None
+            if position is not None:
+                if is_open:
+                    self._signatures[position] = _to_array(signature)
+                else:
+                    # Закрытые заявки помечаются как удалённые до следующей пересборки
+                    self._ids[position] = -1
+                    del self._positions[request_id]
+            elif is_open:
+                appended_ids.append(request_id)
+                appended_signatures.append(_to_array(signature))
+            if updated_at > self._watermark:
+                self._watermark = updated_at
+
+        if appended_ids:
+            start = len(self._ids)
+            self._ids = np.concatenate([self._ids, np.array(appended_ids, dtype=np.int64)])
+            self._signatures = np.vstack([self._signatures, np.array(appended_signatures)])
+            for offset, request_id in enumerate(appended_ids):
+                self._positions[request_id] = start + offset
+
+    def refresh(self):
+        max_age = getattr(settings, 'DUPLICATE_INDEX_REBUILD_SECONDS', 600)
+        with self._lock:
+            if self._built_at is None or time.monotonic() - self._built_at > max_age:
+                self._rebuild()
+            else:
+                self._apply_changes()
+
+    def search(self, signature, limit=5, threshold=None, exclude_id=None):
+        """Список (id, сходство) открытых заявок, отсортированный по убыванию сходства"""
+        if signature is None:
+            return []
+        if threshold is None:
+            threshold = getattr(settings, 'DUPLICATE_SIMILARITY_THRESHOLD', 0.5)
+        self.refresh()
+        query = _to_array(signature)
+        with self._lock:
+            if not len(self._ids):
+                return []
+            scores = np.count_nonzero(self._signatures == query, axis=1) / SIGNATURE_SIZE
+            scores[self._ids < 0] = 0
+            if exclude_id is not None and exclude_id in self._positions:
+                scores[self._positions[exclude_id]] = 0
+            candidates = np.flatnonzero(scores >= threshold)
+            if len(candidates) > limit:
+                top = np.argpartition(scores[candidates], -limit)[-limit:]
+                candidates = candidates[top]
+            candidates = candidates[np.argsort(-scores[candidates])]
+            return [(int(self._ids[i]), float(scores[i])) for i in candidates]
+
+
+duplicate_index = DuplicateIndex()
+
+
+def find_duplicates(title, description, limit=5, exclude_id=None):
+    """Похожие открытые заявки (объекты Request с атрибутом similarity)"""
+    from .models import Request
+
+    matches = duplicate_index.search(
+        text_signature(title, description), limit=limit, exclude_id=exclude_id
+    )
+    if not matches:
+        return []
+    scores = dict(matches)
+    # Повторная проверка статуса в БД отсекает удалённые и закрытые в других процессах заявки
+    found = Request.objects.filter(id__in=scores, status__in=OPEN_STATUSES).in_bulk()
+    result = []
+    for request_id, score in matches:
+        request_obj = found.get(request_id)
+        if request_obj is not None:
+            request_obj.similarity = score
+            result.append(request_obj)
+    return result
@@ -0,0 +1,195 @@
+"""
+Потоковая выгрузка заявок в CSV, JSONL и XLSX.
+
+Строки читаются через ``.iterator()`` и сразу превращаются в байты, поэтому
+память не зависит от размера выгрузки, а первые байты уходят клиенту сразу.
+"""
+import csv
+import json
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from .db_router import use_replica
+from .models import Request
+
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+COLUMNS = [
+    ('id', 'ID'),
+    ('title', 'Название'),
+    ('created_by__username', 'Создатель'),
+    ('category', 'Категория'),
+    ('status', 'Статус'),
+    ('comment_count', 'Комментариев'),
+    ('created_at', 'Создана'),
+    ('updated_at', 'Обновлена'),
+]
+
+CHUNK_SIZE = 2000
+
+_CATEGORY_DISPLAY = dict(Request.CATEGORY_CHOICES)
+_STATUS_DISPLAY = dict(Request.STATUS_CHOICES)
+
+
+def export_rows(queryset):
+    """Кортежи значений для выгрузки с человекочитаемыми категорией и статусом"""
+    fields = [field for field, _ in COLUMNS]
+    category_index = fields.index('category')
+    status_index = fields.index('status')
+    with use_replica():
+        rows = queryset.order_by('id').values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+        for row in rows:
+            row = list(row)
+            row[category_index] = _CATEGORY_DISPLAY.get(row[category_index], row[category_index])
+            row[status_index] = _STATUS_DISPLAY.get(row[status_index], row[status_index])
+            yield row
+
+
+# Такие строки табличные редакторы выполняют как формулы (в XLSX — после правки ячейки)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# Управляющие символы, недопустимые в XML 1.0
+_XML_INVALID_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _format_value(value, spreadsheet=False):
+    """
+    Значение для выгрузки. Для CSV и XLSX (spreadsheet=True) текст,
+    начинающийся с символа формулы, экранируется апострофом.
+    """
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if spreadsheet and isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """Псевдо-файл: write() возвращает данные, а не буферизует их"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(queryset):
+    writer = csv.writer(_Echo())
+    # BOM, чтобы Excel правильно открыл кириллицу
+    yield '\ufeff' + writer.writerow([title for _, title in COLUMNS])
+    for row in export_rows(queryset):
+        yield writer.writerow([_format_value(value, spreadsheet=True) for value in row])
+
+
+def stream_jsonl(queryset):
+    keys = [field.replace('__', '_') for field, _ in COLUMNS]
+    for row in export_rows(queryset):
+        yield json.dumps(
+            dict(zip(keys, (_format_value(value) for value in row))),
+            ensure_ascii=False,
+        ) + '\n'
+
+
+class _ChunkBuffer:
+    """Несмещаемый поток для zipfile: накопленные байты забирает генератор"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Заявки" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        value = _format_value(value, spreadsheet=True)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c><v>{value}</v></c>')
+        else:
+            # Управляющие символы сделали бы XML листа некорректным
+            text = _XML_INVALID_RE.sub('', str(value))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>')
+    return '<row>' + ''.join(cells) + '</row>'
+
+
+def stream_xlsx(queryset):
+    """Минимальная книга SpreadsheetML, лист пишется в zip по мере чтения строк"""
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        yield buffer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row([title for _, title in COLUMNS]).encode('utf-8'))
+            for row in export_rows(queryset):
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+                data = buffer.drain()
+                if data:
+                    yield data
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+STREAMERS = {
+    'csv': stream_csv,
+    'jsonl': stream_jsonl,
+    'xlsx': stream_xlsx,
+}
@@ -1,8 +1,11 @@
 from django import forms
-from .models import Article, Request, Comment
+from .models import Article, Request, Comment, NotificationPreference
 
 
 class ArticleForm(forms.ModelForm):
+    # Версия статьи, которую открыл пользователь: сохранение чужих правок не затирает
+    version = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
     class Meta:
         model = Article
         fields = ['title', 'content', 'image', 'video', 'audio']
@@ -15,6 +18,8 @@ class ArticleForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.fields['title'].required = True
         self.fields['content'].required = True
+        if self.instance.pk:
+            self.fields['version'].initial = self.instance.version
 
 
 class RequestForm(forms.ModelForm):
@@ -71,3 +76,12 @@ class CommentForm(forms.ModelForm):
             self._update_errors(e)
         
 
+
+
+class NotificationPreferenceForm(forms.ModelForm):
+    class Meta:
+        model = NotificationPreference
+        fields = ['frequency']
+        widgets = {
+            'frequency': forms.RadioSelect,
+        }
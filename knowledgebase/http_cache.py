@@ -0,0 +1,121 @@
+"""
+Условные GET-запросы и заголовки кеширования для публичных страниц базы знаний.
+
+Валидаторы (ETag и Last-Modified) считаются без рендеринга шаблона. Для списка
+статей это одна отметка изменения в общем кеше: ее обновляют сигналы статей,
+комментариев к ним и тегов, а также импорт, перерасчет тегов и счетчиков, так
+что проверка не обращается к базе. Страница статьи проверяется одним запросом
+по ее строке. Анонимным пользователям отдается 304 и ``Cache-Control: public``;
+страницы авторизованных пользователей (а также страницы с одноразовыми
+сообщениями) помечаются как private.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .models import Article
+
+
+LIST_CHANGED_KEY = 'kb:article_list:changed'
+
+
+def _make_etag(*parts):
+    return quote_etag(hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest())
+
+
+def article_list_changed():
+    """Новая отметка изменения списка статей; недоступный кеш пропускается"""
+    try:
+        cache.set(LIST_CHANGED_KEY, timezone.now(), timeout=None)
+    except Exception:
+        pass
+
+
+def article_list_validators(request):
+    """
+    Валидаторы списка статей по отметке изменения. Без отметки (кеш очищен)
+    ставится текущее время — клиенты один раз получат страницу целиком.
+    """
+    try:
+        changed = cache.get(LIST_CHANGED_KEY)
+        if changed is None:
+            changed = timezone.now()
+            if not cache.add(LIST_CHANGED_KEY, changed, timeout=None):
+                changed = cache.get(LIST_CHANGED_KEY) or changed
+    except Exception:
+        return None
+    return _make_etag('list', changed.isoformat()), changed
+
+
+def article_detail_validators(request, article_id):
+    state = (
+        Article.objects.filter(pk=article_id)
+        .annotate(tag_count=Count('article_tags'), tags_changed=Max('article_tags__created_at'))
+        .values_list('updated_at', 'last_activity_at', 'comment_count', 'tag_count', 'tags_changed')
+        .first()
+    )
+    if state is None:
+        return None
+    updated_at, last_activity_at, comment_count, tag_count, tags_changed = state
+    return (
+        _make_etag('article', article_id, updated_at, last_activity_at, comment_count, tag_count, tags_changed),
+        max(stamp for stamp in (updated_at, last_activity_at, tags_changed) if stamp),
+    )
+
+
+def _is_shareable(request):
+    if request.user.is_authenticated:
+        return False
+    if len(get_messages(request)):
+        return False
+    session = getattr(request, 'session', None)
+    return not (session is not None and session.modified)
+
+
+def public_conditional(validators):
+    """
+    Декоратор публичной страницы: validators(request, *args, **kwargs) возвращает
+    (etag, last_modified) или None, если страницу нельзя проверить заранее.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            if not _is_shareable(request):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, ('Cookie',))
+                return response
+
+            state = validators(request, *args, **kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified = state
+            last_modified = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304) and not response.cookies:
+                response.headers.setdefault('ETag', etag)
+                if last_modified:
+                    response.headers.setdefault('Last-Modified', http_date(last_modified))
+                patch_cache_control(
+                    response,
+                    public=True,
+                    max_age=settings.KB_PUBLIC_CACHE_MAX_AGE,
+                    s_maxage=settings.KB_PUBLIC_CACHE_SHARED_MAX_AGE,
+                )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
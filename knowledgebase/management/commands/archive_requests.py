@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from knowledgebase.archive import archivable_requests, archive_requests
+
+
+class Command(BaseCommand):
+    help = 'Перенос давно закрытых заявок с комментариями в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'REQUEST_ARCHIVE_AFTER_DAYS', 180),
+            help='Сколько дней заявка должна быть закрыта',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Заявок в одной транзакции')
+        parser.add_argument('--limit', type=int, help='Перенести не больше указанного числа заявок')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать подходящие заявки')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archivable_requests(options['days']).count()
+            self.stdout.write(f'Будет перенесено заявок: {count}')
+            return
+        moved = archive_requests(options['days'], batch_size=options['batch_size'], limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'Перенесено в архив заявок: {moved}'))
@@ -0,0 +1,66 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from knowledgebase.forms import RequestForm
+from knowledgebase.models import Request
+from knowledgebase.utils import request_list_rows
+
+
+class Command(BaseCommand):
+    help = 'Замер стоимости рендеринга списка заявок на строку (данные создаются и откатываются)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--repeat', type=int, default=3, help='Повторов рендеринга, берется лучший')
+
+    def _render(self, http_request, rows):
+        return render_to_string('knowledgebase/requests_page.html', {
+            'form': RequestForm(),
+            'requests': rows,
+            'query': '',
+            'status_filter': '',
+            'sort': '',
+        }, request=http_request)
+
+    def handle(self, *args, **options):
+        http_request = RequestFactory().get('/knowledgebase/requests-page/')
+        # Суперпользователь в памяти: видит все кнопки действий, обращений к БД за правами нет
+        http_request.user = User(username='benchmark', is_active=True, is_superuser=True)
+        # Первый рендер компилирует шаблон и кладет его в кеш загрузчика
+        self._render(http_request, [])
+
+        for count in options['rows']:
+            with transaction.atomic():
+                Request.objects.bulk_create([
+                    Request(
+                        title=f'Заявка {i}',
+                        description='Описание проблемы пользователя ' * 5,
+                        category='Technical',
+                        status=('New', 'In Progress', 'Completed', 'Cancelled')[i % 4],
+                    )
+                    for i in range(count)
+                ], batch_size=1000)
+
+                started = time.perf_counter()
+                rows = request_list_rows(Request.objects.order_by('-created_at')[:count])
+                build_seconds = time.perf_counter() - started
+
+                render_seconds = None
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    html = self._render(http_request, rows)
+                    elapsed = time.perf_counter() - started
+                    render_seconds = elapsed if render_seconds is None else min(render_seconds, elapsed)
+                transaction.set_rollback(True)
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{count} строк: подготовка {build_seconds * 1000:.1f} мс '
+                f'({build_seconds / count * 1e6:.1f} мкс/строка), '
+                f'рендеринг {render_seconds * 1000:.1f} мс '
+                f'({render_seconds / count * 1e6:.1f} мкс/строка), '
+                f'HTML {len(html) // 1024} КБ'
+            ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from knowledgebase.media_storage import cleanup_orphans, recount
+
+
+class Command(BaseCommand):
+    help = 'Сверка счетчиков ссылок на медиафайлы статей и удаление файлов без ссылок'
+
+    def handle(self, *args, **options):
+        fixed = recount()
+        removed, freed = cleanup_orphans()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счетчиков: {fixed}, удалено файлов: {removed}, освобождено: {freed} байт'
+        ))
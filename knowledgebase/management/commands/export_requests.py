@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from knowledgebase.export import EXPORT_FORMATS, STREAMERS
+from knowledgebase.models import Request
+from knowledgebase.utils import filter_requests
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка заявок в CSV, JSONL или XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', default='csv', choices=sorted(EXPORT_FORMATS))
+        parser.add_argument('--output', help='Путь к файлу (по умолчанию stdout)')
+        parser.add_argument('--query', default='', help='Поиск по названию или описанию')
+        parser.add_argument('--status', default='', help='Фильтр по статусу')
+
+    def handle(self, *args, **options):
+        export_format = options['format']
+        requests = filter_requests(Request.objects.all(), options['query'], options['status'])
+        if export_format == 'xlsx' and not options['output']:
+            raise CommandError('Для XLSX укажите --output')
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in STREAMERS[export_format](requests):
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Выгрузка сохранена: {options['output']} ({written} байт)"))
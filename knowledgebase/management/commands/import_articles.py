@@ -0,0 +1,216 @@
+import html
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.html import strip_tags
+from knowledgebase import http_cache, media_storage, revisions, suggestions
+from knowledgebase.models import Article
+
+
+MEDIA_FIELDS = {
+    'image': 'articles/images/',
+    'video': 'articles/videos/',
+    'audio': 'articles/audios/',
+}
+
+MARKDOWN_SUFFIXES = {'.md', '.markdown'}
+HTML_SUFFIXES = {'.html', '.htm'}
+
+_FRONT_MATTER_RE = re.compile(r'\A---\s*\n(.*?)\n---\s*\n', re.DOTALL)
+_HEADING_RE = re.compile(r'^#\s+(.+)$', re.MULTILINE)
+_HTML_TITLE_RE = re.compile(r'<(?:title|h1)[^>]*>(.*?)</(?:title|h1)>', re.IGNORECASE | re.DOTALL)
+
+
+def _parse_markdown(path):
+    text = path.read_text(encoding='utf-8')
+    meta = {}
+    match = _FRONT_MATTER_RE.match(text)
+    if match:
+        for line in match.group(1).splitlines():
+            if ':' in line:
+                key, value = line.split(':', 1)
+                meta[key.strip()] = value.strip().strip('"').strip("'")
+        text = text[match.end():]
+    if 'title' not in meta:
+        heading = _HEADING_RE.search(text)
+        meta['title'] = heading.group(1).strip() if heading else path.stem
+    meta['content'] = text.strip()
+    return meta
+
+
+def _parse_html(path):
+    text = path.read_text(encoding='utf-8')
+    title = _HTML_TITLE_RE.search(text)
+    body = re.sub(r'<(script|style|title)[^>]*>.*?</\1>', '', text, flags=re.IGNORECASE | re.DOTALL)
+    content = html.unescape(strip_tags(body))
+    content = re.sub(r'\n\s*\n+', '\n\n', content).strip()
+    return {
+        'title': html.unescape(strip_tags(title.group(1))).strip() if title else path.stem,
+        'content': content,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Импорт статей базы знаний из каталога Markdown/HTML/JSONL файлов с медиа'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог с файлами статей')
+        parser.add_argument('--author', help='Имя пользователя-автора статей')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=8, help='Потоков для копирования медиа')
+        parser.add_argument('--update', action='store_true', help='Обновлять уже импортированные статьи')
+
+    def _collect(self, root):
+        """Записи статей: source_key, title, content и абсолютные пути к медиа"""
+        entries = []
+        for path in sorted(root.rglob('*')):
+            if not path.is_file():
+                continue
+            suffix = path.suffix.lower()
+            relative = path.relative_to(root).as_posix()
+            if suffix in MARKDOWN_SUFFIXES:
+                records = [(relative, _parse_markdown(path))]
+            elif suffix in HTML_SUFFIXES:
+                records = [(relative, _parse_html(path))]
+            elif suffix == '.jsonl':
+                records = []
+                with path.open(encoding='utf-8') as f:
+                    for line_number, line in enumerate(f, start=1):
+                        if line.strip():
+                            data = json.loads(line)
+                            key = data.get('source_key') or f'{relative}#{line_number}'
+                            records.append((key, data))
+            else:
+                continue
+
+            for source_key, data in records:
+                if not data.get('title') or not data.get('content'):
+                    self.stdout.write(self.style.WARNING(f'Пропущено (нет названия или текста): {source_key}'))
+                    continue
+                media = {}
+                for field in MEDIA_FIELDS:
+                    if data.get(field):
+                        media_path = (path.parent / data[field]).resolve()
+                        if media_path.is_file():
+                            media[field] = media_path
+                        else:
+                            self.stdout.write(self.style.WARNING(f'Медиафайл не найден: {media_path}'))
+                entries.append({
+                    'source_key': source_key[:255],
+                    'title': str(data['title'])[:200],
+                    'content': str(data['content']),
+                    'media': media,
+                })
+        return entries
+
+    def _copy_media(self, entries, workers):
+        """Сохраняет каждый исходный файл в хранилище медиа один раз, параллельно"""
+        jobs = {}
+        for entry in entries:
+            for field, source in entry['media'].items():
+                jobs.setdefault((field, source), None)
+
+        def copy(job):
+            field, source = job
+            with source.open('rb') as f:
+                storage = Article._meta.get_field(field).storage
+                return job, storage.save(MEDIA_FIELDS[field] + source.name, File(f))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(pool.map(copy, jobs))
+
+    def handle(self, *args, **options):
+        root = Path(options['directory'])
+        if not root.is_dir():
+            raise CommandError(f'Каталог не найден: {root}')
+
+        author = None
+        if options['author']:
+            author = User.objects.filter(username=options['author']).first()
+            if author is None:
+                raise CommandError(f'Пользователь не найден: {options["author"]}')
+
+        entries = self._collect(root)
+        keys = [entry['source_key'] for entry in entries]
+        existing = {}
+        batch_size = options['batch_size']
+        for start in range(0, len(keys), batch_size):
+            existing.update(
+                Article.objects.filter(source_key__in=keys[start:start + batch_size]).in_bulk(field_name='source_key')
+            )
+
+        to_create = [entry for entry in entries if entry['source_key'] not in existing]
+        to_update = [entry for entry in entries if entry['source_key'] in existing] if options['update'] else []
+        stored = self._copy_media(to_create + to_update, options['workers'])
+
+        replaced_media = set()
+
+        def apply(article, entry):
+            replaced_media.update(name for name in media_storage.media_names(article) if name)
+            article.title = entry['title']
+            article.content = entry['content']
+            for field, source in entry['media'].items():
+                setattr(article, field, stored[(field, source)])
+            return article
+
+        created = 0
+        for start in range(0, len(to_create), batch_size):
+            chunk = [
+                apply(Article(source_key=entry['source_key'], author=author), entry)
+                for entry in to_create[start:start + batch_size]
+            ]
+            with transaction.atomic():
+                Article.objects.bulk_create(chunk, ignore_conflicts=True)
+            # ignore_conflicts молча пропускает статьи, которые успел создать параллельный
+            # импорт: своими считаются строки с проставленным этой пачкой pub_date
+            inserted = {(article.source_key, article.pub_date) for article in chunk}
+            created += sum(
+                pair in inserted
+                for pair in Article.objects.filter(source_key__in=[key for key, _ in inserted])
+                .values_list('source_key', 'pub_date')
+            )
+
+        updated = 0
+        now = timezone.now()
+        for start in range(0, len(to_update), batch_size):
+            chunk = [
+                apply(existing[entry['source_key']], entry)
+                for entry in to_update[start:start + batch_size]
+            ]
+            changed = [
+                article for article in chunk
+                if article._revision_state != (article.title, article.content)
+            ]
+            # bulk_update не заполняет auto_now, а по updated_at строится ETag страниц;
+            # версия растет, чтобы открытые формы редакторов увидели конфликт
+            for article in chunk:
+                article.updated_at = now
+                article.version = F('version') + 1
+            with transaction.atomic():
+                Article.objects.bulk_update(chunk, ['title', 'content', 'updated_at', 'version', *MEDIA_FIELDS])
+                # bulk_update не вызывает сигналы: ревизии истории пишутся здесь
+                for article in changed:
+                    revisions.record_revision(
+                        article, previous=article._revision_state, author_id=author.pk if author else None,
+                    )
+            updated += len(chunk)
+
+        # bulk_create не вызывает сигналы, индекс подсказок и счетчики ссылок на медиа обновляются один раз
+        if created or updated:
+            suggestions.invalidate()
+            http_cache.article_list_changed()
+            media_storage.recount(set(stored.values()) | replaced_media)
+            media_storage.cleanup_orphans(replaced_media)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано статей: {created}, обновлено: {updated}, '
+            f'пропущено существующих: {len(entries) - len(to_create) - len(to_update)}'
+        ))
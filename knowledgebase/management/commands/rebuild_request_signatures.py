@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from knowledgebase.duplicates import text_signature
+from knowledgebase.models import Request
+
+
+class Command(BaseCommand):
+    help = 'Пересчет MinHash-сигнатур заявок для поиска дубликатов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Пересчитать сигнатуры всех заявок, а не только пустые')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Request.objects.only('id', 'title', 'description').order_by('id')
+        if not options['all']:
+            queryset = queryset.filter(text_signature__isnull=True)
+
+        batch = []
+        updated = 0
+        for request_obj in queryset.iterator(chunk_size=batch_size):
+            request_obj.text_signature = text_signature(request_obj.title, request_obj.description)
+            batch.append(request_obj)
+            if len(batch) >= batch_size:
+                Request.objects.bulk_update(batch, ['text_signature'])
+                updated += len(batch)
+                batch = []
+        if batch:
+            Request.objects.bulk_update(batch, ['text_signature'])
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Обновлено сигнатур: {updated}'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from knowledgebase.models import Request
+from knowledgebase.utils import OPEN_STATUSES
+from portal.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Сверка счетчиков открытых назначенных заявок в профилях сотрудников'
+
+    def handle(self, *args, **options):
+        open_count = (
+            Request.objects.filter(assignee_id=OuterRef('user_id'), status__in=OPEN_STATUSES)
+            .order_by()
+            .values('assignee_id')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        with transaction.atomic():
+            updated = UserProfile.objects.update(
+                open_ticket_count=Coalesce(Subquery(open_count, output_field=IntegerField()), Value(0))
+            )
+        self.stdout.write(self.style.SUCCESS(f'Счетчики пересчитаны для профилей: {updated}'))
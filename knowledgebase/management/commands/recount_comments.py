@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from knowledgebase.http_cache import article_list_changed
+from knowledgebase.models import Article, Request, Comment
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков комментариев и времени последней активности статей и заявок'
+
+    def _recount(self, model, parent_field, created_field):
+        comments = Comment.objects.filter(**{parent_field: OuterRef('pk')}).order_by().values(parent_field)
+        count = comments.annotate(total=Count('id')).values('total')
+        latest = comments.annotate(latest=Max('created_at')).values('latest')
+        with transaction.atomic():
+            return model.objects.update(
+                comment_count=Coalesce(Subquery(count, output_field=IntegerField()), Value(0)),
+                last_activity_at=Greatest(
+                    F(created_field),
+                    Coalesce(Subquery(latest), F(created_field)),
+                ),
+            )
+
+    def handle(self, *args, **options):
+        articles = self._recount(Article, 'article', 'pub_date')
+        requests = self._recount(Request, 'request', 'created_at')
+        article_list_changed()
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано статей: {articles}, заявок: {requests}')
+        )
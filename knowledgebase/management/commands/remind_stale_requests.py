@@ -0,0 +1,52 @@
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from django.utils import timezone
+from knowledgebase.models import Request
+
+
+class Command(BaseCommand):
+    help = 'Напоминание исполнителям о заявках, давно находящихся в статусе «Новая»'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=getattr(settings, 'STALE_REQUEST_HOURS', 24),
+            help='Сколько часов заявка должна пробыть новой',
+        )
+
+    def handle(self, *args, **options):
+        threshold = timezone.now() - datetime.timedelta(hours=options['hours'])
+        stale = (
+            Request.objects.filter(status='New', status_changed_at__lt=threshold)
+            .select_related('assignee')
+            .order_by('created_at')
+        )
+        admin_email = getattr(settings, 'ADMIN_EMAIL', None)
+        by_recipient = defaultdict(list)
+        for request_obj in stale:
+            email = request_obj.assignee.email if request_obj.assignee and request_obj.assignee.email else admin_email
+            if email:
+                by_recipient[email].append(request_obj)
+
+        messages = []
+        for email, requests in by_recipient.items():
+            lines = [
+                f'#{r.id} «{r.title}» — с {timezone.localtime(r.created_at):%d.%m.%Y %H:%M}\n'
+                f'{settings.BASE_URL}{reverse("knowledgebase:request_detail", args=[r.id])}'
+                for r in requests
+            ]
+            messages.append(EmailMessage(
+                subject=f'Необработанные заявки: {len(requests)}',
+                body=f'Следующие заявки больше {options["hours"]} ч. находятся в статусе «Новая»:\n\n'
+                     + '\n\n'.join(lines),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[email],
+            ))
+        sent = get_connection(fail_silently=True).send_messages(messages) if messages else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Просроченных заявок: {sum(len(r) for r in by_recipient.values())}, писем отправлено: {sent or 0}'
+        ))
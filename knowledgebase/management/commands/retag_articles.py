@@ -0,0 +1,23 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from knowledgebase.tagging import retag_articles
+
+
+class Command(BaseCommand):
+    help = 'Перерасчет тегов всех статей по TF-IDF (параллельно по пачкам)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=min(4, os.cpu_count() or 1),
+            help='Число процессов для расчета (1 — без дополнительных процессов)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=500, help='Статей в одной пачке')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        articles, tags = retag_articles(workers=options['workers'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Статей: {articles}, тегов: {tags}, за {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,47 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from knowledgebase.analytics import rebuild_range, touched_days
+
+
+class Command(BaseCommand):
+    help = 'Пересчет дневной статистики заявок (ночная сверка со счетчиками из сигналов)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help='Сколько последних дней пересчитать')
+        parser.add_argument('--start', help='Начальная дата YYYY-MM-DD (вместо --days)')
+        parser.add_argument('--end', help='Конечная дата YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        try:
+            end = datetime.date.fromisoformat(options['end']) if options['end'] else today
+            if options['start']:
+                start = datetime.date.fromisoformat(options['start'])
+            else:
+                start = end - datetime.timedelta(days=max(options['days'], 1) - 1)
+        except ValueError as e:
+            raise CommandError(f'Неверная дата: {e}')
+        if start > end:
+            raise CommandError('Начальная дата позже конечной')
+
+        # Пересчет по месяцам, чтобы не держать длинную транзакцию на годовом диапазоне
+        rows = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + datetime.timedelta(days=30), end)
+            rows += rebuild_range(chunk_start, chunk_end)
+            chunk_start = chunk_end + datetime.timedelta(days=1)
+
+        # Заявки старше окна, статус которых менялся за это время: их дни пересчитываются отдельно
+        touched = []
+        if not options['start']:
+            since = timezone.make_aware(datetime.datetime.combine(start, datetime.time.min))
+            touched = sorted(day for day in touched_days(since) if not start <= day <= end)
+            for day in touched:
+                rows += rebuild_range(day, day)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Статистика пересчитана за {start} — {end} и еще дней: {len(touched)}, строк: {rows}'
+        ))
@@ -0,0 +1,42 @@
+import signal
+
+from django.core.management.base import BaseCommand
+from knowledgebase.models import ScheduledJob
+from knowledgebase.scheduler import Scheduler, run_job, claim_due_jobs, node_name, sync_default_jobs
+
+
+class Command(BaseCommand):
+    help = 'Планировщик периодических задач (можно запускать на нескольких узлах)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Потоков для выполнения задач')
+        parser.add_argument('--interval', type=float, default=15, help='Период опроса задач, секунд')
+        parser.add_argument('--once', action='store_true', help='Выполнить созревшие задачи и выйти')
+        parser.add_argument('--no-sync', action='store_true', help='Не создавать задачи из SCHEDULED_JOBS')
+
+    def handle(self, *args, **options):
+        if not options['no_sync']:
+            created = sync_default_jobs()
+            if created:
+                self.stdout.write(f'Добавлено задач из настроек: {created}')
+
+        if options['once']:
+            node = node_name()
+            results = [run_job(pk, node) for pk in claim_due_jobs(node)]
+            self.stdout.write(self.style.SUCCESS(
+                f'Выполнено задач: {len(results)}, с ошибкой: {results.count(False)}'
+            ))
+            return
+
+        scheduler = Scheduler(workers=options['workers'], interval=options['interval'])
+        signal.signal(signal.SIGTERM, lambda *_: scheduler.stopped.set())
+        self.stdout.write(self.style.SUCCESS(
+            f'Планировщик {scheduler.node} запущен, задач включено: '
+            f'{ScheduledJob.objects.filter(enabled=True).count()}'
+        ))
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            scheduler.stopped.set()
+            scheduler.executor.shutdown(wait=True)
+        self.stdout.write('Планировщик остановлен')
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from knowledgebase.notifications import DIGEST_FREQUENCIES, purge_sent, send_digests
+
+
+class Command(BaseCommand):
+    help = 'Отправка накопленных уведомлений: одно письмо-сводка на получателя'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--frequency', choices=DIGEST_FREQUENCIES, action='append',
+            help='Какие сводки отправить (по умолчанию все)',
+        )
+
+    def handle(self, *args, **options):
+        for frequency in options['frequency'] or DIGEST_FREQUENCIES:
+            recipients, events = send_digests(frequency)
+            self.stdout.write(self.style.SUCCESS(
+                f'Сводка «{frequency}»: писем {recipients}, уведомлений {events}'
+            ))
+        purged = purge_sent(getattr(settings, 'NOTIFICATION_EVENT_RETENTION_DAYS', 30))
+        if purged:
+            self.stdout.write(f'Удалено отправленных событий: {purged}')
@@ -0,0 +1,221 @@
+"""
+Хранилище медиафайлов статей с адресацией по содержимому.
+
+Загружаемый файл потоково пишется во временный файл с одновременным
+подсчетом SHA-256 и сохраняется как ``blobs/ab/cd/<sha256><.расширение>``.
+Одинаковые файлы, загруженные в разные статьи, хранятся один раз.
+
+Для каждого файла ведется строка ``MediaBlob`` со счетчиком ссылок из полей
+статей: сигналы статей увеличивают и уменьшают его при создании, замене
+медиа и удалении. Файлы без ссылок удаляются после фиксации транзакции, но
+не раньше ``MEDIA_BLOB_GRACE_SECONDS`` с последней загрузки — чтобы не удалить
+файл, который только что загрузили, а статью с ним еще не сохранили.
+
+Содержимое по имени никогда не меняется, поэтому такие URL можно кешировать
+навсегда (см. ``views.media_blob``).
+"""
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+BLOB_DIR = 'blobs'
+MEDIA_FIELDS = ('image', 'video', 'audio')
+CHUNK_SIZE = 1024 * 1024
+
+_EXTENSION_RE = re.compile(r'^\.[a-z0-9]{1,10}$')
+BLOB_PATH_RE = r'[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(?:\.[a-z0-9]{1,10})?'
+
+
+def is_blob(name):
+    return name.startswith(BLOB_DIR + '/')
+
+
+def blob_name(digest, extension=''):
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def _grace():
+    return timedelta(seconds=getattr(settings, 'MEDIA_BLOB_GRACE_SECONDS', 3600))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, в котором имя файла — хеш его содержимого"""
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя зависит только от содержимого и выбирается в _save
+        return name
+
+    def _spool(self, content):
+        """Потоковая запись во временный файл; возвращает (sha256, размер, путь)"""
+        directory = self.path(os.path.join(BLOB_DIR, 'tmp'))
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as spool:
+            try:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    spool.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                os.unlink(spool.name)
+                raise
+        return digest.hexdigest(), size, spool.name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+        digest, size, spooled = self._spool(content)
+        extension = os.path.splitext(name)[1].lower()
+        name = blob_name(digest, extension if _EXTENSION_RE.match(extension) else '')
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with transaction.atomic():
+                # Блокировка строки не дает очистке удалить файл между проверкой и записью
+                blob, created = MediaBlob.objects.select_for_update().get_or_create(
+                    name=name, defaults={'size': size},
+                )
+                if not created:
+                    MediaBlob.objects.filter(pk=blob.pk).update(touched_at=timezone.now())
+                if os.path.exists(path):
+                    os.unlink(spooled)
+                else:
+                    os.replace(spooled, path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+        finally:
+            if os.path.exists(spooled):
+                os.unlink(spooled)
+        return name
+
+    def delete(self, name):
+        # Один файл может принадлежать нескольким статьям: удаляет только очистка по счетчику ссылок
+        if not is_blob(name):
+            super().delete(name)
+
+    def purge(self, name):
+        super().delete(name)
+
+
+storage = ContentAddressedStorage()
+
+
+def get_storage():
+    """Хранилище для полей медиа статей (callable, чтобы миграции не зависели от MEDIA_ROOT)"""
+    return storage
+
+
+def media_names(instance):
+    """
+    Имена файлов в полях медиа (None для незагруженных отложенных полей).
+    __dict__ вместо атрибутов, чтобы не подгружать отложенные поля.
+    """
+    values = instance.__dict__
+    return [
+        getattr(values[field], 'name', values[field]) or '' if field in values else None
+        for field in MEDIA_FIELDS
+    ]
+
+
+def change_references(added=(), removed=()):
+    """Меняет счетчики ссылок; файлы, оставшиеся без ссылок, удаляются после фиксации транзакции"""
+    deltas = Counter(name for name in added if name and is_blob(name))
+    deltas.subtract(name for name in removed if name and is_blob(name))
+    names_by_delta = defaultdict(list)
+    for name, delta in deltas.items():
+        if delta:
+            names_by_delta[delta].append(name)
+    if not names_by_delta:
+        return
+    from .models import MediaBlob
+    for delta, names in names_by_delta.items():
+        MediaBlob.objects.filter(name__in=names).update(ref_count=F('ref_count') + delta)
+    released = [name for name, delta in deltas.items() if delta < 0]
+    if released:
+        transaction.on_commit(lambda: cleanup_orphans(released))
+
+
+def recount(names=None):
+    """Пересчитывает счетчики ссылок по полям статей (после bulk-операций и для сверки)"""
+    from .models import Article, MediaBlob
+    blobs = MediaBlob.objects.all() if names is None else MediaBlob.objects.filter(name__in=names)
+    blobs = list(blobs.only('id', 'name', 'ref_count'))
+    if not blobs:
+        return 0
+    counts = Counter()
+    for field in MEDIA_FIELDS:
+        articles = Article.objects.filter(**{f'{field}__startswith': BLOB_DIR + '/'})
+        if names is not None:
+            articles = articles.filter(**{f'{field}__in': names})
+        counts.update(articles.values_list(field, flat=True).iterator())
+    changed = [blob for blob in blobs if blob.ref_count != counts[blob.name]]
+    for blob in changed:
+        blob.ref_count = counts[blob.name]
+    MediaBlob.objects.bulk_update(changed, ['ref_count'], batch_size=1000)
+    return len(changed)
+
+
+def cleanup_orphans(names=None):
+    """
+    Удаляет файлы без ссылок, загруженные раньше льготного периода.
+    Без names дополнительно удаляет файлы в каталоге, для которых нет строки
+    (загрузка в откатившейся транзакции). Возвращает (файлов, байт).
+    """
+    from .models import MediaBlob
+    cutoff = timezone.now() - _grace()
+    candidates = MediaBlob.objects.filter(ref_count__lte=0, touched_at__lte=cutoff)
+    if names is not None:
+        candidates = candidates.filter(name__in=names)
+    removed = freed = 0
+    for blob_id in list(candidates.values_list('id', flat=True)):
+        with transaction.atomic():
+            blob = (
+                MediaBlob.objects.select_for_update()
+                .filter(pk=blob_id, ref_count__lte=0, touched_at__lte=cutoff).first()
+            )
+            if blob is None:
+                continue
+            storage.purge(blob.name)
+            blob.delete()
+        removed += 1
+        freed += blob.size
+    if names is None:
+        untracked_removed, untracked_freed = _cleanup_untracked(cutoff)
+        removed += untracked_removed
+        freed += untracked_freed
+    return removed, freed
+
+
+def _cleanup_untracked(cutoff):
+    from .models import MediaBlob
+    root = storage.path(BLOB_DIR)
+    if not os.path.isdir(root):
+        return 0, 0
+    threshold = cutoff.timestamp()
+    files = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            if os.path.getmtime(path) <= threshold:
+                files[os.path.relpath(path, storage.location).replace(os.sep, '/')] = path
+    tracked = set()
+    names = list(files)
+    for start in range(0, len(names), 500):
+        tracked.update(MediaBlob.objects.filter(name__in=names[start:start + 500]).values_list('name', flat=True))
+    removed = freed = 0
+    for name, path in files.items():
+        if name not in tracked:
+            freed += os.path.getsize(path)
+            os.unlink(path)
+            removed += 1
+    return removed, freed
@@ -0,0 +1,197 @@
+"""
+Метрики приложения в формате Prometheus.
+
+Счетчики и гистограммы обновляются в процессе, обработавшем запрос:
+
+* время ответа по view и методу, ответы по коду статуса;
+* число и время SQL-запросов на один HTTP-запрос;
+* результаты отправки писем уведомлений, которые уходят сразу.
+
+Показатели из базы и кеша (открытые заявки по статусам, заявки на
+регистрацию, очередь и отправленные сводки уведомлений, периодические
+задачи, отказы троттлинга) считаются при каждом чтении ``/metrics``.
+Сводки рассылает процесс планировщика, который не опрашивается: их
+результат берется из ``NotificationEvent.sent_at``, а ошибки отправки видны
+по ``scheduled_job_runs{result="failed"}``.
+
+Под gunicorn с несколькими воркерами каждый процесс пишет значения в файлы
+каталога ``PROMETHEUS_MULTIPROC_DIR`` (см. ``gunicorn.conf.py``), а ``/metrics``
+любого воркера собирает их вместе.
+"""
+import os
+import time
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+UNRESOLVED_VIEW = '<unresolved>'
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Время обработки HTTP-запроса',
+    ['view', 'method'], buckets=LATENCY_BUCKETS,
+)
+RESPONSES = Counter('http_responses', 'HTTP-ответы по коду статуса', ['view', 'method', 'status'])
+DB_QUERIES = Histogram(
+    'db_queries_per_request', 'SQL-запросов на один HTTP-запрос', ['view'], buckets=QUERY_COUNT_BUCKETS,
+)
+DB_QUERY_TIME = Histogram(
+    'db_query_duration_seconds', 'Суммарное время SQL-запросов одного HTTP-запроса',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+EMAILS = Counter('notification_emails', 'Письма уведомлений по результату отправки', ['kind', 'result'])
+
+
+def record_emails(kind, total, sent):
+    """Результат отправки total писем, из которых sent приняты почтовым сервером"""
+    if sent:
+        EMAILS.labels(kind, 'sent').inc(sent)
+    if total > sent:
+        EMAILS.labels(kind, 'failed').inc(total - sent)
+
+
+class QueryTimer:
+    """execute_wrapper для всех соединений: число и суммарное время SQL-запросов"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else UNRESOLVED_VIEW
+
+
+def observe_request(request, status, duration, queries):
+    view = view_name(request)
+    REQUEST_LATENCY.labels(view, request.method).observe(duration)
+    RESPONSES.labels(view, request.method, str(status)).inc()
+    DB_QUERIES.labels(view).observe(queries.count)
+    DB_QUERY_TIME.labels(view).observe(queries.duration)
+
+
+class StateCollector:
+    """Показатели, которые считаются по базе и кешу в момент чтения метрик"""
+
+    def collect(self):
+        from django.db.models import Count
+        from portal.models import UserRegistrationRequest
+        from .models import NotificationEvent, Request, ScheduledJob
+        from .throttling import throttle_metrics
+
+        open_requests = GaugeMetricFamily('requests_by_status', 'Заявки по статусам', labels=['status'])
+        counts = dict(Request.objects.values_list('status').annotate(total=Count('id')).order_by())
+        for status, _ in Request.STATUS_CHOICES:
+            open_requests.add_metric([status], counts.get(status, 0))
+        yield open_requests
+
+        yield GaugeMetricFamily(
+            'registration_requests_pending', 'Заявки на регистрацию, ожидающие одобрения',
+            value=UserRegistrationRequest.objects.filter(status='pending').count(),
+        )
+
+        pending = GaugeMetricFamily(
+            'notification_events_pending', 'Уведомления, ожидающие отправки в сводке', labels=['frequency'],
+        )
+        for frequency, total in (
+            NotificationEvent.objects.filter(sent_at__isnull=True)
+            .values_list('frequency').annotate(total=Count('id')).order_by()
+        ):
+            pending.add_metric([frequency], total)
+        yield pending
+
+        sent = GaugeMetricFamily(
+            'notification_digest_events_sent_last_day',
+            'Уведомления, отправленные в сводках за последние сутки', labels=['frequency'],
+        )
+        for frequency, total in (
+            NotificationEvent.objects.filter(sent_at__gte=timezone.now() - timedelta(days=1))
+            .values_list('frequency').annotate(total=Count('id')).order_by()
+        ):
+            sent.add_metric([frequency], total)
+        yield sent
+
+        runs = CounterMetricFamily('scheduled_job_runs', 'Запуски периодических задач', labels=['job', 'result'])
+        last_success = GaugeMetricFamily(
+            'scheduled_job_last_run_success', 'Последний запуск задачи завершился успешно', labels=['job'],
+        )
+        last_duration = GaugeMetricFamily(
+            'scheduled_job_last_duration_seconds', 'Длительность последнего запуска задачи', labels=['job'],
+        )
+        for name, run_count, failure_count, status, duration in ScheduledJob.objects.values_list(
+            'name', 'run_count', 'failure_count', 'last_status', 'last_duration',
+        ):
+            runs.add_metric([name, 'success'], run_count - failure_count)
+            runs.add_metric([name, 'failed'], failure_count)
+            if status:
+                last_success.add_metric([name], status == 'success')
+            if duration is not None:
+                last_duration.add_metric([name], duration)
+        yield runs
+        yield last_success
+        yield last_duration
+
+        rejections = CounterMetricFamily('throttle_rejections', 'Отклоненные троттлингом запросы', labels=['scope'])
+        for scope, total in throttle_metrics().items():
+            rejections.add_metric([scope], total)
+        yield rejections
+
+
+class _ProcessMetrics:
+    """Метрики текущего процесса из глобального реестра (режим одного процесса)"""
+
+    def collect(self):
+        return REGISTRY.collect()
+
+
+def is_multiprocess():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def render():
+    """(текст метрик, Content-Type) для ответа /metrics"""
+    registry = CollectorRegistry()
+    if is_multiprocess():
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(_ProcessMetrics())
+    registry.register(StateCollector())
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def readiness():
+    """
+    Проверки готовности принимать трафик: {проверка: ошибка или None}.
+    Недоступный кеш не делает приложение неготовым (троттлинг и кеш страниц
+    его пропускают), но отражается в ответе.
+    """
+    from django.core.cache import cache
+    checks = {}
+    try:
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        checks['database'] = None
+    except Exception as e:
+        checks['database'] = str(e)
+    try:
+        cache.set('readyz', 1, timeout=10)
+        checks['cache'] = None if cache.get('readyz') == 1 else 'значение не сохранилось'
+    except Exception as e:
+        checks['cache'] = str(e)
+    return checks
@@ -1,5 +1,38 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.utils.deprecation import MiddlewareMixin
 
+from . import db_router, profiling
+
+
+class MetricsMiddleware:
+    """
+    Время ответа, код статуса и SQL-запросы каждого HTTP-запроса для /metrics.
+    Стоит первым в MIDDLEWARE, чтобы учитывать время всей цепочки.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        from . import metrics
+        self.metrics = metrics
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = self.metrics.QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        self.metrics.observe_request(request, response.status_code, time.perf_counter() - started, queries)
+        return response
+
+
 class LimitedModeMiddleware(MiddlewareMixin):
     def process_request(self, request):
         mode = request.GET.get('mode')
@@ -8,3 +41,55 @@ class LimitedModeMiddleware(MiddlewareMixin):
         elif mode == 'full':
             request.session['limited_mode'] = False
         request.limited_mode = bool(request.session.get('limited_mode', False))
+
+
+class ReplicaPinningMiddleware(MiddlewareMixin):
+    """
+    Закрепляет пользователя за основной базой на короткое время после записи,
+    чтобы чтение с реплики не возвращало устаревшие данные (read-your-writes).
+    """
+
+    def process_request(self, request):
+        request.db_pinned = db_router.PIN_COOKIE_NAME in request.COOKIES
+        request._db_routing_token = db_router.begin_request(pinned=request.db_pinned)
+
+    def process_response(self, request, response):
+        token = getattr(request, '_db_routing_token', None)
+        if token is None:
+            return response
+        state = db_router.get_state()
+        wrote = request.method not in db_router.SAFE_METHODS or (state is not None and state.wrote)
+        db_router.end_request(token)
+        if wrote and db_router.replica_aliases():
+            response.set_cookie(
+                db_router.PIN_COOKIE_NAME,
+                '1',
+                max_age=getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 5),
+                httponly=True,
+                samesite='Lax',
+                secure=not settings.DEBUG,
+            )
+        return response
+
+
+class RequestProfilerMiddleware(MiddlewareMixin):
+    """
+    Профилирует запрос сотрудника по заголовку X-Profile-Request: 1 или ?_profile=1.
+    При выключенном REQUEST_PROFILING_ENABLED в цепочку не попадает.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        if profiling.is_profiling_requested(request) and request.user.is_staff:
+            request._request_profile = profiling.RequestProfile(request)
+            request._request_profile.start()
+
+    def process_response(self, request, response):
+        profile = getattr(request, '_request_profile', None)
+        if profile is not None:
+            profile.finish(response)
+        return response
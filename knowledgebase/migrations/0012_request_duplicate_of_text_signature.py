@@ -0,0 +1,30 @@
+# Generated by Django 5.1.3 on 2026-10-19 13:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0011_rename_knowledgeba_author_123456_idx_knowledgeba_author__3bd697_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='request',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='knowledgebase.request', verbose_name='Дубликат заявки'),
+        ),
+        migrations.AddField(
+            model_name='request',
+            name='text_signature',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['updated_at'], name='knowledgeba_updated_3551cc_idx'),
+        ),
+    ]
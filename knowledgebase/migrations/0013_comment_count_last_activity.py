@@ -0,0 +1,52 @@
+# Generated by Django 5.1.3 on 2026-10-19 13:35
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0012_request_duplicate_of_text_signature'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Последняя активность'),
+        ),
+        migrations.AddField(
+            model_name='request',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.AddField(
+            model_name='request',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Последняя активность'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['-comment_count'], name='knowledgeba_comment_152532_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['-last_activity_at'], name='knowledgeba_last_ac_58bc2c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['-comment_count'], name='knowledgeba_comment_2e71d9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['-last_activity_at'], name='knowledgeba_last_ac_7f5557_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 13:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0013_comment_count_last_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='source_key',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True, verbose_name='Ключ источника импорта'),
+        ),
+    ]
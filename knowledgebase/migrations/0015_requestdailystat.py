@@ -0,0 +1,32 @@
+# Generated by Django 5.1.3 on 2026-10-19 13:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0014_article_source_key'),
+        ('portal', '0002_userregistrationrequest_password_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('category', models.CharField(choices=[('Technical', 'Техническая'), ('Content', 'Контент'), ('Other', 'Другое'), ('Uncategorized', 'Без категории')], max_length=50, verbose_name='Категория')),
+                ('status', models.CharField(choices=[('New', 'Новая'), ('In Progress', 'В работе'), ('Completed', 'Завершена'), ('Cancelled', 'Отменена')], max_length=50, verbose_name='Статус')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='portal.department', verbose_name='Отдел')),
+            ],
+            options={
+                'verbose_name': 'Статистика заявок за день',
+                'verbose_name_plural': 'Статистика заявок по дням',
+                'indexes': [models.Index(fields=['date'], name='knowledgeba_date_9f0413_idx')],
+                'unique_together': {('date', 'category', 'status', 'department')},
+            },
+        ),
+    ]
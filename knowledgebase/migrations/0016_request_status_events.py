@@ -0,0 +1,55 @@
+# Generated by Django 5.1.3 on 2026-10-19 13:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def initialize_status_changed_at(apps, schema_editor):
+    # Для существующих заявок точного времени смены статуса нет, лучшая оценка — updated_at
+    Request = apps.get_model('knowledgebase', 'Request')
+    Request.objects.update(status_changed_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0015_requestdailystat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='request',
+            name='first_response_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Первая реакция'),
+        ),
+        migrations.AddField(
+            model_name='request',
+            name='status_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Статус изменен'),
+        ),
+        migrations.CreateModel(
+            name='RequestStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('New', 'Новая'), ('In Progress', 'В работе'), ('Completed', 'Завершена'), ('Cancelled', 'Отменена')], max_length=50, verbose_name='Из статуса')),
+                ('to_status', models.CharField(choices=[('New', 'Новая'), ('In Progress', 'В работе'), ('Completed', 'Завершена'), ('Cancelled', 'Отменена')], max_length=50, verbose_name='В статус')),
+                ('category', models.CharField(choices=[('Technical', 'Техническая'), ('Content', 'Контент'), ('Other', 'Другое'), ('Uncategorized', 'Без категории')], max_length=50, verbose_name='Категория')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время изменения')),
+                ('seconds_in_previous_status', models.PositiveIntegerField(verbose_name='Секунд в предыдущем статусе')),
+                ('seconds_since_created', models.PositiveIntegerField(verbose_name='Секунд с создания заявки')),
+                ('is_first_response', models.BooleanField(default=False, verbose_name='Первая реакция')),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_status_events', to=settings.AUTH_USER_MODEL, verbose_name='Изменил')),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='knowledgebase.request', verbose_name='Заявка')),
+            ],
+            options={
+                'verbose_name': 'Изменение статуса заявки',
+                'verbose_name_plural': 'История статусов заявок',
+                'ordering': ['changed_at'],
+                'indexes': [models.Index(fields=['request', 'changed_at'], name='knowledgeba_request_96a0c3_idx'), models.Index(fields=['changed_by', 'changed_at'], name='knowledgeba_changed_41e713_idx'), models.Index(fields=['category', 'changed_at'], name='knowledgeba_categor_cbd753_idx'), models.Index(fields=['from_status', 'changed_at'], name='knowledgeba_from_st_2ba35c_idx')],
+            },
+        ),
+        migrations.RunPython(initialize_status_changed_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.3 on 2026-10-19 13:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0017_request_assignee'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='knowledgeba_article_f66fa1_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='knowledgeba_request_5bbea2_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='request',
+            name='knowledgeba_status_3e5b5a_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='request',
+            name='knowledgeba_created_c5a4fa_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='request',
+            name='knowledgeba_assigne_b37208_idx',
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['article', 'created_at'], name='knowledgeba_article_4bcdf8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['request', 'created_at'], name='knowledgeba_request_112ed2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['user', 'created_at'], name='knowledgeba_user_id_62fcbb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['-created_at'], name='knowledgeba_created_48a649_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['status', '-created_at'], name='knowledgeba_status_ff5c89_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['created_by', '-created_at'], name='knowledgeba_created_934ff1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['assignee', 'status', '-created_at'], name='knowledgeba_assigne_051597_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated manually
+
+from django.db import migrations
+
+
+# icontains в PostgreSQL компилируется в UPPER(col::text) LIKE UPPER(%s),
+# поэтому триграммные индексы строятся по тому же выражению.
+TRIGRAM_INDEXES = [
+    ('knowledgebase_article_title_trgm', 'knowledgebase_article', 'title'),
+    ('knowledgebase_article_content_trgm', 'knowledgebase_article', 'content'),
+    ('knowledgebase_request_title_trgm', 'knowledgebase_request', 'title'),
+    ('knowledgebase_request_description_trgm', 'knowledgebase_request', 'description'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} '
+            f'USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0018_composite_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
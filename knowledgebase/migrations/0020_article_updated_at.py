@@ -0,0 +1,25 @@
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def initialize_updated_at(apps, schema_editor):
+    Article = apps.get_model('knowledgebase', 'Article')
+    Article.objects.update(updated_at=F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0019_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Обновлена'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(initialize_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.3 on 2026-10-19 13:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0020_article_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Название')),
+                ('command', models.CharField(max_length=100, verbose_name='Команда manage.py')),
+                ('arguments', models.JSONField(blank=True, default=list, verbose_name='Аргументы')),
+                ('schedule', models.CharField(help_text='Пять полей: минута час день месяц день_недели, либо @hourly/@daily/@weekly/@monthly', max_length=100, verbose_name='Расписание (cron)')),
+                ('enabled', models.BooleanField(default=True, verbose_name='Включена')),
+                ('next_run_at', models.DateTimeField(blank=True, null=True, verbose_name='Следующий запуск')),
+                ('locked_by', models.CharField(blank=True, editable=False, max_length=100, verbose_name='Выполняется узлом')),
+                ('locked_until', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Блокировка до')),
+                ('last_run_at', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Последний запуск')),
+                ('last_status', models.CharField(blank=True, choices=[('success', 'Успешно'), ('failed', 'Ошибка')], editable=False, max_length=20, verbose_name='Результат последнего запуска')),
+                ('last_duration', models.FloatField(blank=True, editable=False, null=True, verbose_name='Длительность, с')),
+                ('last_error', models.TextField(blank=True, editable=False, verbose_name='Последняя ошибка')),
+                ('run_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Запусков')),
+                ('failure_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Ошибок')),
+                ('total_duration', models.FloatField(default=0, editable=False, verbose_name='Суммарная длительность, с')),
+            ],
+            options={
+                'verbose_name': 'Периодическая задача',
+                'verbose_name_plural': 'Периодические задачи',
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['enabled', 'next_run_at'], name='knowledgeba_enabled_9481b3_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.1.3 on 2026-10-19 13:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0021_scheduledjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='requeststatusevent',
+            name='request',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='status_events', to='knowledgebase.request', verbose_name='Заявка'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedRequest',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('category', models.CharField(choices=[('Technical', 'Техническая'), ('Content', 'Контент'), ('Other', 'Другое'), ('Uncategorized', 'Без категории')], max_length=50)),
+                ('status', models.CharField(choices=[('New', 'Новая'), ('In Progress', 'В работе'), ('Completed', 'Завершена'), ('Cancelled', 'Отменена')], max_length=50)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('duplicate_of_id', models.BigIntegerField(blank=True, null=True, verbose_name='Дубликат заявки')),
+                ('comment_count', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('last_activity_at', models.DateTimeField(verbose_name='Последняя активность')),
+                ('status_changed_at', models.DateTimeField(verbose_name='Статус изменен')),
+                ('first_response_at', models.DateTimeField(blank=True, null=True, verbose_name='Первая реакция')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Перенесена в архив')),
+                ('assignee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Исполнитель')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Создатель')),
+            ],
+            options={
+                'verbose_name': 'Архивная заявка',
+                'verbose_name_plural': 'Архивные заявки',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='knowledgebase.archivedrequest')),
+            ],
+            options={
+                'verbose_name': 'Архивный комментарий',
+                'verbose_name_plural': 'Архивные комментарии',
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedrequest',
+            index=models.Index(fields=['-created_at'], name='knowledgeba_created_28ea08_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedrequest',
+            index=models.Index(fields=['created_by', '-created_at'], name='knowledgeba_created_45d31a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcomment',
+            index=models.Index(fields=['request', 'created_at'], name='knowledgeba_request_c740a7_idx'),
+        ),
+    ]
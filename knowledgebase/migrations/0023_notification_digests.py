@@ -0,0 +1,47 @@
+# Generated by Django 5.1.3 on 2026-10-19 14:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0022_request_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254, verbose_name='Получатель')),
+                ('frequency', models.CharField(choices=[('immediate', 'Сразу'), ('hourly', 'Сводка раз в час'), ('daily', 'Сводка раз в день')], max_length=20, verbose_name='Сводка')),
+                ('subject', models.CharField(max_length=255, verbose_name='Тема')),
+                ('message', models.TextField(verbose_name='Текст')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Создано')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+            ],
+            options={
+                'verbose_name': 'Событие уведомления',
+                'verbose_name_plural': 'События уведомлений',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['frequency', 'sent_at', 'recipient'], name='knowledgeba_frequen_5d046b_idx'), models.Index(fields=['sent_at'], name='knowledgeba_sent_at_bba0cf_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationPreference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('immediate', 'Сразу'), ('hourly', 'Сводка раз в час'), ('daily', 'Сводка раз в день')], default='immediate', max_length=20, verbose_name='Частота уведомлений')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_preference', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Настройка уведомлений',
+                'verbose_name_plural': 'Настройки уведомлений',
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.3 on 2026-10-19 14:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0023_notification_digests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+                ('slug', models.SlugField(allow_unicode=True, unique=True, verbose_name='Slug')),
+                ('article_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Статей')),
+            ],
+            options={
+                'verbose_name': 'Тег',
+                'verbose_name_plural': 'Теги',
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['-article_count'], name='knowledgeba_article_6713e7_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArticleTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0, verbose_name='Вес')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='article_tags', to='knowledgebase.article')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='article_tags', to='knowledgebase.tag')),
+            ],
+            options={
+                'verbose_name': 'Тег статьи',
+                'verbose_name_plural': 'Теги статей',
+            },
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='articles', through='knowledgebase.ArticleTag', to='knowledgebase.tag', verbose_name='Теги'),
+        ),
+        migrations.AddIndex(
+            model_name='articletag',
+            index=models.Index(fields=['tag', 'article'], name='knowledgeba_tag_id_e06275_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='articletag',
+            constraint=models.UniqueConstraint(fields=('article', 'tag'), name='unique_article_tag'),
+        ),
+    ]
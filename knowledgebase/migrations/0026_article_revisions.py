@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-19 14:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0025_record_versions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='Номер')),
+                ('title', models.CharField(max_length=200, verbose_name='Название')),
+                ('data', models.BinaryField(verbose_name='Данные (zlib)')),
+                ('is_snapshot', models.BooleanField(default=False, verbose_name='Полный снимок')),
+                ('size', models.PositiveIntegerField(verbose_name='Длина текста')),
+                ('content_hash', models.CharField(max_length=40, verbose_name='SHA-1 текста')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Создана')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='knowledgebase.article', verbose_name='Статья')),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор правки')),
+            ],
+            options={
+                'verbose_name': 'Ревизия статьи',
+                'verbose_name_plural': 'Ревизии статей',
+                'ordering': ['-number'],
+                'indexes': [models.Index(fields=['article', 'is_snapshot', 'number'], name='knowledgeba_article_57b2e3_idx')],
+                'constraints': [models.UniqueConstraint(fields=('article', 'number'), name='unique_article_revision')],
+            },
+        ),
+    ]
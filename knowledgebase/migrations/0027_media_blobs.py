@@ -0,0 +1,46 @@
+# Generated by Django 5.1.3 on 2026-10-19 14:17
+
+import django.utils.timezone
+import knowledgebase.media_storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0026_article_revisions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='article',
+            name='audio',
+            field=models.FileField(blank=True, null=True, storage=knowledgebase.media_storage.get_storage, upload_to='articles/audios/'),
+        ),
+        migrations.AlterField(
+            model_name='article',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=knowledgebase.media_storage.get_storage, upload_to='articles/images/'),
+        ),
+        migrations.AlterField(
+            model_name='article',
+            name='video',
+            field=models.FileField(blank=True, null=True, storage=knowledgebase.media_storage.get_storage, upload_to='articles/videos/'),
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Путь в хранилище')),
+                ('size', models.BigIntegerField(verbose_name='Размер, байт')),
+                ('ref_count', models.IntegerField(default=0, verbose_name='Ссылок из статей')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Загружен')),
+                ('touched_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Последняя загрузка')),
+            ],
+            options={
+                'verbose_name': 'Медиафайл',
+                'verbose_name_plural': 'Медиафайлы',
+                'indexes': [models.Index(fields=['ref_count', 'touched_at'], name='knowledgeba_ref_cou_cb6370_idx')],
+            },
+        ),
+    ]
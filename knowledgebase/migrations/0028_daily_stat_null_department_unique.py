@@ -0,0 +1,43 @@
+# Generated by Django 5.1.3 on 2026-10-19 14:32
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def merge_duplicate_rows(apps, schema_editor):
+    """
+    Схлопывает дубликаты строк без отдела перед созданием индекса.
+    Каждую из них увеличивали одни и те же последующие изменения, поэтому
+    сохраняется наибольший счетчик; точные значения за затронутые дни
+    восстанавливает rollup_request_stats.
+    """
+    RequestDailyStat = apps.get_model('knowledgebase', 'RequestDailyStat')
+    duplicates = (
+        RequestDailyStat.objects.filter(department__isnull=True)
+        .values('date', 'category', 'status')
+        .annotate(rows=Count('id'), top=Max('count'))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates:
+        rows = RequestDailyStat.objects.filter(
+            department__isnull=True, date=group['date'], category=group['category'], status=group['status'],
+        ).order_by('id')
+        keep = rows.first()
+        rows.exclude(pk=keep.pk).delete()
+        RequestDailyStat.objects.filter(pk=keep.pk).update(count=group['top'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0027_media_blobs'),
+        ('portal', '0003_userprofile_open_ticket_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='requestdailystat',
+            constraint=models.UniqueConstraint(condition=models.Q(('department__isnull', True)), fields=('date', 'category', 'status'), name='unique_daily_stat_without_department'),
+        ),
+    ]
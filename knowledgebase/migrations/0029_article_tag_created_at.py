@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-19 14:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0028_daily_stat_null_department_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articletag',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Назначен'),
+        ),
+    ]
@@ -3,14 +3,18 @@ from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from .concurrency import VersionedModel
+from .duplicates import text_signature
+from .media_storage import get_storage
 
-class Article(models.Model):
+
+class Article(VersionedModel):
     title = models.CharField(max_length=200)
     content = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
-    image = models.ImageField(upload_to='articles/images/', blank=True, null=True)
-    video = models.FileField(upload_to='articles/videos/', blank=True, null=True)
-    audio = models.FileField(upload_to='articles/audios/', blank=True, null=True)
+    image = models.ImageField(upload_to='articles/images/', storage=get_storage, blank=True, null=True)
+    video = models.FileField(upload_to='articles/videos/', storage=get_storage, blank=True, null=True)
+    audio = models.FileField(upload_to='articles/audios/', storage=get_storage, blank=True, null=True)
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -19,6 +23,24 @@ class Article(models.Model):
         related_name='articles',
         verbose_name='Автор'
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлена')
+    comment_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев')
+    last_activity_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name='Последняя активность')
+    source_key = models.CharField(
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Ключ источника импорта'
+    )
+    tags = models.ManyToManyField(
+        'Tag',
+        through='ArticleTag',
+        related_name='articles',
+        blank=True,
+        verbose_name='Теги'
+    )
 
     class Meta:
         ordering = ['-pub_date']
@@ -26,6 +48,8 @@ class Article(models.Model):
             models.Index(fields=['-pub_date']),
             models.Index(fields=['title']),
             models.Index(fields=['author']),
+            models.Index(fields=['-comment_count']),
+            models.Index(fields=['-last_activity_at']),
         ]
         verbose_name = 'Статья'
         verbose_name_plural = 'Статьи'
@@ -34,7 +58,101 @@ class Article(models.Model):
         return self.title
 
 
-class Request(models.Model):
+class ArticleRevision(models.Model):
+    """Ревизия статьи: полный снимок текста или сжатая дельта к предыдущей ревизии"""
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='revisions', verbose_name='Статья')
+    number = models.PositiveIntegerField(verbose_name='Номер')
+    title = models.CharField(max_length=200, verbose_name='Название')
+    data = models.BinaryField(verbose_name='Данные (zlib)')
+    is_snapshot = models.BooleanField(default=False, verbose_name='Полный снимок')
+    size = models.PositiveIntegerField(verbose_name='Длина текста')
+    content_hash = models.CharField(max_length=40, verbose_name='SHA-1 текста')
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Автор правки'
+    )
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Создана')
+
+    class Meta:
+        ordering = ['-number']
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'number'], name='unique_article_revision'),
+        ]
+        indexes = [
+            models.Index(fields=['article', 'is_snapshot', 'number']),
+        ]
+        verbose_name = 'Ревизия статьи'
+        verbose_name_plural = 'Ревизии статей'
+
+    def __str__(self):
+        return f"{self.article_id} #{self.number}"
+
+
+class MediaBlob(models.Model):
+    """Файл медиа в хранилище с адресацией по содержимому и число ссылок на него из статей"""
+    name = models.CharField(max_length=255, unique=True, verbose_name='Путь в хранилище')
+    size = models.BigIntegerField(verbose_name='Размер, байт')
+    ref_count = models.IntegerField(default=0, verbose_name='Ссылок из статей')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Загружен')
+    touched_at = models.DateTimeField(default=timezone.now, verbose_name='Последняя загрузка')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'touched_at']),
+        ]
+        verbose_name = 'Медиафайл'
+        verbose_name_plural = 'Медиафайлы'
+
+    def __str__(self):
+        return self.name
+
+
+class Tag(models.Model):
+    """Ключевое слово статьи, назначаемое командой retag_articles по TF-IDF"""
+    name = models.CharField(max_length=50, unique=True, verbose_name='Название')
+    slug = models.SlugField(max_length=50, unique=True, allow_unicode=True, verbose_name='Slug')
+    # Пересчитывается при перерасчете тегов, чтобы облако тегов не агрегировало связи
+    article_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Статей')
+
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['-article_count']),
+        ]
+        verbose_name = 'Тег'
+        verbose_name_plural = 'Теги'
+
+    def __str__(self):
+        return self.name
+
+
+class ArticleTag(models.Model):
+    """Связь статьи и тега с весом TF-IDF; индексы в обе стороны"""
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='article_tags')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='article_tags')
+    score = models.FloatField(default=0, verbose_name='Вес')
+    # Связи пересоздаются при каждом пересчете: по максимуму строятся ETag страниц
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Назначен')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'tag'], name='unique_article_tag'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', 'article']),
+        ]
+        verbose_name = 'Тег статьи'
+        verbose_name_plural = 'Теги статей'
+
+    def __str__(self):
+        return f"{self.article_id}: {self.tag_id}"
+
+
+class Request(VersionedModel):
     STATUS_CHOICES = [
         ('New', 'Новая'),
         ('In Progress', 'В работе'),
@@ -71,20 +189,133 @@ class Request(models.Model):
         related_name='requests',
         verbose_name='Создатель'
     )
+    assignee = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='assigned_requests',
+        verbose_name='Исполнитель'
+    )
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='duplicates',
+        verbose_name='Дубликат заявки'
+    )
+    text_signature = models.BinaryField(null=True, blank=True, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев')
+    last_activity_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name='Последняя активность')
+    status_changed_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name='Статус изменен')
+    first_response_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Первая реакция')
 
     class Meta:
         indexes = [
-            models.Index(fields=['status']),
+            # Пути доступа страницы заявок и кабинетов: фильтр + сортировка по дате создания
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['status', '-created_at']),
             models.Index(fields=['category']),
-            models.Index(fields=['created_by']),
+            models.Index(fields=['created_by', '-created_at']),
+            models.Index(fields=['assignee', 'status', '-created_at']),
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['-comment_count']),
+            models.Index(fields=['-last_activity_at']),
         ]
         verbose_name = 'Заявка'
         verbose_name_plural = 'Заявки'
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'title', 'description'} & set(update_fields):
+            self.text_signature = text_signature(self.title, self.description)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'text_signature'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.title
 
 
+class RequestStatusEvent(models.Model):
+    """Переход заявки между статусами с посчитанным при записи временем в предыдущем статусе"""
+    # Без ограничения внешнего ключа: история остается для SLA-отчетов после
+    # переноса заявки в архив (id заявки в архиве сохраняется)
+    request = models.ForeignKey(
+        Request,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='status_events',
+        verbose_name='Заявка'
+    )
+    from_status = models.CharField(max_length=50, choices=Request.STATUS_CHOICES, verbose_name='Из статуса')
+    to_status = models.CharField(max_length=50, choices=Request.STATUS_CHOICES, verbose_name='В статус')
+    category = models.CharField(max_length=50, choices=Request.CATEGORY_CHOICES, verbose_name='Категория')
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='request_status_events',
+        verbose_name='Изменил'
+    )
+    changed_at = models.DateTimeField(default=timezone.now, verbose_name='Время изменения')
+    seconds_in_previous_status = models.PositiveIntegerField(verbose_name='Секунд в предыдущем статусе')
+    seconds_since_created = models.PositiveIntegerField(verbose_name='Секунд с создания заявки')
+    is_first_response = models.BooleanField(default=False, verbose_name='Первая реакция')
+
+    class Meta:
+        ordering = ['changed_at']
+        indexes = [
+            models.Index(fields=['request', 'changed_at']),
+            models.Index(fields=['changed_by', 'changed_at']),
+            models.Index(fields=['category', 'changed_at']),
+            models.Index(fields=['from_status', 'changed_at']),
+        ]
+        verbose_name = 'Изменение статуса заявки'
+        verbose_name_plural = 'История статусов заявок'
+
+    def __str__(self):
+        return f"{self.request_id}: {self.from_status} → {self.to_status}"
+
+
+class RequestDailyStat(models.Model):
+    """Число заявок, созданных за день, в разрезе категории, текущего статуса и отдела автора"""
+    date = models.DateField(verbose_name='Дата')
+    category = models.CharField(max_length=50, choices=Request.CATEGORY_CHOICES, verbose_name='Категория')
+    status = models.CharField(max_length=50, choices=Request.STATUS_CHOICES, verbose_name='Статус')
+    department = models.ForeignKey(
+        'portal.Department',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Отдел'
+    )
+    count = models.IntegerField(default=0, verbose_name='Количество')
+
+    class Meta:
+        unique_together = [('date', 'category', 'status', 'department')]
+        constraints = [
+            # NULL в уникальном индексе не совпадают друг с другом: строку без отдела
+            # ограничивает отдельный частичный индекс
+            models.UniqueConstraint(
+                fields=['date', 'category', 'status'],
+                condition=models.Q(department__isnull=True),
+                name='unique_daily_stat_without_department',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+        verbose_name = 'Статистика заявок за день'
+        verbose_name_plural = 'Статистика заявок по дням'
+
+    def __str__(self):
+        return f"{self.date} {self.category}/{self.status}: {self.count}"
+
+
 class Comment(models.Model):
     text = models.TextField()
     article = models.ForeignKey(
@@ -114,8 +345,9 @@ class Comment(models.Model):
         ordering = ['created_at']
         indexes = [
             models.Index(fields=['created_at']),
-            models.Index(fields=['article']),
-            models.Index(fields=['request']),
+            models.Index(fields=['article', 'created_at']),
+            models.Index(fields=['request', 'created_at']),
+            models.Index(fields=['user', 'created_at']),
         ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
@@ -136,3 +368,182 @@ class Comment(models.Model):
         return self.text[:50]
 
 
+
+
+class ArchivedRequest(models.Model):
+    """Закрытая заявка, перенесенная из рабочей таблицы; id совпадает с исходным"""
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    category = models.CharField(max_length=50, choices=Request.CATEGORY_CHOICES)
+    status = models.CharField(max_length=50, choices=Request.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Создатель'
+    )
+    assignee = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Исполнитель'
+    )
+    duplicate_of_id = models.BigIntegerField(null=True, blank=True, verbose_name='Дубликат заявки')
+    comment_count = models.PositiveIntegerField(default=0, verbose_name='Комментариев')
+    last_activity_at = models.DateTimeField(verbose_name='Последняя активность')
+    status_changed_at = models.DateTimeField(verbose_name='Статус изменен')
+    first_response_at = models.DateTimeField(null=True, blank=True, verbose_name='Первая реакция')
+    version = models.PositiveIntegerField(default=1, verbose_name='Версия')
+    archived_at = models.DateTimeField(default=timezone.now, verbose_name='Перенесена в архив')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['created_by', '-created_at']),
+        ]
+        verbose_name = 'Архивная заявка'
+        verbose_name_plural = 'Архивные заявки'
+
+    def __str__(self):
+        return self.title
+
+
+class ArchivedComment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    request = models.ForeignKey(
+        ArchivedRequest,
+        on_delete=models.CASCADE,
+        related_name='comments',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    text = models.TextField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['request', 'created_at']),
+        ]
+        verbose_name = 'Архивный комментарий'
+        verbose_name_plural = 'Архивные комментарии'
+
+    def __str__(self):
+        return self.text[:50]
+
+
+class ScheduledJob(models.Model):
+    """Периодическая задача: management-команда по cron-расписанию"""
+    STATUS_CHOICES = [
+        ('success', 'Успешно'),
+        ('failed', 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=100, unique=True, verbose_name='Название')
+    command = models.CharField(max_length=100, verbose_name='Команда manage.py')
+    arguments = models.JSONField(default=list, blank=True, verbose_name='Аргументы')
+    schedule = models.CharField(
+        max_length=100,
+        verbose_name='Расписание (cron)',
+        help_text='Пять полей: минута час день месяц день_недели, либо @hourly/@daily/@weekly/@monthly',
+    )
+    enabled = models.BooleanField(default=True, verbose_name='Включена')
+    next_run_at = models.DateTimeField(null=True, blank=True, verbose_name='Следующий запуск')
+
+    locked_by = models.CharField(max_length=100, blank=True, editable=False, verbose_name='Выполняется узлом')
+    locked_until = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Блокировка до')
+
+    last_run_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Последний запуск')
+    last_status = models.CharField(max_length=20, choices=STATUS_CHOICES, blank=True, editable=False,
+                                   verbose_name='Результат последнего запуска')
+    last_duration = models.FloatField(null=True, blank=True, editable=False, verbose_name='Длительность, с')
+    last_error = models.TextField(blank=True, editable=False, verbose_name='Последняя ошибка')
+    run_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Запусков')
+    failure_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Ошибок')
+    total_duration = models.FloatField(default=0, editable=False, verbose_name='Суммарная длительность, с')
+
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['enabled', 'next_run_at']),
+        ]
+        verbose_name = 'Периодическая задача'
+        verbose_name_plural = 'Периодические задачи'
+
+    def __str__(self):
+        return f"{self.name} ({self.schedule})"
+
+    def clean(self):
+        from .scheduler import CronSchedule
+        try:
+            CronSchedule(self.schedule)
+        except ValueError as e:
+            raise ValidationError({'schedule': str(e)})
+
+    @property
+    def average_duration(self):
+        return self.total_duration / self.run_count if self.run_count else None
+
+
+NOTIFICATION_FREQUENCY_CHOICES = [
+    ('immediate', 'Сразу'),
+    ('hourly', 'Сводка раз в час'),
+    ('daily', 'Сводка раз в день'),
+]
+
+
+class NotificationPreference(models.Model):
+    """Как часто пользователь получает уведомления о заявках и комментариях"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='notification_preference',
+        verbose_name='Пользователь'
+    )
+    frequency = models.CharField(
+        max_length=20,
+        choices=NOTIFICATION_FREQUENCY_CHOICES,
+        default='immediate',
+        verbose_name='Частота уведомлений'
+    )
+
+    class Meta:
+        verbose_name = 'Настройка уведомлений'
+        verbose_name_plural = 'Настройки уведомлений'
+
+    def __str__(self):
+        return f"{self.user} — {self.get_frequency_display()}"
+
+
+class NotificationEvent(models.Model):
+    """Уведомление, ожидающее отправки в сводке получателю"""
+    recipient = models.EmailField(verbose_name='Получатель')
+    frequency = models.CharField(max_length=20, choices=NOTIFICATION_FREQUENCY_CHOICES, verbose_name='Сводка')
+    subject = models.CharField(max_length=255, verbose_name='Тема')
+    message = models.TextField(verbose_name='Текст')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Создано')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='Отправлено')
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['frequency', 'sent_at', 'recipient']),
+            models.Index(fields=['sent_at']),
+        ]
+        verbose_name = 'Событие уведомления'
+        verbose_name_plural = 'События уведомлений'
+
+    def __str__(self):
+        return f"{self.recipient}: {self.subject}"
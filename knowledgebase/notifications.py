@@ -0,0 +1,127 @@
+"""
+Доставка уведомлений с учетом настроек получателя.
+
+Для каждого получателя определяется частота (``NotificationPreference``;
+для ``ADMIN_EMAIL`` — ``settings.ADMIN_NOTIFICATION_FREQUENCY``):
+
+* ``immediate`` — письмо уходит сразу; несколько уведомлений одному
+  получателю за один вызов объединяются в одно письмо;
+* ``hourly`` / ``daily`` — уведомление сохраняется в ``NotificationEvent``,
+  а команда ``send_notification_digests`` по расписанию отправляет каждому
+  получателю одно письмо-сводку за окно.
+
+Все письма одного вызова отправляются через одно SMTP-соединение.
+"""
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from . import metrics
+from .models import NotificationEvent
+
+
+IMMEDIATE = 'immediate'
+DIGEST_FREQUENCIES = ('hourly', 'daily')
+DIGEST_TITLES = {'hourly': 'за час', 'daily': 'за день'}
+SEPARATOR = '\n\n' + '—' * 30 + '\n\n'
+
+
+def recipient_frequencies(emails):
+    """Частота уведомлений для каждого адреса одним запросом"""
+    frequencies = {}
+    rows = (
+        get_user_model().objects.filter(email__in=emails)
+        .values_list('email', 'notification_preference__frequency')
+    )
+    for email, frequency in rows:
+        if frequency and frequencies.get(email, IMMEDIATE) == IMMEDIATE:
+            frequencies[email] = frequency
+    admin_email = getattr(settings, 'ADMIN_EMAIL', None)
+    if admin_email in emails:
+        frequencies[admin_email] = getattr(settings, 'ADMIN_NOTIFICATION_FREQUENCY', IMMEDIATE)
+    return {email: frequencies.get(email, IMMEDIATE) for email in emails}
+
+
+def _message(recipient, subject, body):
+    return EmailMessage(subject=subject, body=body, from_email=settings.DEFAULT_FROM_EMAIL, to=[recipient])
+
+
+def _combined(recipient, items, title):
+    """Одно письмо из нескольких уведомлений (subject, message)"""
+    if len(items) == 1:
+        return _message(recipient, *items[0])
+    body = SEPARATOR.join(f'{subject}\n\n{message}' for subject, message in items)
+    return _message(recipient, f'{title}: {len(items)}', body)
+
+
+def notify(items):
+    """
+    Отправляет или откладывает уведомления.
+    items — последовательность (получатель, тема, текст).
+    """
+    items = [item for item in items if item[0]]
+    if not items:
+        return
+    frequencies = recipient_frequencies({recipient for recipient, _, _ in items})
+
+    immediate = defaultdict(list)
+    deferred = []
+    for recipient, subject, message in items:
+        frequency = frequencies[recipient]
+        if frequency == IMMEDIATE:
+            immediate[recipient].append((subject, message))
+        else:
+            deferred.append(NotificationEvent(
+                recipient=recipient, frequency=frequency, subject=subject[:255], message=message,
+            ))
+
+    if deferred:
+        NotificationEvent.objects.bulk_create(deferred)
+    if immediate:
+        messages = [
+            _combined(recipient, recipient_items, 'Уведомления')
+            for recipient, recipient_items in immediate.items()
+        ]
+        sent = get_connection(fail_silently=True).send_messages(messages) or 0
+        metrics.record_emails(IMMEDIATE, len(messages), sent)
+
+
+def send_digests(frequency, now=None):
+    """
+    Отправляет накопленные уведомления с частотой frequency: одно письмо на получателя.
+    Возвращает (число получателей, число уведомлений).
+    """
+    now = now or timezone.now()
+    events = list(
+        NotificationEvent.objects.filter(frequency=frequency, sent_at__isnull=True, created_at__lte=now)
+        .order_by('recipient', 'created_at')
+        .values_list('id', 'recipient', 'subject', 'message')
+    )
+    if not events:
+        return 0, 0
+
+    by_recipient = defaultdict(list)
+    for _, recipient, subject, message in events:
+        by_recipient[recipient].append((subject, message))
+    title = f'Сводка уведомлений {DIGEST_TITLES.get(frequency, "")}'.strip()
+    messages = []
+    for recipient, items in by_recipient.items():
+        message = _combined(recipient, items, title)
+        if len(items) == 1:
+            message.subject = f'{title}: {message.subject}'
+        messages.append(message)
+
+    # Ошибка SMTP пробрасывается: события остаются неотправленными до следующего запуска
+    get_connection().send_messages(messages)
+    NotificationEvent.objects.filter(pk__in=[event[0] for event in events]).update(sent_at=now)
+    return len(by_recipient), len(events)
+
+
+def purge_sent(older_than_days):
+    cutoff = timezone.now() - datetime.timedelta(days=older_than_days)
+    deleted, _ = NotificationEvent.objects.filter(sent_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,164 @@
+"""
+Профилирование отдельных запросов по требованию сотрудника.
+
+Запрос профилируется, только если его отправил сотрудник (is_staff) с заголовком
+``X-Profile-Request: 1`` или параметром ``?_profile=1``. Для каждого такого запроса
+в ``settings.REQUEST_PROFILE_DIR`` сохраняются:
+
+* ``<id>.prof``   — статистика cProfile (открывается pstats/snakeviz);
+* ``<id>.folded`` — свернутые стеки сэмплера для flamegraph.pl/speedscope;
+* ``<id>.json``   — метаданные: view, число и время SQL-запросов, длительность.
+
+Если ``REQUEST_PROFILING_ENABLED`` выключен, middleware исключается из цепочки
+при старте и не добавляет накладных расходов.
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+
+PROFILE_HEADER = 'HTTP_X_PROFILE_REQUEST'
+PROFILE_PARAM = '_profile'
+PROFILE_KINDS = {
+    'prof': 'application/octet-stream',
+    'folded': 'text/plain; charset=utf-8',
+}
+
+
+def profile_dir():
+    return Path(settings.REQUEST_PROFILE_DIR)
+
+
+def is_profiling_requested(request):
+    return request.META.get(PROFILE_HEADER) == '1' or request.GET.get(PROFILE_PARAM) == '1'
+
+
+class StackSampler(threading.Thread):
+    """Периодически снимает стек потока запроса и считает одинаковые стеки"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='request-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        own_file = __file__
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                if code.co_filename != own_file:
+                    names.append(f'{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}')
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class QueryCounter:
+    """Обертка execute_wrapper: число и суммарное время SQL-запросов"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class RequestProfile:
+    def __init__(self, request):
+        self.request = request
+        self.id = time.strftime('%Y%m%d-%H%M%S') + '-' + uuid.uuid4().hex[:8]
+        self.queries = QueryCounter()
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(
+            threading.get_ident(),
+            getattr(settings, 'REQUEST_PROFILE_SAMPLE_INTERVAL', 0.005),
+        )
+        self._stack = ExitStack()
+
+    def start(self):
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self.queries))
+        self.sampler.start()
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    def finish(self, response):
+        self.profiler.disable()
+        duration = time.perf_counter() - self.started
+        self.sampler.stop()
+        self._stack.close()
+
+        match = getattr(self.request, 'resolver_match', None)
+        meta = {
+            'id': self.id,
+            'created_at': time.time(),
+            'method': self.request.method,
+            'path': self.request.get_full_path(),
+            'view': (match.view_name or match._func_path) if match else '',
+            'status': response.status_code,
+            'user': self.request.user.get_username(),
+            'duration_ms': round(duration * 1000, 2),
+            'sql_count': self.queries.count,
+            'sql_ms': round(self.queries.seconds * 1000, 2),
+            'samples': sum(self.sampler.stacks.values()),
+        }
+
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        self.profiler.dump_stats(directory / f'{self.id}.prof')
+        (directory / f'{self.id}.folded').write_text(self.sampler.collapsed(), encoding='utf-8')
+        (directory / f'{self.id}.json').write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+        prune_profiles(getattr(settings, 'REQUEST_PROFILE_KEEP', 100))
+
+        response['X-Profile-Id'] = self.id
+        return meta
+
+
+def recent_profiles(limit=None):
+    """Метаданные сохраненных профилей, новые первыми"""
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    files = sorted(directory.glob('*.json'), key=os.path.getmtime, reverse=True)
+    profiles = []
+    for path in files[:limit]:
+        try:
+            profiles.append(json.loads(path.read_text(encoding='utf-8')))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def prune_profiles(keep):
+    directory = profile_dir()
+    files = sorted(directory.glob('*.json'), key=os.path.getmtime, reverse=True)
+    for path in files[keep:]:
+        for suffix in ('.json', *(f'.{kind}' for kind in PROFILE_KINDS)):
+            path.with_suffix(suffix).unlink(missing_ok=True)
@@ -0,0 +1,133 @@
+"""
+История изменений статей с хранением правок в виде дельт.
+
+Каждая ревизия хранит название и сжатое (zlib) содержимое:
+
+* снимок — полный текст статьи;
+* дельта — построчная разница с предыдущей ревизией: ссылки на неизменные
+  диапазоны строк предыдущего текста и вставленный текст.
+
+Размер дельты пропорционален объему правки, а не размеру статьи. Полный
+снимок пишется для первой ревизии, каждые ``SNAPSHOT_EVERY`` ревизий и когда
+дельта не меньше снимка, поэтому восстановление любой ревизии — это один
+снимок и не больше ``SNAPSHOT_EVERY - 1`` дельт, прочитанных одним запросом.
+"""
+import difflib
+import hashlib
+import json
+import zlib
+
+from .models import ArticleRevision
+
+
+SNAPSHOT_EVERY = 20
+
+
+def content_hash(content):
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def encode_delta(previous, current):
+    """Дельта current относительно previous: [[0, начало, конец] | [1, текст], ...]"""
+    old_lines = previous.splitlines(keepends=True)
+    new_lines = current.splitlines(keepends=True)
+    operations = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            operations.append([0, i1, i2])
+        elif j2 > j1:
+            operations.append([1, ''.join(new_lines[j1:j2])])
+    return json.dumps(operations, ensure_ascii=False, separators=(',', ':'))
+
+
+def apply_delta(previous, delta):
+    old_lines = previous.splitlines(keepends=True)
+    parts = []
+    for operation in json.loads(delta):
+        if operation[0] == 0:
+            parts.extend(old_lines[operation[1]:operation[2]])
+        else:
+            parts.append(operation[1])
+    return ''.join(parts)
+
+
+def _compress(text):
+    return zlib.compress(text.encode('utf-8'), 9)
+
+
+def _decompress(data):
+    return zlib.decompress(bytes(data)).decode('utf-8')
+
+
+def latest_revision(article_id):
+    return ArticleRevision.objects.filter(article_id=article_id).order_by('-number').first()
+
+
+def record_revision(article, previous=None, author_id=None):
+    """
+    Сохраняет текущее состояние статьи как новую ревизию.
+    previous — (название, текст) до изменения; если история пуста или последняя
+    ревизия не совпадает с ним (статью меняли в обход истории), сначала
+    сохраняется снимок previous.
+    """
+    latest = latest_revision(article.pk)
+    if previous is None:
+        base = revision_content(article.pk, latest.number) if latest else None
+    else:
+        base = previous[1]
+        if latest is None or latest.content_hash != content_hash(base):
+            latest = _create(article, latest, *previous, force_snapshot=True)
+    return _create(article, latest, article.title, article.content, base=base, author_id=author_id)
+
+
+def _create(article, latest, title, content, base=None, author_id=None, force_snapshot=False):
+    number = latest.number + 1 if latest else 1
+    snapshot = _compress(content)
+    data, is_snapshot = snapshot, True
+    if not force_snapshot and latest is not None:
+        last_snapshot = (
+            ArticleRevision.objects.filter(article_id=article.pk, is_snapshot=True)
+            .order_by('-number').values_list('number', flat=True).first()
+        )
+        if last_snapshot is not None and number - last_snapshot < SNAPSHOT_EVERY:
+            delta = _compress(encode_delta(base, content))
+            if len(delta) < len(snapshot):
+                data, is_snapshot = delta, False
+    return ArticleRevision.objects.create(
+        article_id=article.pk,
+        number=number,
+        title=title,
+        data=data,
+        is_snapshot=is_snapshot,
+        size=len(content),
+        content_hash=content_hash(content),
+        author_id=author_id,
+    )
+
+
+def revision_content(article_id, number):
+    """Текст ревизии: ближайший снимок и дельты после него"""
+    snapshot = (
+        ArticleRevision.objects.filter(article_id=article_id, is_snapshot=True, number__lte=number)
+        .order_by('-number').values_list('number', flat=True).first()
+    )
+    if snapshot is None:
+        raise ArticleRevision.DoesNotExist
+    chain = (
+        ArticleRevision.objects.filter(article_id=article_id, number__gte=snapshot, number__lte=number)
+        .order_by('number').values_list('is_snapshot', 'data')
+    )
+    content = None
+    for is_snapshot, data in chain:
+        text = _decompress(data)
+        content = text if is_snapshot else apply_delta(content, text)
+    return content
+
+
+def revision_diff(article_id, number, against=None):
+    """Построчный unified diff ревизии number относительно against (по умолчанию — предыдущей)"""
+    against = number - 1 if against is None else against
+    old = revision_content(article_id, against).splitlines() if against >= 1 else []
+    new = revision_content(article_id, number).splitlines()
+    return list(difflib.unified_diff(old, new, f'#{against}', f'#{number}', lineterm=''))
@@ -0,0 +1,270 @@
+"""
+Встроенный планировщик периодических задач.
+
+Задачи (``ScheduledJob``) хранятся в базе и запускают management-команды по
+cron-расписанию. Процесс ``manage.py run_scheduler`` можно запускать на
+нескольких узлах: каждую задачу захватывает ровно один узел условным UPDATE
+(аренда ``locked_until``), поэтому блокировка работает на любой СУБД. Пока
+команда выполняется, узел продлевает аренду из отдельного потока, а упавший
+узел освобождает задачу по истечении аренды. Захваченные задачи выполняются
+в пуле потоков; длительность и ошибки копятся в строке задачи.
+"""
+import calendar
+import datetime
+import io
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ScheduledJob
+
+
+ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+}
+FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def _parse_field(value, low, high):
+    allowed = set()
+    for part in value.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f'Неверный шаг: {value}')
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(bound) for bound in part.split('-', 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f'Значение вне диапазона {low}-{high}: {value}')
+        allowed.update(range(start, end + 1, step))
+    return allowed
+
+
+class CronSchedule:
+    """Cron-выражение из пяти полей; день недели 0 или 7 — воскресенье"""
+
+    def __init__(self, expression):
+        expression = ALIASES.get(expression.strip(), expression)
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError('Ожидается пять полей: минута час день месяц день_недели')
+        try:
+            self.minutes, self.hours, self.days, self.months, self.weekdays = (
+                _parse_field(field, low, high) for field, (low, high) in zip(fields, FIELD_RANGES)
+            )
+        except ValueError as e:
+            raise ValueError(f'Неверное расписание «{expression}»: {e}')
+        if 7 in self.weekdays:
+            self.weekdays = (self.weekdays - {7}) | {0}
+        # Как в cron: если ограничены и день месяца, и день недели, достаточно любого
+        self.any_day = fields[2] != '*' and fields[4] != '*'
+
+    def _day_matches(self, moment):
+        weekday = (moment.weekday() + 1) % 7
+        if self.any_day:
+            return moment.day in self.days or weekday in self.weekdays
+        return moment.day in self.days and weekday in self.weekdays
+
+    def next_after(self, moment):
+        """Ближайший момент строго после moment (с точностью до минуты)"""
+        moment = moment.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = moment + datetime.timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                days_left = calendar.monthrange(moment.year, moment.month)[1] - moment.day + 1
+                moment = (moment + datetime.timedelta(days=days_left)).replace(hour=0, minute=0)
+            elif not self._day_matches(moment):
+                moment = (moment + datetime.timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + datetime.timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += datetime.timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError('Расписание не срабатывает в ближайшие пять лет')
+
+
+def next_run(schedule, after=None):
+    """Следующий запуск в текущем часовом поясе проекта"""
+    local = timezone.localtime(after or timezone.now()).replace(tzinfo=None)
+    return timezone.make_aware(CronSchedule(schedule).next_after(local))
+
+
+def node_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def sync_default_jobs(definitions=None):
+    """Создает задачи из settings.SCHEDULED_JOBS, не трогая уже существующие"""
+    created = 0
+    for definition in definitions if definitions is not None else getattr(settings, 'SCHEDULED_JOBS', []):
+        _, was_created = ScheduledJob.objects.get_or_create(
+            name=definition['name'],
+            defaults={
+                'command': definition['command'],
+                'arguments': definition.get('arguments', []),
+                'schedule': definition['schedule'],
+                'next_run_at': next_run(definition['schedule']),
+            },
+        )
+        created += was_created
+    return created
+
+
+def _lease():
+    return datetime.timedelta(seconds=getattr(settings, 'SCHEDULER_LEASE_SECONDS', 300))
+
+
+def claim_due_jobs(node, now=None, limit=None):
+    """Захватывает созревшие задачи; задачу получает только один узел"""
+    now = now or timezone.now()
+    lease = _lease()
+    free = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    candidates = (
+        ScheduledJob.objects.filter(enabled=True, next_run_at__lte=now)
+        .filter(free)
+        .order_by('next_run_at')
+        .values_list('pk', flat=True)
+    )
+    claimed = []
+    for pk in candidates[:limit] if limit else candidates:
+        if ScheduledJob.objects.filter(pk=pk, enabled=True, next_run_at__lte=now).filter(free).update(
+            locked_by=node, locked_until=now + lease,
+        ):
+            claimed.append(pk)
+    return claimed
+
+
+def renew_lease(pk, node):
+    """Продлевает аренду задачи; False, если задача уже не принадлежит узлу"""
+    return bool(
+        ScheduledJob.objects.filter(pk=pk, locked_by=node).update(locked_until=timezone.now() + _lease())
+    )
+
+
+class LeaseKeeper(threading.Thread):
+    """Поток, продлевающий аренду каждую треть ее срока, пока выполняется команда"""
+
+    def __init__(self, pk, node):
+        super().__init__(name=f'scheduler-lease-{pk}', daemon=True)
+        self.pk = pk
+        self.node = node
+        self.finished = threading.Event()
+
+    def run(self):
+        interval = _lease().total_seconds() / 3
+        try:
+            while not self.finished.wait(interval):
+                try:
+                    if not renew_lease(self.pk, self.node):
+                        return
+                except Exception:
+                    traceback.print_exc()
+        finally:
+            close_old_connections()
+
+    def stop(self):
+        self.finished.set()
+        self.join()
+
+
+def run_job(pk, node):
+    """Выполняет захваченную задачу и записывает результат и метрики"""
+    close_old_connections()
+    try:
+        job = ScheduledJob.objects.get(pk=pk, locked_by=node)
+    except ScheduledJob.DoesNotExist:
+        return None
+
+    started_at = timezone.now()
+    started = time.perf_counter()
+    output = io.StringIO()
+    error = ''
+    keeper = LeaseKeeper(pk, node)
+    keeper.start()
+    try:
+        call_command(job.command, *job.arguments, stdout=output, stderr=output)
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        keeper.stop()
+    duration = time.perf_counter() - started
+
+    try:
+        following = next_run(job.schedule, started_at)
+    except ValueError:
+        following = None
+    ScheduledJob.objects.filter(pk=pk, locked_by=node).update(
+        last_run_at=started_at,
+        last_status='failed' if error else 'success',
+        last_duration=duration,
+        last_error=error[-5000:],
+        run_count=F('run_count') + 1,
+        failure_count=F('failure_count') + (1 if error else 0),
+        total_duration=F('total_duration') + duration,
+        next_run_at=following,
+        locked_by='',
+        locked_until=None,
+    )
+    close_old_connections()
+    return not error
+
+
+class Scheduler:
+    """Цикл run_scheduler: раз в interval секунд захватывает задачи и отдает их пулу"""
+
+    def __init__(self, workers=4, interval=15, node=None):
+        self.node = node or node_name()
+        self.interval = interval
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scheduler')
+        self.stopped = threading.Event()
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def _done(self, pk):
+        with self._lock:
+            self._running.discard(pk)
+
+    def tick(self):
+        with self._lock:
+            free_slots = self.workers - len(self._running)
+        if free_slots <= 0:
+            return []
+        claimed = claim_due_jobs(self.node, limit=free_slots)
+        for pk in claimed:
+            with self._lock:
+                self._running.add(pk)
+            future = self.executor.submit(run_job, pk, self.node)
+            future.add_done_callback(lambda _, pk=pk: self._done(pk))
+        return claimed
+
+    def run_forever(self):
+        while not self.stopped.is_set():
+            try:
+                self.tick()
+            except Exception:
+                traceback.print_exc()
+            finally:
+                close_old_connections()
+            self.stopped.wait(self.interval)
+        self.executor.shutdown(wait=True)
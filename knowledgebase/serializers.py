@@ -5,5 +5,5 @@ from .models import Request
 class RequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = Request
-        fields = ['id', 'title', 'description', 'category', 'status', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'description', 'category', 'status', 'created_at', 'updated_at', 'duplicate_of', 'assignee', 'version']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'duplicate_of', 'assignee', 'version']
@@ -1,15 +1,23 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from django.core.mail import send_mail
 from django.conf import settings
 from django.urls import reverse
-from .models import Request, Comment
+from .models import Article, Request, Comment, RequestStatusEvent, Tag
+from .utils import OPEN_STATUSES
+from . import analytics, archive, bulk, http_cache, media_storage, notifications, revisions, suggestions
+
+
+def _counters_handled_elsewhere():
+    """Перенос в архив и массовые операции сами пересчитывают статистику и счетчики"""
+    return archive.is_moving() or bulk.in_progress()
 
 
 @receiver(post_save, sender=Request)
 def notify_request_created_or_updated(sender, instance, created, **kwargs):
-    """Уведомление о создании или изменении заявки"""
-    if created:
+    """Уведомление о создании или изменении заявки (дубликаты открытых заявок не рассылаются)"""
+    if created and not instance.duplicate_of_id:
         try:
             admin_email = getattr(settings, 'ADMIN_EMAIL', None)
             if admin_email:
@@ -23,19 +31,194 @@ def notify_request_created_or_updated(sender, instance, created, **kwargs):
                 request_url = f"{settings.BASE_URL}{request_path}"
                 message += f'Просмотреть заявку: {request_url}'
                 
-                send_mail(
-                    subject=subject,
-                    message=message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[admin_email],
-                    fail_silently=True,
-                )
+                notifications.notify([(admin_email, subject, message)])
         except Exception:
             pass
     else:
         pass
 
 
+@receiver(post_init, sender=Request)
+def remember_request_state(sender, instance, **kwargs):
+    # __dict__ вместо атрибутов, чтобы не подгружать отложенные (only/defer) поля
+    values = instance.__dict__
+    instance._rollup_state = (values.get('category'), values.get('status'))
+    if 'assignee_id' in values and 'status' in values:
+        instance._assignment_state = (values['assignee_id'], values['status'] in OPEN_STATUSES)
+    else:
+        instance._assignment_state = None
+
+
+def _bump_open_tickets(user_id, delta):
+    from portal.models import UserProfile
+    profiles = UserProfile.objects.filter(user_id=user_id)
+    if delta < 0:
+        profiles = profiles.filter(open_ticket_count__gte=-delta)
+    profiles.update(open_ticket_count=F('open_ticket_count') + delta)
+
+
+@receiver(post_save, sender=Request)
+def update_assignee_counters(sender, instance, created, **kwargs):
+    """Счетчик открытых заявок исполнителя: назначение, переназначение, закрытие"""
+    previous = (None, False) if created else instance._assignment_state
+    current = (instance.assignee_id, instance.status in OPEN_STATUSES)
+    if previous is not None and previous != current:
+        if previous[0] and previous[1]:
+            _bump_open_tickets(previous[0], -1)
+        if current[0] and current[1]:
+            _bump_open_tickets(current[0], 1)
+    instance._assignment_state = current
+
+
+@receiver(post_delete, sender=Request)
+def release_assignee_counter(sender, instance, **kwargs):
+    if _counters_handled_elsewhere():
+        return
+    if instance.assignee_id and instance.status in OPEN_STATUSES:
+        _bump_open_tickets(instance.assignee_id, -1)
+
+
+@receiver(post_save, sender=Request)
+def update_request_rollup(sender, instance, created, **kwargs):
+    """Инкрементальное обновление дневной статистики заявок"""
+    previous = instance._rollup_state
+    current = (instance.category, instance.status)
+    if created:
+        analytics.bump(analytics.rollup_key(instance, analytics.creator_department_id(instance.created_by_id)), 1)
+    elif None not in previous and previous != current:
+        department_id = analytics.creator_department_id(instance.created_by_id)
+        old_key = analytics.rollup_key(instance, department_id)
+        old_key['category'], old_key['status'] = previous
+        analytics.bump(old_key, -1)
+        analytics.bump(analytics.rollup_key(instance, department_id), 1)
+    instance._rollup_state = current
+
+
+@receiver(post_delete, sender=Request)
+def remove_request_from_rollup(sender, instance, **kwargs):
+    if _counters_handled_elsewhere():
+        return
+    key = analytics.rollup_key(instance, analytics.creator_department_id(instance.created_by_id))
+    if None not in instance._rollup_state:
+        key['category'], key['status'] = instance._rollup_state
+    analytics.bump(key, -1)
+
+
+@receiver(pre_delete, sender=Request)
+def delete_request_status_events(sender, instance, **kwargs):
+    """
+    История статусов удаляется вместе с заявкой, но не при переносе в архив;
+    массовое удаление удаляет ее само одним запросом
+    """
+    if not _counters_handled_elsewhere():
+        RequestStatusEvent.objects.filter(request_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def invalidate_article_suggestions(sender, instance, **kwargs):
+    """Сброс индекса подсказок статей при их изменении"""
+    suggestions.invalidate()
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def mark_article_list_changed(sender, instance, **kwargs):
+    """Новая отметка изменения для ETag списка статей"""
+    http_cache.article_list_changed()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def mark_commented_article_changed(sender, instance, **kwargs):
+    """Число комментариев и активность статьи видны в списке статей"""
+    if instance.article_id:
+        http_cache.article_list_changed()
+
+
+@receiver(post_init, sender=Article)
+def remember_article_state(sender, instance, **kwargs):
+    values = instance.__dict__
+    if 'title' in values and 'content' in values:
+        instance._revision_state = (values['title'], values['content'])
+    else:
+        instance._revision_state = None
+
+
+@receiver(post_save, sender=Article)
+def record_article_revision(sender, instance, created, **kwargs):
+    """Новая ревизия в истории статьи при создании и при изменении названия или текста"""
+    state = instance._revision_state
+    current = (instance.title, instance.content)
+    if not created and (state is None or state == current):
+        return
+    editor = getattr(instance, '_edited_by', None)
+    author_id = editor.pk if editor is not None else (instance.author_id if created else None)
+    revisions.record_revision(instance, previous=None if created else state, author_id=author_id)
+    instance._revision_state = current
+
+
+@receiver(post_init, sender=Article)
+def remember_article_media(sender, instance, **kwargs):
+    instance._media_state = media_storage.media_names(instance)
+
+
+@receiver(post_save, sender=Article)
+def update_media_references(sender, instance, created, **kwargs):
+    """Счетчики ссылок на файлы медиа при загрузке и замене"""
+    current = media_storage.media_names(instance)
+    previous = [None] * len(current) if created else instance._media_state
+    changed = [
+        (old, new) for old, new in zip(previous, current)
+        if old != new and (created or old is not None) and new is not None
+    ]
+    if changed:
+        media_storage.change_references(
+            added=[new for _, new in changed],
+            removed=[old for old, _ in changed],
+        )
+    instance._media_state = current
+
+
+@receiver(post_delete, sender=Article)
+def release_media_references(sender, instance, **kwargs):
+    media_storage.change_references(removed=instance._media_state)
+
+
+def _comment_parent(comment):
+    if comment.request_id:
+        return Request, comment.request_id
+    if comment.article_id:
+        return Article, comment.article_id
+    return None, None
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_counters(sender, instance, created, **kwargs):
+    """Счетчик комментариев и время последней активности родительской записи"""
+    if not created:
+        return
+    model, parent_id = _comment_parent(instance)
+    if model is not None:
+        model.objects.filter(pk=parent_id).update(
+            comment_count=F('comment_count') + 1,
+            last_activity_at=Greatest(F('last_activity_at'), Value(instance.created_at)),
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_counters(sender, instance, **kwargs):
+    if _counters_handled_elsewhere():
+        return
+    model, parent_id = _comment_parent(instance)
+    if model is not None:
+        model.objects.filter(pk=parent_id, comment_count__gt=0).update(
+            comment_count=F('comment_count') - 1,
+        )
+
+
 @receiver(post_save, sender=Comment)
 def notify_comment_added(sender, instance, created, **kwargs):
     """Уведомление о добавлении комментария"""
@@ -77,13 +260,7 @@ def notify_comment_added(sender, instance, created, **kwargs):
                     message += f'К статье: {instance.article.title}\n'
                     message += f'Ссылка: {article_url}'
                 
-                send_mail(
-                    subject=subject,
-                    message=message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=recipients,
-                    fail_silently=True,
-                )
+                notifications.notify([(email, subject, message) for email in recipients])
         except Exception as e:
             import traceback
             print(f"Ошибка отправки email при добавлении комментария: {traceback.format_exc()}")
@@ -125,14 +302,46 @@ def send_request_status_notification(request_obj, old_status, new_status, user_e
             request_url = f"{settings.BASE_URL}{request_path}"
             message += f'Просмотреть заявку: {request_url}'
             
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=recipients,
-                fail_silently=True,
-            )
+            notifications.notify([(email, subject, message) for email in recipients])
     except Exception as e:
         import traceback
         print(f"Ошибка отправки email при изменении статуса заявки: {traceback.format_exc()}")
 
+
+def send_bulk_status_notification(changed_rows, new_status):
+    """
+    Одно уведомление на получателя со списком всех заявок, статус которых
+    изменен массовой операцией (вместо уведомления на каждую заявку).
+    changed_rows — строки из bulk.bulk_change_status со старым статусом.
+    """
+    try:
+        from django.contrib.auth import get_user_model
+        status_display_map = dict(Request.STATUS_CHOICES)
+        emails = dict(
+            get_user_model().objects.filter(
+                pk__in={row['created_by_id'] for row in changed_rows if row['created_by_id']},
+            ).exclude(email='').values_list('pk', 'email')
+        )
+        admin_email = getattr(settings, 'ADMIN_EMAIL', None)
+
+        rows_by_recipient = {}
+        for row in changed_rows:
+            recipients = [emails.get(row['created_by_id']), admin_email]
+            for email in dict.fromkeys(filter(None, recipients)):
+                rows_by_recipient.setdefault(email, []).append(row)
+
+        new_status_display = status_display_map.get(new_status, new_status)
+        items = []
+        for email, rows in rows_by_recipient.items():
+            subject = f'Изменен статус заявок ({len(rows)}): {new_status_display}'
+            message = f'Статус заявок изменен на «{new_status_display}»:\n\n'
+            for row in rows:
+                request_path = reverse('knowledgebase:request_detail', args=[row['id']])
+                message += f'#{row["id"]} {row["title"]} '
+                message += f'({status_display_map.get(row["status"], row["status"])} → {new_status_display})\n'
+                message += f'{settings.BASE_URL}{request_path}\n'
+            items.append((email, subject, message))
+        notifications.notify(items)
+    except Exception as e:
+        import traceback
+        print(f"Ошибка отправки email при массовом изменении статуса заявок: {traceback.format_exc()}")
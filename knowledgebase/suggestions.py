@@ -0,0 +1,149 @@
+"""
+Подсказки статей базы знаний при заполнении заявки.
+
+Индекс терминов по названию и тексту статей строится в памяти процесса,
+последнее (недописанное) слово запроса раскрывается по префиксу через
+отсортированный список терминов. Готовые ответы кешируются по нормализованному
+префиксу и версии индекса. Версия берется из базы (число статей и последнее
+изменение), поэтому правка в одном воркере видна всем остальным не позже чем
+через ``SUGGEST_VERSION_TTL`` секунд и без общего кеша.
+"""
+import bisect
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+CACHE_TIMEOUT = 300
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 50
+TITLE_WEIGHT = 3.0
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall(text.lower()) if len(token) >= MIN_PREFIX_LENGTH]
+
+
+def normalize_query(query):
+    return ' '.join(_TOKEN_RE.findall(query.lower()))[:100]
+
+
+# (момент чтения, версия) — своя в каждом процессе
+_version_cache = (0.0, None)
+
+
+def index_version():
+    """Версия статей из базы; запрос повторяется не чаще раза в SUGGEST_VERSION_TTL секунд"""
+    global _version_cache
+    read_at, version = _version_cache
+    now = time.monotonic()
+    if version is None or now - read_at >= getattr(settings, 'SUGGEST_VERSION_TTL', 5):
+        from django.db.models import Count, Max
+        from .models import Article
+        state = Article.objects.aggregate(changed=Max('updated_at'), total=Count('id'))
+        changed = int(state['changed'].timestamp() * 1_000_000) if state['changed'] else 0
+        version = f"{state['total']}-{changed}"
+        _version_cache = (now, version)
+    return version
+
+
+def invalidate():
+    """Текущий процесс перечитывает версию сразу, остальные — по истечении TTL"""
+    global _version_cache
+    _version_cache = (0.0, None)
+
+
+class SuggestionIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        # (postings, terms, titles) заменяются одним присваиванием: поиск без блокировки
+        # никогда не видит части старого и нового индекса
+        self._data = ({}, [], {})
+
+    def _build(self):
+        from .models import Article
+
+        postings = defaultdict(dict)
+        titles = {}
+        for article_id, title, content in Article.objects.values_list('id', 'title', 'content').iterator(chunk_size=500):
+            titles[article_id] = title
+            weights = Counter()
+            for token in tokenize(title):
+                weights[token] += TITLE_WEIGHT
+            for token in tokenize(content):
+                weights[token] += 1.0
+            for token, weight in weights.items():
+                # Логарифм гасит длинные статьи с многократными повторами
+                postings[token][article_id] = 1.0 + math.log(weight)
+
+        total = max(len(titles), 1)
+        postings = {
+            term: (math.log(1 + total / len(docs)), docs) for term, docs in postings.items()
+        }
+        return postings, sorted(postings), titles
+
+    def _ensure_current(self, version):
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._data = self._build()
+                    self._version = version
+
+    @staticmethod
+    def _expand_prefix(terms, prefix):
+        start = bisect.bisect_left(terms, prefix)
+        expanded = []
+        for term in terms[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            expanded.append(term)
+        return expanded
+
+    def search(self, query, limit=5, version=None):
+        self._ensure_current(index_version() if version is None else version)
+        postings, terms, titles = self._data
+        tokens = query.split()
+        if not tokens:
+            return []
+        scores = Counter()
+        complete, last = tokens[:-1], tokens[-1]
+        for token in complete:
+            if token in postings:
+                idf, docs = postings[token]
+                for article_id, weight in docs.items():
+                    scores[article_id] += idf * weight
+        for term in self._expand_prefix(terms, last):
+            idf, docs = postings[term]
+            for article_id, weight in docs.items():
+                scores[article_id] += idf * weight
+        return [
+            {'id': article_id, 'title': titles[article_id]}
+            for article_id, _ in scores.most_common(limit)
+        ]
+
+
+suggestion_index = SuggestionIndex()
+
+
+def suggest_articles(query, limit=5):
+    """Топ статей для введенного текста, кешируется по префиксу запроса"""
+    normalized = normalize_query(query)
+    if len(normalized) < MIN_PREFIX_LENGTH:
+        return []
+    version = index_version()
+    digest = hashlib.md5(normalized.encode('utf-8')).hexdigest()
+    cache_key = f'kb_suggest:{version}:{limit}:{digest}'
+    results = cache.get(cache_key)
+    if results is None:
+        results = suggestion_index.search(normalized, limit=limit, version=version)
+        cache.set(cache_key, results, CACHE_TIMEOUT)
+    return results
@@ -0,0 +1,224 @@
+"""
+Автоматические теги статей по TF-IDF.
+
+Перерасчет идет в два прохода по корпусу статей:
+
+1. документная частота каждого слова (в скольких статьях оно встречается);
+2. для каждой статьи — TF-IDF ее слов (вектор NumPy по словарю корпуса),
+   в теги попадают ``TAGS_PER_ARTICLE`` слов с наибольшим весом.
+
+Оба прохода разбиты на пачки статей, пачки обрабатываются параллельно в
+отдельных процессах; процессы только считают, все чтение и запись в базу —
+в основном процессе. Слова из названия весят сильнее слов текста.
+Слишком редкие (опечатки) и слишком частые (общие слова) в теги не попадают.
+
+Связи статей с тегами пересоздаются, поэтому их ``created_at`` и число
+входят в ETag страницы статьи, а после пересчета обновляется отметка
+изменения списка статей (``http_cache``).
+"""
+import re
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+from django.db import transaction
+from django.utils.text import slugify
+
+from .http_cache import article_list_changed
+from .models import Article, ArticleTag, Tag
+
+
+TAGS_PER_ARTICLE = 5
+TITLE_WEIGHT = 3
+MIN_WORD_LENGTH = 4
+MAX_WORD_LENGTH = 50
+MIN_DOCUMENT_FREQUENCY = 2
+MAX_DOCUMENT_RATIO = 0.5
+
+STOP_WORDS = frozenset('''
+    этот этого этой этом эти этих того также может можно могут если когда
+    чтобы после через более менее всех всего всегда будет будут быть есть только
+    который которая которое которые которых которой очень нужно необходимо другие
+    других другой должен должна должны своих свой свою между перед здесь потому
+    поэтому однако например кроме сейчас тогда затем даже уже ещё чего чему
+    about after also been before could from have into more only other should
+    some such than that their them then there these they this were what when
+    where which while will with would your
+'''.split())
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return [
+        token for token in _TOKEN_RE.findall(text.lower())
+        if MIN_WORD_LENGTH <= len(token) <= MAX_WORD_LENGTH and not token.isdigit() and token not in STOP_WORDS
+    ]
+
+
+def article_terms(title, content):
+    return tokenize(title) * TITLE_WEIGHT + tokenize(content)
+
+
+# --- Вычисления в процессах-исполнителях (без обращения к базе) ---
+
+_vocabulary = None
+_idf = None
+
+
+def _init_worker(vocabulary, idf):
+    global _vocabulary, _idf
+    _vocabulary, _idf = vocabulary, idf
+
+
+def count_documents(rows):
+    """Документная частота слов пачки статей [(id, title, content), ...]"""
+    frequencies = Counter()
+    for _, title, content in rows:
+        frequencies.update(set(article_terms(title, content)))
+    return frequencies
+
+
+def extract_tags(rows, limit=TAGS_PER_ARTICLE):
+    """[(id, [(слово, вес), ...]), ...] для пачки статей по словарю и IDF корпуса"""
+    result = []
+    for article_id, title, content in rows:
+        ids = [_vocabulary[term] for term in article_terms(title, content) if term in _vocabulary]
+        if not ids:
+            result.append((article_id, []))
+            continue
+        terms, counts = np.unique(np.array(ids, dtype=np.int64), return_counts=True)
+        scores = counts / counts.sum() * _idf[terms]
+        top = np.argsort(-scores, kind='stable')[:limit]
+        result.append((article_id, [(int(terms[i]), float(scores[i])) for i in top]))
+    return result
+
+
+# --- Проходы по корпусу ---
+
+def _chunks(chunk_size):
+    queryset = Article.objects.order_by('id').values_list('id', 'title', 'content')
+    chunk = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_vocabulary(document_frequencies, total):
+    """Словарь {слово: номер} и вектор IDF без слишком редких и слишком частых слов"""
+    max_documents = max(MIN_DOCUMENT_FREQUENCY, int(total * MAX_DOCUMENT_RATIO))
+    terms = sorted(
+        term for term, frequency in document_frequencies.items()
+        if MIN_DOCUMENT_FREQUENCY <= frequency <= max_documents
+    )
+    frequencies = np.array([document_frequencies[term] for term in terms], dtype=np.float64)
+    idf = np.log((1 + total) / (1 + frequencies)) + 1
+    return {term: position for position, term in enumerate(terms)}, terms, idf
+
+
+def _tag_ids(slugs):
+    """
+    {slug: id} для {slug: название}. Разные слова могут давать один slug
+    (``__init__`` и ``init``), поэтому теги ищутся по slug, а не по названию.
+    """
+    Tag.objects.bulk_create(
+        [Tag(name=name, slug=slug) for slug, name in slugs.items()],
+        ignore_conflicts=True,
+    )
+    return dict(Tag.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+
+
+def _save_chunk(results, terms):
+    slugs = {}
+    for _, tags in results:
+        for term, _ in tags:
+            if term not in slugs:
+                slugs[term] = slugify(terms[term], allow_unicode=True)
+    names = {}
+    for term, slug in slugs.items():
+        if slug:
+            names.setdefault(slug, terms[term])
+    tag_ids = _tag_ids(names) if names else {}
+    links = {}
+    for article_id, tags in results:
+        for term, score in tags:
+            tag_id = tag_ids.get(slugs[term])
+            if tag_id is not None:
+                key = (article_id, tag_id)
+                # Слова с одним slug дают один тег с наибольшим весом
+                links[key] = max(score, links.get(key, score))
+    with transaction.atomic():
+        ArticleTag.objects.filter(article_id__in=[article_id for article_id, _ in results]).delete()
+        ArticleTag.objects.bulk_create([
+            ArticleTag(article_id=article_id, tag_id=tag_id, score=score)
+            for (article_id, tag_id), score in links.items()
+        ])
+
+
+def _update_tag_counts():
+    """Пересчет числа статей у тегов и удаление тегов без статей"""
+    counts = Counter(ArticleTag.objects.values_list('tag_id', flat=True).iterator())
+    tags = list(Tag.objects.only('id', 'article_count'))
+    for tag in tags:
+        tag.article_count = counts.get(tag.id, 0)
+    Tag.objects.bulk_update(tags, ['article_count'], batch_size=1000)
+    Tag.objects.filter(article_count=0).delete()
+
+
+def bounded_map(executor, window):
+    """
+    map по пачкам через executor, в работе не больше window пачек:
+    следующая пачка читается из базы и отправляется исполнителю только после
+    получения результата одной из предыдущих. Порядок результатов сохраняется.
+    """
+    def run(function, iterable):
+        pending = deque()
+        for item in iterable:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    return run
+
+
+@contextmanager
+def _mapper(workers, initializer=None, initargs=()):
+    """map по пачкам: в процессах-исполнителях при workers > 1, иначе в текущем процессе"""
+    if workers <= 1:
+        if initializer:
+            initializer(*initargs)
+        yield map
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        yield bounded_map(pool, workers * 2)
+
+
+def _count_chunk(rows):
+    return count_documents(rows), len(rows)
+
+
+def retag_articles(workers=1, chunk_size=500):
+    """Пересчитывает теги всех статей; возвращает (статей, тегов)"""
+    document_frequencies = Counter()
+    total = 0
+    with _mapper(workers) as run:
+        for frequencies, size in run(_count_chunk, _chunks(chunk_size)):
+            document_frequencies.update(frequencies)
+            total += size
+    if not total:
+        return 0, 0
+
+    vocabulary, terms, idf = build_vocabulary(document_frequencies, total)
+    with _mapper(workers, _init_worker, (vocabulary, idf)) as run:
+        for results in run(extract_tags, _chunks(chunk_size)):
+            _save_chunk(results, terms)
+
+    _update_tag_counts()
+    article_list_changed()
+    return total, Tag.objects.count()
@@ -158,3 +158,1360 @@ class CommentModelTest(TestCase):
         invalid_comment = Comment(text="Invalid")
         with self.assertRaises(Exception):
             invalid_comment.clean()
+
+
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        from . import db_router
+        self.db_router = db_router
+        self.router = db_router.PrimaryReplicaRouter()
+        db_router.reset_replica_health()
+        self.addCleanup(db_router.reset_replica_health)
+
+    def test_reads_go_to_primary_without_replicas(self):
+        with self.settings(DATABASE_REPLICAS=[]):
+            with self.db_router.use_replica():
+                self.assertIsNone(self.router.db_for_read(Article))
+
+    def test_reads_go_to_replica_in_replica_context(self):
+        with self.settings(DATABASE_REPLICAS=['replica_1']):
+            self.db_router._replica_health['replica_1'] = (float('inf'), True)
+            self.assertIsNone(self.router.db_for_read(Article))
+            with self.db_router.use_replica():
+                self.assertEqual(self.router.db_for_read(Article), 'replica_1')
+                self.assertEqual(self.router.db_for_write(Article), 'default')
+                # после записи чтение возвращается в основную базу
+                self.assertIsNone(self.router.db_for_read(Article))
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        from unittest import mock
+        with self.settings(DATABASE_REPLICAS=['replica_1'], DATABASE_REPLICA_MAX_LAG_SECONDS=5):
+            with mock.patch.object(self.db_router, 'replica_lag', return_value=60):
+                with self.db_router.use_replica():
+                    self.assertIsNone(self.router.db_for_read(Article))
+
+    def test_caught_up_replica_has_no_lag(self):
+        from unittest import mock
+        connection = mock.MagicMock(vendor='postgresql')
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = (0,)
+        with mock.patch.object(self.db_router, 'connections', {'replica_1': connection}):
+            self.assertEqual(self.db_router.replica_lag('replica_1'), 0.0)
+        sql = cursor.execute.call_args[0][0]
+        self.assertIn('pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()', sql)
+
+    def test_write_sets_pin_cookie(self):
+        user = User.objects.create_user(username='writer', password='testpass123')
+        self.client.force_login(user)
+        with self.settings(DATABASE_REPLICAS=['replica_1']):
+            response = self.client.post(
+                reverse('knowledgebase:requests-page'),
+                {'title': 'T', 'description': 'D', 'category': 'Other'},
+            )
+        self.assertIn(self.db_router.PIN_COOKIE_NAME, response.cookies)
+
+
+class DuplicateDetectionTest(TestCase):
+    def setUp(self):
+        from .duplicates import duplicate_index
+        duplicate_index.clear()
+        self.addCleanup(duplicate_index.clear)
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.original = Request.objects.create(
+            title='Не работает принтер на третьем этаже',
+            description='Принтер в кабинете 305 не печатает, выдает ошибку замятия бумаги',
+            status='New',
+        )
+
+    def test_signature_is_computed_on_save(self):
+        self.assertIsNotNone(self.original.text_signature)
+
+    def test_similar_request_is_found(self):
+        from .duplicates import find_duplicates
+        duplicates = find_duplicates(
+            'Не работает принтер на третьем этаже',
+            'Принтер в кабинете 305 не печатает, ошибка замятия бумаги',
+        )
+        self.assertEqual([d.id for d in duplicates], [self.original.id])
+
+    def test_closed_requests_are_ignored(self):
+        from .duplicates import find_duplicates
+        find_duplicates('прогрев индекса', '')
+        self.original.status = 'Completed'
+        self.original.save()
+        duplicates = find_duplicates(self.original.title, self.original.description)
+        self.assertEqual(duplicates, [])
+
+    def test_duplicate_is_linked_on_creation(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('knowledgebase:requests-page'), {
+            'title': self.original.title,
+            'description': self.original.description,
+            'category': 'Technical',
+        })
+        created = Request.objects.exclude(id=self.original.id).get()
+        self.assertEqual(created.duplicate_of, self.original)
+
+
+class ArticleSuggestionTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.printer = Article.objects.create(
+            title='Настройка сетевого принтера',
+            content='Как подключить принтер к компьютеру по сети',
+        )
+        Article.objects.create(title='Отпуск', content='Как оформить отпуск в отделе кадров')
+
+    def test_prefix_matches_title(self):
+        response = self.client.get(reverse('knowledgebase:article-suggest'), {'q': 'сетевой прин'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(results[0]['id'], self.printer.id)
+        self.assertEqual(results[0]['url'], reverse('knowledgebase:article_detail', args=[self.printer.id]))
+
+    def test_short_query_returns_nothing(self):
+        response = self.client.get(reverse('knowledgebase:article-suggest'), {'q': 'п'})
+        self.assertEqual(response.json()['results'], [])
+
+    def test_new_article_invalidates_cache(self):
+        from .suggestions import suggest_articles
+        self.assertEqual(suggest_articles('вайфай'), [])
+        article = Article.objects.create(title='Вайфай в офисе', content='Пароль от гостевой сети')
+        self.assertEqual([item['id'] for item in suggest_articles('вайфай')], [article.id])
+
+    def test_change_from_another_process_is_picked_up(self):
+        from django.utils import timezone
+        from .suggestions import suggest_articles
+        vacation = Article.objects.get(title='Отпуск')
+        self.assertEqual(suggest_articles('больнич'), [])
+        # Правка без сигналов текущего процесса, как если бы ее сделал другой воркер
+        with self.settings(SUGGEST_VERSION_TTL=0):
+            Article.objects.filter(pk=vacation.pk).update(title='Больничный', updated_at=timezone.now())
+            self.assertEqual(suggest_articles('больнич'), [{'id': vacation.id, 'title': 'Больничный'}])
+
+
+class CommentCounterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser')
+        self.article = Article.objects.create(title="Article", content="Content")
+        self.request = Request.objects.create(title="Request", description="Description")
+
+    def test_counters_follow_comment_create_and_delete(self):
+        comment = Comment.objects.create(text="first", request=self.request, user=self.user)
+        Comment.objects.create(text="second", request=self.request, user=self.user)
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.comment_count, 2)
+        self.assertGreaterEqual(self.request.last_activity_at, comment.created_at)
+
+        comment.delete()
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.comment_count, 1)
+
+    def test_recount_command_backfills(self):
+        from django.core.management import call_command
+        from io import StringIO
+        comment = Comment.objects.create(text="text", article=self.article, user=self.user)
+        Article.objects.update(comment_count=0)
+        call_command('recount_comments', stdout=StringIO())
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.comment_count, 1)
+        self.assertEqual(self.article.last_activity_at, comment.created_at)
+
+
+class RequestExportTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import Permission
+        self.user = User.objects.create_user(username='manager', password='testpass123')
+        self.user.user_permissions.add(Permission.objects.get(codename='view_request'))
+        Request.objects.create(title='Принтер', description='Не печатает', status='New', created_by=self.user)
+        Request.objects.create(title='Сеть', description='Нет интернета', status='Completed')
+
+    def _export(self, **params):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('knowledgebase:requests-export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_honors_filters(self):
+        content = self._export(format='csv', status='New').decode('utf-8-sig')
+        lines = content.strip().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Принтер,manager,Без категории,Новая,0', lines[1])
+
+    def test_jsonl(self):
+        import json
+        rows = [json.loads(line) for line in self._export(format='jsonl').decode('utf-8').splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Принтер', 'Сеть'])
+
+    def test_xlsx_is_valid_zip(self):
+        import io
+        import zipfile
+        archive = zipfile.ZipFile(io.BytesIO(self._export(format='xlsx')))
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('Сеть', sheet)
+
+    def test_formula_like_values_are_escaped(self):
+        import csv
+        import io
+        import zipfile
+        Request.objects.create(title='=HYPERLINK("http://evil")', description='', created_by=self.user)
+        Request.objects.create(title='-2+3', description='', created_by=self.user)
+        rows = list(csv.reader(io.StringIO(self._export(format='csv').decode('utf-8-sig'))))
+        titles = [row[1] for row in rows[1:]]
+        self.assertIn('\'=HYPERLINK("http://evil")', titles)
+        self.assertIn("'-2+3", titles)
+        archive = zipfile.ZipFile(io.BytesIO(self._export(format='xlsx')))
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('\'=HYPERLINK', sheet)
+        self.assertIn("'-2+3", sheet)
+        jsonl = self._export(format='jsonl').decode('utf-8')
+        self.assertIn('"=HYPERLINK', jsonl)
+
+    def test_xlsx_strips_control_characters(self):
+        import io
+        import zipfile
+        from xml.etree import ElementTree
+        Request.objects.create(title='Сбой\x01\x0bпечати', description='', created_by=self.user)
+        archive = zipfile.ZipFile(io.BytesIO(self._export(format='xlsx')))
+        sheet = archive.read('xl/worksheets/sheet1.xml')
+        ElementTree.fromstring(sheet)
+        self.assertIn('Сбойпечати', sheet.decode('utf-8'))
+
+    def test_requires_permission(self):
+        other = User.objects.create_user(username='other')
+        self.client.force_login(other)
+        response = self.client.get(reverse('knowledgebase:requests-export'))
+        self.assertEqual(response.status_code, 403)
+
+
+class ImportArticlesCommandTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from pathlib import Path
+        source = tempfile.TemporaryDirectory()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(media.cleanup)
+        self.root = Path(source.name)
+        (self.root / 'img').mkdir()
+        (self.root / 'img' / 'printer.png').write_bytes(b'png')
+        (self.root / 'printer.md').write_text(
+            '---\ntitle: Настройка принтера\nimage: img/printer.png\n---\nОткройте панель управления.',
+            encoding='utf-8',
+        )
+        (self.root / 'vpn.html').write_text(
+            '<html><head><title>VPN</title></head><body><p>Подключение &amp; настройка</p></body></html>',
+            encoding='utf-8',
+        )
+        (self.root / 'faq.jsonl').write_text(
+            '{"title": "Отпуск", "content": "Заявление в отдел кадров"}\n'
+            '{"title": "Пропуск", "content": "Обратитесь на ресепшн"}\n',
+            encoding='utf-8',
+        )
+        settings_override = self.settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _run(self):
+        from django.core.management import call_command
+        from io import StringIO
+        call_command('import_articles', str(self.root), stdout=StringIO())
+
+    def test_import_is_idempotent(self):
+        from .models import MediaBlob
+        self._run()
+        self._run()
+        self.assertEqual(Article.objects.count(), 4)
+        printer = Article.objects.get(source_key='printer.md')
+        self.assertEqual(printer.title, 'Настройка принтера')
+        self.assertTrue(printer.image.name.startswith('blobs/'))
+        self.assertEqual(MediaBlob.objects.get(name=printer.image.name).ref_count, 1)
+        self.assertEqual(Article.objects.get(source_key='vpn.html').content, 'Подключение & настройка')
+        self.assertTrue(Article.objects.filter(source_key='faq.jsonl#2', title='Пропуск').exists())
+
+    def test_skipped_rows_not_counted_as_created(self):
+        from io import StringIO
+        from unittest import mock
+        from django.core.management import call_command
+        from django.db.models.query import QuerySet
+        real_bulk_create = QuerySet.bulk_create
+
+        def racing_bulk_create(queryset, objs, **kwargs):
+            # Параллельный импорт успевает создать одну из статей пачки
+            Article.objects.create(source_key=objs[0].source_key, title='Параллельно', content='x')
+            return real_bulk_create(queryset, objs, **kwargs)
+
+        # Без медиа: потоки копирования блокирует транзакция теста
+        (self.root / 'printer.md').unlink()
+        output = StringIO()
+        with mock.patch.object(QuerySet, 'bulk_create', racing_bulk_create):
+            call_command('import_articles', str(self.root), stdout=output)
+        self.assertEqual(Article.objects.count(), 3)
+        self.assertIn('Создано статей: 2,', output.getvalue())
+
+    def test_update_bumps_version_and_records_revision(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import ArticleRevision
+        # Медиа копируется в потоках со своими соединениями, которые блокирует транзакция теста
+        (self.root / 'printer.md').unlink()
+        self._run()
+        article = Article.objects.get(source_key='vpn.html')
+        (self.root / 'vpn.html').write_text(
+            '<html><head><title>VPN</title></head><body><p>Новая инструкция</p></body></html>', encoding='utf-8',
+        )
+        call_command('import_articles', str(self.root), '--update', stdout=StringIO())
+        updated = Article.objects.get(pk=article.pk)
+        self.assertEqual(updated.content, 'Новая инструкция')
+        self.assertEqual(updated.version, article.version + 1)
+        self.assertEqual(Article.objects.get(source_key='faq.jsonl#1').version, article.version + 1)
+        history = ArticleRevision.objects.filter(article_id=article.pk)
+        self.assertEqual(history.count(), 2)
+        self.assertFalse(ArticleRevision.objects.filter(article__source_key='faq.jsonl#1').exists())
+
+
+class RequestAnalyticsTest(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        self.today = timezone.localdate()
+        self.department = Department.objects.create(name='IT')
+        self.user = User.objects.create_user(username='analyst', password='testpass123')
+        UserProfile.objects.filter(user=self.user).update(department=self.department)
+        self.request = Request.objects.create(
+            title='A', description='A', category='Technical', created_by=self.user
+        )
+        Request.objects.create(title='B', description='B', category='Content')
+
+    def _counts(self, **filters):
+        from .models import RequestDailyStat
+        return {
+            (stat.category, stat.status, stat.department_id): stat.count
+            for stat in RequestDailyStat.objects.filter(count__gt=0, **filters)
+        }
+
+    def test_signals_maintain_rollup(self):
+        self.assertEqual(self._counts()[('Technical', 'New', self.department.id)], 1)
+        self.request.status = 'Completed'
+        self.request.save()
+        counts = self._counts()
+        self.assertNotIn(('Technical', 'New', self.department.id), counts)
+        self.assertEqual(counts[('Technical', 'Completed', self.department.id)], 1)
+        self.request.delete()
+        self.assertEqual(self._counts(), {('Content', 'New', None): 1})
+
+    def test_concurrent_first_bump_without_department(self):
+        from unittest import mock
+        from django.db.models.query import QuerySet
+        from .analytics import bump
+        from .models import RequestDailyStat
+        real_update = QuerySet.update
+        calls = []
+
+        def racing_update(queryset, **kwargs):
+            # Первое обновление не нашло строку: ее вставил другой воркер после нашей проверки
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else real_update(queryset, **kwargs)
+
+        key = {'date': self.today, 'category': 'Content', 'status': 'New', 'department_id': None}
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            bump(key, 1)
+        rows = RequestDailyStat.objects.filter(department__isnull=True, category='Content', status='New')
+        self.assertEqual(list(rows.values_list('count', flat=True)), [2])
+
+    def test_rebuild_matches_signals(self):
+        from .analytics import rebuild_range
+        before = self._counts()
+        rebuild_range(self.today, self.today)
+        self.assertEqual(self._counts(), before)
+
+    def test_endpoint_groups_by_category(self):
+        from django.contrib.auth.models import Permission
+        self.user.user_permissions.add(Permission.objects.get(codename='view_request'))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('knowledgebase:request-analytics'), {
+            'start': self.today.isoformat(), 'end': self.today.isoformat(), 'group_by': 'category',
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['labels'], [self.today.isoformat()])
+        self.assertEqual(data['series'], {'Content': [1], 'Technical': [1]})
+
+    def test_monthly_interval_sums_days(self):
+        import datetime
+        from .analytics import time_series
+        start = self.today.replace(day=1) - datetime.timedelta(days=40)
+        data = time_series(start, self.today, interval='month')
+        self.assertEqual(sum(data['series']['total']), 2)
+        self.assertEqual(len(data['labels']), len(set(data['labels'])))
+
+
+    def test_nightly_rollup_reconciles_days_of_recently_changed_requests(self):
+        import datetime
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .models import RequestStatusEvent
+        old_day = self.today - datetime.timedelta(days=30)
+        Request.objects.filter(pk=self.request.pk).update(created_at=self.request.created_at - datetime.timedelta(days=30))
+        call_command('rollup_request_stats', start=old_day.isoformat(), stdout=StringIO())
+        self.assertEqual(self._counts(date=old_day), {('Technical', 'New', self.department.id): 1})
+
+        # Смена статуса в обход сигналов оставляет строку старого дня устаревшей
+        Request.objects.filter(pk=self.request.pk).update(status='Completed')
+        RequestStatusEvent.objects.create(
+            request_id=self.request.pk, from_status='New', to_status='Completed', category='Technical',
+            changed_at=timezone.now(), seconds_in_previous_status=0, seconds_since_created=0,
+        )
+        output = StringIO()
+        call_command('rollup_request_stats', stdout=output)
+        self.assertEqual(self._counts(date=old_day), {('Technical', 'Completed', self.department.id): 1})
+        self.assertIn('еще дней: 1', output.getvalue())
+
+
+class RequestStatusHistoryTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import Permission
+        self.agent = User.objects.create_user(username='agent', password='testpass123')
+        self.agent.user_permissions.add(
+            Permission.objects.get(codename='change_request'),
+            Permission.objects.get(codename='view_request'),
+        )
+        self.request = Request.objects.create(title='A', description='A', category='Technical')
+
+    def test_transitions_record_precomputed_durations(self):
+        import datetime
+        from .models import RequestStatusEvent
+        Request.objects.filter(pk=self.request.pk).update(
+            status_changed_at=self.request.status_changed_at - datetime.timedelta(hours=2),
+            created_at=self.request.created_at - datetime.timedelta(hours=2),
+        )
+        self.client.force_login(self.agent)
+        url = reverse('knowledgebase:change-request-status', args=[self.request.id])
+        self.client.post(url, {'status': 'In Progress'})
+        self.client.post(url, {'status': 'In Progress'})
+        self.client.post(url, {'status': 'Completed'})
+
+        events = list(RequestStatusEvent.objects.filter(request=self.request))
+        self.assertEqual([(e.from_status, e.to_status) for e in events], [
+            ('New', 'In Progress'), ('In Progress', 'Completed'),
+        ])
+        self.assertTrue(events[0].is_first_response)
+        self.assertFalse(events[1].is_first_response)
+        self.assertGreaterEqual(events[0].seconds_in_previous_status, 7200)
+        self.assertEqual(events[0].changed_by, self.agent)
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.first_response_at, events[0].changed_at)
+
+    def test_sla_endpoint(self):
+        from .utils import apply_status_transition
+        apply_status_transition(self.request, 'In Progress', self.agent)
+        apply_status_transition(self.request, 'Completed', self.agent)
+        self.client.force_login(self.agent)
+        response = self.client.get(reverse('knowledgebase:request-sla'), {'group_by': 'agent'})
+        result = response.json()['results']['agent']
+        self.assertEqual(result['first_responses'], 1)
+        self.assertEqual(result['in_progress_transitions'], 1)
+
+
+class AutoAssignmentTest(TestCase):
+    def setUp(self):
+        self.it = Department.objects.create(name='IT')
+        self.agents = []
+        for name, department in (('agent1', None), ('agent2', self.it), ('agent3', self.it)):
+            user = User.objects.create_user(username=name, password='testpass123')
+            UserProfile.objects.filter(user=user).update(role='support', department=department)
+            self.agents.append(User.objects.get(pk=user.pk))
+        author = User.objects.create_user(username='author', password='testpass123')
+        UserProfile.objects.filter(user=author).update(department=self.it)
+        self.author = User.objects.get(pk=author.pk)
+
+    def _open_counts(self):
+        return dict(UserProfile.objects.filter(role='support').values_list('user__username', 'open_ticket_count'))
+
+    def test_least_loaded_agent_in_department(self):
+        self.client.force_login(self.author)
+        for i in range(3):
+            self.client.post(reverse('knowledgebase:requests-page'), {
+                'title': f'Ошибка номер {i}', 'description': f'Сервер {i} не работает {i * 7}', 'category': 'Technical',
+            })
+        assignees = list(Request.objects.order_by('id').values_list('assignee__username', flat=True))
+        self.assertEqual(assignees, ['agent2', 'agent3', 'agent2'])
+        self.assertEqual(self._open_counts(), {'agent1': 0, 'agent2': 2, 'agent3': 1})
+
+    def test_counters_follow_status_and_reassignment(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from .utils import apply_status_transition
+        req = Request.objects.create(title='T', description='D', category='Technical', assignee=self.agents[0])
+        self.assertEqual(self._open_counts()['agent1'], 1)
+        req.assignee = self.agents[1]
+        req.save()
+        self.assertEqual(self._open_counts(), {'agent1': 0, 'agent2': 1, 'agent3': 0})
+        apply_status_transition(req, 'Completed')
+        self.assertEqual(self._open_counts()['agent2'], 0)
+
+        UserProfile.objects.update(open_ticket_count=5)
+        call_command('reconcile_assignment_counters', stdout=StringIO())
+        self.assertEqual(set(self._open_counts().values()), {0})
+
+    def test_support_dashboard_shows_only_own_requests(self):
+        Request.objects.create(title='Mine', description='D', assignee=self.agents[0])
+        Request.objects.create(title='Other', description='D', assignee=self.agents[1])
+        self.client.force_login(self.agents[0])
+        response = self.client.get(reverse('portal:dashboard'))
+        self.assertEqual([r.title for r in response.context['my_assigned_requests']], ['Mine'])
+
+
+class QueryPlanRegressionTest(TestCase):
+    """Основные списки должны читаться по индексу, без полного прохода и сортировки"""
+
+    def setUp(self):
+        from django.db import connection
+        self.vendor = connection.vendor
+        self.user = User.objects.create_user(username='planuser', password='testpass123')
+        self.article = Article.objects.create(title='Plan', content='Plan content')
+        for i in range(20):
+            Request.objects.create(
+                title=f'Заявка {i}', description='D', status='New' if i % 2 else 'In Progress',
+                created_by=self.user, assignee=self.user,
+            )
+
+    def _plan(self, queryset):
+        from django.db import connection
+        if self.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, allow_sort=False):
+        plan = self._plan(queryset)
+        if self.vendor == 'sqlite':
+            for line in plan.splitlines():
+                if ' SCAN ' in f' {line} ' and 'USING' not in line:
+                    self.fail(f'Полный проход таблицы:\n{plan}')
+            if not allow_sort:
+                self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
+        elif self.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan)
+            if not allow_sort:
+                self.assertNotRegex(plan, r'(?m)^\s*(->\s*)?Sort\b')
+
+    def test_request_lists(self):
+        self.assertUsesIndex(Request.objects.order_by('-created_at')[:50])
+        self.assertUsesIndex(Request.objects.filter(status='New').order_by('-created_at')[:50])
+        self.assertUsesIndex(Request.objects.filter(created_by=self.user).order_by('-created_at')[:5])
+        self.assertUsesIndex(Request.objects.filter(assignee=self.user, status='New').order_by('-created_at')[:10])
+        self.assertUsesIndex(
+            Request.objects.filter(assignee=self.user, status__in=['New', 'In Progress']).order_by('-created_at')[:10],
+            allow_sort=True,
+        )
+
+    def test_article_and_comment_lists(self):
+        self.assertUsesIndex(Article.objects.order_by('-pub_date')[:20])
+        self.assertUsesIndex(Comment.objects.filter(article=self.article).order_by('created_at'))
+        self.assertUsesIndex(Comment.objects.filter(user=self.user).order_by('created_at')[:5])
+
+    def test_tag_filter_uses_link_index(self):
+        from .models import ArticleTag, Tag
+        tag = Tag.objects.create(name='план', slug='план')
+        ArticleTag.objects.create(article=self.article, tag=tag)
+        self.assertUsesIndex(ArticleTag.objects.filter(tag__slug='план').values('article_id'))
+        self.assertUsesIndex(Article.objects.filter(article_tags__tag__slug='план'), allow_sort=True)
+
+    def test_text_search_uses_trigram_index(self):
+        if self.vendor != 'postgresql':
+            self.skipTest('Триграммные индексы есть только в PostgreSQL')
+        self.assertUsesIndex(Article.objects.filter(title__icontains='plan'), allow_sort=True)
+        self.assertUsesIndex(Request.objects.filter(description__icontains='заяв'), allow_sort=True)
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.article = Article.objects.create(title='Кеш', content='Текст статьи')
+        self.url = reverse('knowledgebase:article_detail', args=[self.article.id])
+
+    def test_anonymous_detail_revalidates_with_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        user = User.objects.create_user(username='commenter', password='testpass123')
+        Comment.objects.create(article=self.article, user=user, text='Новый комментарий')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_index_changes_etag_on_edit(self):
+        url = reverse('knowledgebase:index')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.article.title = 'Кеш (обновлено)'
+        self.article.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_index_revalidation_skips_database(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = reverse('knowledgebase:index')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+        user = User.objects.create_user(username='commenter', password='testpass123')
+        Comment.objects.create(article=self.article, user=user, text='Комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        Article.objects.create(title='Другая', content='Текст').delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_authenticated_pages_are_private(self):
+        user = User.objects.create_user(username='reader', password='testpass123')
+        anonymous_etag = self.client.get(self.url)['ETag']
+        self.client.force_login(User.objects.get(pk=user.pk))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=anonymous_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('ETag', response)
+
+
+class RequestListRenderingTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='listadmin', password='testpass123')
+        for i in range(3):
+            Request.objects.create(title=f'Заявка {i}', description='D', status='In Progress')
+
+    def test_rows_are_precomputed(self):
+        from .utils import request_list_rows
+        row = request_list_rows(Request.objects.order_by('id'))[0]
+        req = Request.objects.order_by('id').first()
+        self.assertEqual(row['status'], 'В работе')
+        self.assertEqual(row['status_class'], 'in-progress')
+        self.assertEqual(row['detail_url'], reverse('knowledgebase:request_detail', args=[req.id]))
+        self.assertEqual(row['status_url'], reverse('knowledgebase:change-request-status', args=[req.id]) + '?version=1')
+
+    def test_single_shared_action_form(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('knowledgebase:requests-page'))
+        content = response.content.decode()
+        self.assertEqual(content.count('id="request-actions"'), 1)
+        self.assertEqual(content.count('form="request-actions"'), 3 * 5)
+        forms_without_rows = content.count('<form')
+        Request.objects.create(title='Еще одна', description='D')
+        response = self.client.get(reverse('knowledgebase:requests-page'))
+        self.assertEqual(response.content.decode().count('<form'), forms_without_rows)
+
+
+class RequestProfilerTest(TestCase):
+    def setUp(self):
+        import tempfile
+        self.profile_dir = tempfile.mkdtemp()
+        self.staff = User.objects.create_user(username='staffer', password='testpass123', is_staff=True)
+        self.user = User.objects.create_user(username='plain', password='testpass123')
+        Article.objects.create(title='Профиль', content='Текст')
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    def test_staff_request_is_profiled(self):
+        from django.test import override_settings
+        from .profiling import recent_profiles
+        with override_settings(REQUEST_PROFILING_ENABLED=True, REQUEST_PROFILE_DIR=self.profile_dir):
+            client = Client()
+            client.force_login(User.objects.get(pk=self.staff.pk))
+            response = client.get(reverse('knowledgebase:index'), {'_profile': '1'})
+            self.assertIn('X-Profile-Id', response)
+            profiles = recent_profiles()
+            self.assertEqual(len(profiles), 1)
+            self.assertEqual(profiles[0]['view'], 'knowledgebase:index')
+            self.assertGreater(profiles[0]['sql_count'], 0)
+
+            page = client.get(reverse('knowledgebase:request-profiles'))
+            self.assertContains(page, 'knowledgebase:index')
+            download = client.get(reverse(
+                'knowledgebase:request-profile-download', args=[profiles[0]['id'], 'prof']
+            ))
+            self.assertEqual(download.status_code, 200)
+
+            client.force_login(User.objects.get(pk=self.user.pk))
+            response = client.get(reverse('knowledgebase:index'), {'_profile': '1'})
+            self.assertNotIn('X-Profile-Id', response)
+            self.assertEqual(client.get(reverse('knowledgebase:request-profiles')).status_code, 403)
+
+    def test_disabled_profiler_is_not_in_chain(self):
+        from django.core.exceptions import MiddlewareNotUsed
+        from .middleware import RequestProfilerMiddleware
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestProfilerMiddleware(lambda request: None)
+        self.client.force_login(User.objects.get(pk=self.staff.pk))
+        self.assertNotIn('X-Profile-Id', self.client.get(reverse('knowledgebase:index'), {'_profile': '1'}))
+
+
+class ThrottlingTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='spammer', password='testpass123')
+        self.req = Request.objects.create(title='T', description='D', created_by=self.user)
+
+    def test_comment_user_bucket(self):
+        from django.test import override_settings
+        from .throttling import throttle_metrics
+        rates = {'comment_ip': '100/min', 'comment_user': '2/min'}
+        with override_settings(THROTTLE_RATES=rates):
+            self.client.force_login(User.objects.get(pk=self.user.pk))
+            url = reverse('knowledgebase:add-comment', args=[self.req.id])
+            codes = [self.client.post(url, {'text': f'Комментарий {i}'}).status_code for i in range(3)]
+            self.assertEqual(codes, [302, 302, 429])
+            self.assertEqual(Comment.objects.filter(request=self.req).count(), 2)
+            self.assertEqual(throttle_metrics()['comment_user'], 1)
+
+    def test_ip_bucket_rejects_before_database(self):
+        from django.db import connection
+        from django.test import override_settings
+        from django.test.utils import CaptureQueriesContext
+        with override_settings(THROTTLE_RATES={'comment_ip': '1/min'}):
+            url = reverse('knowledgebase:add-comment', args=[self.req.id])
+            self.client.post(url, {'text': 'x'})
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, {'text': 'x'})
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('Retry-After', response)
+            self.assertEqual(len(queries), 0)
+
+    def test_concurrent_requests_do_not_exceed_limit(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from .throttling import take
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            waits = list(pool.map(lambda _: take('throttle:burst', (5, 60.0)), range(40)))
+        self.assertEqual(sum(1 for wait in waits if not wait), 5)
+
+    def test_redis_bucket_uses_single_script(self):
+        from unittest import mock
+        from . import throttling
+        backend = mock.Mock()
+        backend.make_and_validate_key.side_effect = lambda key: f':1:{key}'
+        backend._cache.get_client.return_value.eval.side_effect = ['0', '12.5']
+        with mock.patch.object(throttling, '_redis_cache', return_value=backend):
+            self.assertEqual(throttling.take('throttle:x', (2, 60.0)), 0)
+            self.assertEqual(throttling.take('throttle:x', (2, 60.0)), 12.5)
+        script, keys, key, interval, tolerance = backend._cache.get_client.return_value.eval.call_args.args
+        self.assertEqual((keys, key, interval, tolerance), (1, ':1:throttle:x', 30.0, 30.0))
+
+    def test_api_throttle(self):
+        from django.test import override_settings
+        with override_settings(THROTTLE_RATES={'request_api_ip': '2/min'}):
+            url = reverse('knowledgebase:request-api')
+            codes = [self.client.get(url).status_code for _ in range(3)]
+            self.assertEqual(codes, [200, 200, 429])
+
+    def test_api_ip_bucket_rejects_before_authentication(self):
+        from django.db import connection
+        from django.test import override_settings
+        from django.test.utils import CaptureQueriesContext
+        self.client.force_login(self.user)
+        with override_settings(THROTTLE_RATES={'request_api_ip': '1/min', 'request_api_user': '100/min'}):
+            url = reverse('knowledgebase:request-status-api', args=[self.req.id])
+            self.client.post(url, {'status': 'Completed', 'version': 1}, content_type='application/json')
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, {'status': 'New'}, content_type='application/json')
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('Retry-After', response)
+            self.assertEqual([q['sql'] for q in queries.captured_queries], [])
+            from .throttling import throttle_metrics
+            self.assertEqual(throttle_metrics()['request_api_ip'], 1)
+
+
+class SchedulerTest(TestCase):
+    def test_cron_next_run(self):
+        import datetime
+        from .scheduler import CronSchedule
+        moment = datetime.datetime(2024, 1, 5, 10, 7)  # пятница
+        self.assertEqual(CronSchedule('*/15 * * * *').next_after(moment), datetime.datetime(2024, 1, 5, 10, 15))
+        self.assertEqual(CronSchedule('0 9 * * 1-5').next_after(moment), datetime.datetime(2024, 1, 8, 9, 0))
+        self.assertEqual(CronSchedule('@monthly').next_after(moment), datetime.datetime(2024, 2, 1, 0, 0))
+        self.assertEqual(CronSchedule('0 0 29 2 *').next_after(moment), datetime.datetime(2024, 2, 29, 0, 0))
+        with self.assertRaises(ValueError):
+            CronSchedule('61 * * * *')
+
+    def test_job_claimed_by_one_node_and_metrics_recorded(self):
+        import datetime
+        from django.utils import timezone
+        from .models import ScheduledJob
+        from .scheduler import claim_due_jobs, run_job
+        past = timezone.now() - datetime.timedelta(minutes=1)
+        ok = ScheduledJob.objects.create(name='ok', command='recount_comments', schedule='@hourly', next_run_at=past)
+        broken = ScheduledJob.objects.create(name='broken', command='no_such_command', schedule='@daily', next_run_at=past)
+
+        claimed = claim_due_jobs('node-a')
+        self.assertEqual(sorted(claimed), sorted([ok.pk, broken.pk]))
+        self.assertEqual(claim_due_jobs('node-b'), [])
+
+        self.assertTrue(run_job(ok.pk, 'node-a'))
+        self.assertFalse(run_job(broken.pk, 'node-a'))
+        ok.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertEqual((ok.last_status, ok.run_count, ok.failure_count, ok.locked_by), ('success', 1, 0, ''))
+        self.assertGreater(ok.next_run_at, timezone.now())
+        self.assertEqual((broken.last_status, broken.failure_count), ('failed', 1))
+        self.assertIn('no_such_command', broken.last_error)
+        self.assertEqual(claim_due_jobs('node-b'), [])
+
+    def test_lease_renewed_while_job_runs(self):
+        import datetime
+        import time
+        from unittest import mock
+        from django.utils import timezone
+        from . import scheduler
+        from .models import ScheduledJob
+        past = timezone.now() - datetime.timedelta(minutes=1)
+        job = ScheduledJob.objects.create(name='long', command='recount_comments', schedule='@hourly', next_run_at=past)
+        with self.settings(SCHEDULER_LEASE_SECONDS=0.15):
+            self.assertEqual(scheduler.claim_due_jobs('node-a'), [job.pk])
+            with mock.patch.object(scheduler, 'renew_lease', return_value=True) as renew, \
+                    mock.patch.object(scheduler, 'call_command', side_effect=lambda *a, **kw: time.sleep(0.4)):
+                self.assertTrue(scheduler.run_job(job.pk, 'node-a'))
+        self.assertGreaterEqual(renew.call_count, 2)
+        renew.assert_called_with(job.pk, 'node-a')
+        # после завершения аренда снята и больше не продлевается
+        calls = renew.call_count
+        time.sleep(0.1)
+        self.assertEqual(renew.call_count, calls)
+
+    def test_renew_lease_only_for_owner(self):
+        import datetime
+        from django.utils import timezone
+        from .models import ScheduledJob
+        from .scheduler import claim_due_jobs, renew_lease
+        past = timezone.now() - datetime.timedelta(minutes=1)
+        job = ScheduledJob.objects.create(name='job', command='recount_comments', schedule='@hourly', next_run_at=past)
+        claim_due_jobs('node-a', now=past)
+        job.refresh_from_db()
+        claimed_until = job.locked_until
+        self.assertFalse(renew_lease(job.pk, 'node-b'))
+        self.assertTrue(renew_lease(job.pk, 'node-a'))
+        job.refresh_from_db()
+        self.assertGreater(job.locked_until, claimed_until)
+
+    def test_stale_request_reminder(self):
+        import datetime
+        from io import StringIO
+        from django.core import mail
+        from django.core.management import call_command
+        from django.utils import timezone
+        agent = User.objects.create_user(username='agent', email='agent@example.com', password='testpass123')
+        old = Request.objects.create(title='Старая', description='D', assignee=agent)
+        Request.objects.filter(pk=old.pk).update(status_changed_at=timezone.now() - datetime.timedelta(days=2))
+        Request.objects.create(title='Свежая', description='D', assignee=agent)
+        mail.outbox = []
+        call_command('remind_stale_requests', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['agent@example.com'])
+        self.assertIn('Старая', mail.outbox[0].body)
+        self.assertNotIn('Свежая', mail.outbox[0].body)
+
+
+class RequestArchiveTest(TestCase):
+    def setUp(self):
+        import datetime
+        from django.contrib.auth.models import Permission
+        from django.utils import timezone
+        self.staff = User.objects.create_user(username='archivist', password='testpass123')
+        self.staff.user_permissions.add(Permission.objects.get(codename='change_request'))
+        self.old = Request.objects.create(title='Старая закрытая', description='Принтер починен', created_by=self.staff)
+        Comment.objects.create(request=self.old, user=self.staff, text='Готово')
+        long_ago = timezone.now() - datetime.timedelta(days=400)
+        Request.objects.filter(pk=self.old.pk).update(status='Completed', status_changed_at=long_ago)
+        self.recent = Request.objects.create(title='Свежая', description='D', status='Completed')
+        self.open = Request.objects.create(title='Открытая', description='D')
+        Request.objects.filter(pk=self.open.pk).update(status_changed_at=long_ago)
+
+    def test_archive_and_restore(self):
+        from .archive import archive_requests, restore_request
+        from .models import ArchivedRequest, RequestDailyStat
+        from django.db.models import Sum
+        stats_before = RequestDailyStat.objects.aggregate(total=Sum('count'))['total']
+
+        self.assertEqual(archive_requests(older_than_days=180, batch_size=1), 1)
+        self.assertFalse(Request.objects.filter(pk=self.old.pk).exists())
+        archived = ArchivedRequest.objects.get(pk=self.old.pk)
+        self.assertEqual(archived.comments.get().text, 'Готово')
+        self.assertEqual(RequestDailyStat.objects.aggregate(total=Sum('count'))['total'], stats_before)
+
+        restored = restore_request(self.old.pk)
+        self.assertEqual(restored.comments.count(), 1)
+        self.assertEqual(restored.status, 'Completed')
+        self.assertFalse(ArchivedRequest.objects.exists())
+
+    def test_archived_request_is_viewable_and_searchable(self):
+        from .archive import archive_requests
+        archive_requests(older_than_days=180)
+        self.client.force_login(User.objects.get(pk=self.staff.pk))
+        response = self.client.get(reverse('knowledgebase:request_detail', args=[self.old.pk]))
+        self.assertContains(response, 'Готово')
+        self.assertContains(response, 'перенесена в архив')
+
+        response = self.client.get(reverse('knowledgebase:requests-page'), {'archived': '1', 'query': 'Принтер'})
+        self.assertEqual([row['id'] for row in response.context['requests']], [self.old.pk])
+
+        response = self.client.post(reverse('knowledgebase:restore-request', args=[self.old.pk]))
+        self.assertRedirects(response, reverse('knowledgebase:request_detail', args=[self.old.pk]))
+        self.assertTrue(Request.objects.filter(pk=self.old.pk).exists())
+
+
+class BulkRequestOperationsTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import Permission
+        self.agent = User.objects.create_user(username='agent', password='testpass123')
+        UserProfile.objects.filter(user=self.agent).update(role='support')
+        self.agent.user_permissions.add(
+            Permission.objects.get(codename='change_request'),
+            Permission.objects.get(codename='delete_request'),
+        )
+        self.author = User.objects.create_user(username='author', password='testpass123', email='author@example.com')
+        self.requests = [
+            Request.objects.create(title=f'Заявка {i}', description='D', created_by=self.author, assignee=self.agent)
+            for i in range(3)
+        ]
+        self.ids = [req.id for req in self.requests]
+
+    def _stat_totals(self):
+        from .models import RequestDailyStat
+        return dict(RequestDailyStat.objects.filter(count__gt=0).values_list('status', 'count'))
+
+    def test_bulk_status_change_is_one_update_with_one_email_per_recipient(self):
+        from django.conf import settings
+        from django.core import mail
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import RequestStatusEvent
+        Request.objects.filter(pk=self.ids[0]).update(status='Completed')
+        self.client.force_login(self.agent)
+        mail.outbox = []
+        with CaptureQueriesContext(connection) as ctx, self.settings(ADMIN_NOTIFICATION_FREQUENCY='immediate'):
+            response = self.client.post(reverse('knowledgebase:request-bulk-api'), {
+                'action': 'status', 'ids': self.ids + [999999], 'status': 'Completed',
+            }, content_type='application/json')
+
+        self.assertEqual([r['result'] for r in response.json()['results']], ['unchanged', 'updated', 'updated', 'not_found'])
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "knowledgebase_request"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(RequestStatusEvent.objects.count(), 2)
+        self.assertEqual(set(Request.objects.values_list('status', flat=True)), {'Completed'})
+        self.assertIsNotNone(Request.objects.get(pk=self.ids[1]).first_response_at)
+        self.assertEqual(UserProfile.objects.get(user=self.agent).open_ticket_count, 1)
+
+        recipients = sorted(message.to[0] for message in mail.outbox)
+        self.assertEqual(recipients, sorted(['author@example.com', settings.ADMIN_EMAIL]))
+        self.assertIn('Заявка 1', mail.outbox[0].body)
+        self.assertIn('Заявка 2', mail.outbox[0].body)
+
+    def test_bulk_delete_from_page_keeps_counters_consistent(self):
+        Comment.objects.create(request=self.requests[0], user=self.author, text='Комментарий')
+        self.client.force_login(self.agent)
+        response = self.client.post(reverse('knowledgebase:requests-bulk'), {'action': 'delete', 'ids': self.ids[:2]})
+        self.assertRedirects(response, reverse('knowledgebase:requests-page'))
+        self.assertEqual(list(Request.objects.values_list('id', flat=True)), [self.ids[2]])
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(self._stat_totals(), {'New': 1})
+        self.assertEqual(UserProfile.objects.get(user=self.agent).open_ticket_count, 1)
+
+    def test_bulk_actions_require_permission(self):
+        self.client.force_login(self.author)
+        response = self.client.post(reverse('knowledgebase:requests-bulk'), {'action': 'delete', 'ids': self.ids})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(reverse('knowledgebase:request-bulk-api'), {
+            'action': 'delete', 'ids': self.ids,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Request.objects.count(), 3)
+
+
+class NotificationDigestTest(TestCase):
+    def setUp(self):
+        from .models import NotificationPreference
+        self.author = User.objects.create_user(username='author', password='testpass123', email='author@example.com')
+        self.commenter = User.objects.create_user(username='commenter', password='testpass123', email='c@example.com')
+        NotificationPreference.objects.create(user=self.author, frequency='hourly')
+        with self.settings(ADMIN_NOTIFICATION_FREQUENCY='hourly'):
+            self.request = Request.objects.create(title='Не печатает принтер', description='D', created_by=self.author)
+
+    def test_admin_notified_immediately_by_default(self):
+        from django.conf import settings
+        from django.core import mail
+        from .models import NotificationEvent
+        self.assertEqual(settings.ADMIN_NOTIFICATION_FREQUENCY, 'immediate')
+        pending = NotificationEvent.objects.filter(recipient=settings.ADMIN_EMAIL).count()
+        mail.outbox = []
+        Request.objects.create(title='Нет сети', description='D', created_by=self.author)
+        self.assertEqual([message.to for message in mail.outbox], [[settings.ADMIN_EMAIL]])
+        self.assertEqual(NotificationEvent.objects.filter(recipient=settings.ADMIN_EMAIL).count(), pending)
+
+    def test_events_are_collected_and_sent_as_one_digest_per_recipient(self):
+        from django.conf import settings
+        from django.core import mail
+        from .models import NotificationEvent
+        from .notifications import send_digests
+        mail.outbox = []
+        with self.settings(ADMIN_NOTIFICATION_FREQUENCY='daily'):
+            for i in range(3):
+                Comment.objects.create(request=self.request, user=self.commenter, text=f'Ответ {i}')
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(NotificationEvent.objects.filter(recipient='author@example.com').count(), 3)
+
+        # Почасовая сводка: три комментария автору и новая заявка администратору
+        self.assertEqual(send_digests('hourly'), (2, 4))
+        digests = {message.to[0]: message for message in mail.outbox}
+        self.assertEqual(set(digests), {'author@example.com', settings.ADMIN_EMAIL})
+        for i in range(3):
+            self.assertIn(f'Ответ {i}', digests['author@example.com'].body)
+        self.assertEqual(send_digests('hourly'), (0, 0))
+
+        self.assertEqual(send_digests('daily'), (1, 3))
+        self.assertEqual(mail.outbox[-1].to, [settings.ADMIN_EMAIL])
+
+    def test_immediate_preference_sends_right_away(self):
+        from django.core import mail
+        self.client.force_login(self.author)
+        response = self.client.post(reverse('knowledgebase:notification-settings'), {'frequency': 'immediate'})
+        self.assertRedirects(response, reverse('knowledgebase:notification-settings'))
+        mail.outbox = []
+        with self.settings(ADMIN_NOTIFICATION_FREQUENCY='hourly'):
+            Comment.objects.create(request=self.request, user=self.commenter, text='Готово')
+        self.assertEqual([message.to for message in mail.outbox], [['author@example.com']])
+
+
+class ArticleTaggingTest(TestCase):
+    def setUp(self):
+        texts = [
+            ('Настройка принтера', 'Принтер не печатает: проверьте драйвер принтера и очередь печати.'),
+            ('Замена картриджа', 'Картридж принтера меняется после выключения. Драйвер не нужен.'),
+            ('Подключение VPN', 'Для подключения VPN установите клиент и введите пароль от VPN.'),
+            ('Сброс пароля', 'Пароль сбрасывается через портал; клиент получит письмо.'),
+            ('Почта на телефоне', 'Почта настраивается в приложении: укажите сервер почты.'),
+        ]
+        for title, content in texts:
+            Article.objects.create(title=title, content=content)
+
+    def _tags(self, title):
+        return set(Article.objects.get(title=title).tags.values_list('name', flat=True))
+
+    def test_retag_assigns_tfidf_keywords_and_filters_index(self):
+        from .models import Tag
+        from .tagging import retag_articles
+        self.assertEqual(retag_articles(workers=1, chunk_size=2)[0], 5)
+        self.assertIn('драйвер', self._tags('Настройка принтера'))
+        self.assertIn('клиент', self._tags('Подключение VPN'))
+        # Слово из одной статьи тегом не становится
+        self.assertFalse(Tag.objects.filter(name='картридж').exists())
+        self.assertEqual(Tag.objects.get(name='драйвер').article_count, 2)
+
+        response = self.client.get(reverse('knowledgebase:index'), {'tag': 'драйвер'})
+        self.assertEqual(
+            sorted(article.title for article in response.context['articles']),
+            ['Замена картриджа', 'Настройка принтера'],
+        )
+
+    def test_retag_changes_page_validators(self):
+        from .http_cache import article_detail_validators, article_list_validators
+        from .tagging import retag_articles
+        article_id = Article.objects.get(title='Настройка принтера').id
+        list_etag = article_list_validators(None)[0]
+        detail_etag = article_detail_validators(None, article_id)[0]
+        retag_articles(workers=1, chunk_size=2)
+        self.assertNotEqual(article_list_validators(None)[0], list_etag)
+        self.assertNotEqual(article_detail_validators(None, article_id)[0], detail_etag)
+
+    def test_parallel_retag_matches_single_process(self):
+        from .models import ArticleTag
+        from .tagging import retag_articles
+        retag_articles(workers=1, chunk_size=2)
+        single = set(ArticleTag.objects.values_list('article__title', 'tag__name'))
+        retag_articles(workers=2, chunk_size=2)
+        self.assertEqual(set(ArticleTag.objects.values_list('article__title', 'tag__name')), single)
+
+    def test_terms_with_same_slug_share_one_tag(self):
+        from .models import ArticleTag, Tag
+        from .tagging import retag_articles
+        Article.objects.all().delete()
+        for title in ('Модуль __init__', 'Файл init', 'Пакет init', 'Импорт __init__', 'Прочее'):
+            Article.objects.create(title=title, content='текст')
+        retag_articles(workers=1, chunk_size=2)
+        self.assertEqual(list(Tag.objects.filter(slug='init').values_list('article_count', flat=True)), [4])
+        self.assertEqual(ArticleTag.objects.filter(tag__slug='init').count(), 4)
+
+    def test_parallel_chunks_are_submitted_incrementally(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from .tagging import bounded_map
+        read = []
+
+        def chunks():
+            for number in range(20):
+                read.append(number)
+                yield number
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = bounded_map(pool, 3)(lambda number: number * 2, chunks())
+            self.assertEqual(next(results), 0)
+            self.assertLessEqual(len(read), 3)
+            self.assertEqual(list(results), [number * 2 for number in range(1, 20)])
+
+
+class OptimisticConcurrencyTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import Permission
+        self.agent = User.objects.create_user(username='agent', password='testpass123')
+        self.agent.user_permissions.add(
+            Permission.objects.get(codename='change_request'),
+            Permission.objects.get(codename='change_article'),
+        )
+        self.request = Request.objects.create(title='Гонка', description='D')
+        self.article = Article.objects.create(title='Статья', content='Исходный текст')
+        self.client.force_login(self.agent)
+
+    def test_status_change_updates_only_status_columns(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = reverse('knowledgebase:change-request-status', args=[self.request.id])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(f'{url}?version=1', {'status': 'In Progress'})
+        update = next(q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "knowledgebase_request"'))
+        self.assertNotIn('"description"', update)
+        self.assertIn('"version" =', update.split('WHERE')[1])
+        self.request.refresh_from_db()
+        self.assertEqual((self.request.status, self.request.version), ('In Progress', 2))
+
+    def test_stale_status_change_is_rejected(self):
+        from .models import RequestStatusEvent
+        url = reverse('knowledgebase:change-request-status', args=[self.request.id])
+        self.client.post(f'{url}?version=1', {'status': 'In Progress'})
+        response = self.client.post(f'{url}?version=1', {'status': 'Cancelled'}, follow=True)
+        self.assertContains(response, 'уже изменил другой пользователь')
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.status, 'In Progress')
+        self.assertEqual(RequestStatusEvent.objects.count(), 1)
+
+        api = reverse('knowledgebase:request-status-api', args=[self.request.id])
+        response = self.client.post(api, {'status': 'Completed', 'version': 1}, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['current']['version'], 2)
+        response = self.client.post(api, {'status': 'Completed', 'version': 2}, content_type='application/json')
+        self.assertEqual(response.json()['version'], 3)
+
+    def test_concurrent_article_edit_is_detected(self):
+        url = reverse('knowledgebase:article_edit', args=[self.article.id])
+        first = {'title': 'Статья', 'content': 'Правка первого', 'version': 1}
+        second = {'title': 'Статья', 'content': 'Правка второго', 'version': 1}
+        self.assertEqual(self.client.post(url, first).status_code, 302)
+        response = self.client.post(url, second)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.context['form']['version'].value(), 2)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.content, 'Правка первого')
+
+        second['version'] = 2
+        self.assertEqual(self.client.post(url, second).status_code, 302)
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.content, self.article.version), ('Правка второго', 3))
+
+
+class ArticleRevisionTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import Permission
+        self.editor = User.objects.create_user(username='editor', password='testpass123')
+        self.editor.user_permissions.add(Permission.objects.get(codename='change_article'))
+        self.client.force_login(self.editor)
+
+    def test_edits_are_stored_as_small_deltas(self):
+        from . import revisions
+        from .models import ArticleRevision
+        lines = [f'Строка {i}: настройка принтера и сетевого диска в отделе' for i in range(200)]
+        article = Article.objects.create(title='Инструкция', content='\n'.join(lines))
+        texts = [article.content]
+        for edit in range(45):
+            lines[edit * 3] = f'Правка {edit}'
+            article.content = '\n'.join(lines)
+            article.save()
+            texts.append(article.content)
+
+        history = ArticleRevision.objects.filter(article=article)
+        self.assertEqual(history.count(), 46)
+        self.assertEqual(
+            list(history.filter(is_snapshot=True).order_by('number').values_list('number', flat=True)),
+            [1, 21, 41],
+        )
+        delta = history.get(number=2)
+        self.assertLess(len(delta.data) * 10, len(history.get(number=1).data))
+        for number in (1, 2, 20, 21, 33, 46):
+            self.assertEqual(revisions.revision_content(article.id, number), texts[number - 1])
+
+    def test_legacy_article_snapshots_original_on_first_edit(self):
+        from . import revisions
+        from .models import ArticleRevision
+        article = Article.objects.create(title='Старая', content='Первый вариант')
+        ArticleRevision.objects.all().delete()
+        article = Article.objects.get(pk=article.pk)
+        article.content = 'Второй вариант'
+        article.save()
+        self.assertEqual(
+            list(article.revisions.order_by('number').values_list('number', 'is_snapshot')),
+            [(1, True), (2, True)],
+        )
+        self.assertEqual(revisions.revision_content(article.id, 1), 'Первый вариант')
+        self.assertEqual(revisions.revision_content(article.id, 2), 'Второй вариант')
+
+    def test_diff_and_restore_views(self):
+        article = Article.objects.create(title='Сеть', content='Шаг один\nШаг два')
+        self.client.post(reverse('knowledgebase:article_edit', args=[article.id]), {
+            'title': 'Сеть', 'content': 'Шаг один\nШаг три', 'version': article.version,
+        })
+        self.assertEqual(article.revisions.get(number=2).author, self.editor)
+
+        response = self.client.get(reverse('knowledgebase:article_revision_diff', args=[article.id, 2]))
+        self.assertContains(response, 'revision-diff-removed">-Шаг два')
+        self.assertContains(response, 'revision-diff-added">+Шаг три')
+
+        article.refresh_from_db()
+        url = reverse('knowledgebase:article_revision_restore', args=[article.id, 1])
+        self.client.post(url, {'version': article.version})
+        article.refresh_from_db()
+        self.assertEqual(article.content, 'Шаг один\nШаг два')
+        self.assertEqual(article.revisions.count(), 3)
+
+        response = self.client.post(url, {'version': 1}, follow=True)
+        self.assertContains(response, 'уже изменил другой пользователь')
+
+
+class MediaBlobStorageTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.contrib.auth.models import Permission
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = self.settings(MEDIA_ROOT=media.name, MEDIA_BLOB_GRACE_SECONDS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.editor = User.objects.create_user(username='editor', password='testpass123')
+        self.editor.user_permissions.add(
+            Permission.objects.get(codename='change_article'),
+            Permission.objects.get(codename='delete_article'),
+        )
+        self.client.force_login(self.editor)
+
+    def _article(self, title, data, name='manual.pdf'):
+        from django.core.files.base import ContentFile
+        article = Article(title=title, content='Текст')
+        article.video.save(name, ContentFile(data), save=False)
+        article.save()
+        return article
+
+    def test_same_upload_is_stored_once(self):
+        from .media_storage import storage
+        from .models import MediaBlob
+        first = self._article('Первая', b'%PDF-1.4 general manual')
+        second = self._article('Вторая', b'%PDF-1.4 general manual', name='copy.PDF')
+        self.assertTrue(first.video.name.startswith('blobs/'))
+        self.assertTrue(first.video.name.endswith('.pdf'))
+        self.assertEqual(first.video.name, second.video.name)
+        self.assertEqual(MediaBlob.objects.get(name=first.video.name).ref_count, 2)
+
+        first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=second.video.name).ref_count, 1)
+        self.assertTrue(storage.exists(second.video.name))
+
+    def test_orphans_are_removed_on_delete_and_replace(self):
+        from django.core.files.base import ContentFile
+        from .media_storage import storage
+        from .models import MediaBlob
+        with self.captureOnCommitCallbacks(execute=True):
+            article = self._article('Статья', b'old version')
+        old_name = article.video.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            article.video.save('manual.pdf', ContentFile(b'new version'))
+        self.assertFalse(storage.exists(old_name))
+        self.assertFalse(MediaBlob.objects.filter(name=old_name).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('knowledgebase:article_delete', args=[article.id]))
+        self.assertFalse(Article.objects.filter(pk=article.pk).exists())
+        self.assertFalse(MediaBlob.objects.filter(name=article.video.name).exists())
+        self.assertFalse(storage.exists(article.video.name))
+
+    def test_blob_urls_are_immutable(self):
+        article = self._article('Статья', b'%PDF-1.4 cached')
+        response = self.client.get(article.video.url)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 cached')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        response = self.client.get(article.video.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class MetricsEndpointTest(TestCase):
+    def test_request_metrics_and_state_gauges(self):
+        Request.objects.create(title='Принтер', description='Не печатает')
+        UserRegistrationRequest.objects.create(username='newbie', email='newbie@example.com')
+        self.client.get(reverse('knowledgebase:index'))
+
+        with self.settings(DEBUG=True):
+            body = self.client.get('/metrics').content.decode()
+        self.assertIn('http_request_duration_seconds_bucket{le="0.005",method="GET",view="knowledgebase:index"}', body)
+        self.assertRegex(body, r'http_responses_total\{method="GET",status="200",view="knowledgebase:index"\} [1-9]')
+        self.assertIn('db_queries_per_request_count{view="knowledgebase:index"}', body)
+        self.assertIn('requests_by_status{status="New"} 1.0', body)
+        self.assertIn('registration_requests_pending 1.0', body)
+
+    def test_notification_email_results_are_counted(self):
+        from prometheus_client import REGISTRY
+        from . import notifications
+        labels = {'kind': 'immediate', 'result': 'sent'}
+        before = REGISTRY.get_sample_value('notification_emails_total', labels) or 0
+        notifications.notify([('a@example.com', 'Тема', 'Текст'), ('b@example.com', 'Тема', 'Текст')])
+        self.assertEqual(REGISTRY.get_sample_value('notification_emails_total', labels) - before, 2)
+
+    def test_health_checks_and_token(self):
+        self.assertEqual(self.client.get('/healthz').content, b'ok')
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['checks']['database'], 'ok')
+        with self.settings(DEBUG=False, METRICS_TOKEN=''):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with self.settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 200)
+
+    def test_digest_results_are_read_from_events(self):
+        from django.utils import timezone
+        from .models import NotificationEvent
+        NotificationEvent.objects.create(
+            recipient='a@example.com', frequency='hourly', subject='S', message='M', sent_at=timezone.now(),
+        )
+        NotificationEvent.objects.create(recipient='a@example.com', frequency='daily', subject='S', message='M')
+        with self.settings(DEBUG=True):
+            body = self.client.get('/metrics').content.decode()
+        self.assertIn('notification_digest_events_sent_last_day{frequency="hourly"} 1.0', body)
+        self.assertIn('notification_events_pending{frequency="daily"} 1.0', body)
+
+    def test_index_reads_from_replica(self):
+        from unittest import mock
+        from . import db_router
+        with mock.patch.object(db_router, 'choose_replica', return_value=None) as choose:
+            self.client.get(reverse('knowledgebase:index'))
+        self.assertTrue(choose.called)
+        with mock.patch.object(db_router, 'choose_replica', return_value=None) as choose:
+            self.client.get('/healthz')
+            self.client.get('/readyz')
+        self.assertFalse(choose.called)
@@ -0,0 +1,210 @@
+"""
+Ограничение частоты запросов по алгоритму token bucket.
+
+С Redis в качестве кеша состояние корзины — одно число, теоретическое время
+прихода следующего запроса (GCRA, эквивалент token bucket с емкостью N и
+пополнением N токенов за период); проверка и обновление выполняются одним
+Lua-скриптом, поэтому одновременные запросы разных воркеров не проходят
+сверх лимита. С другими кешами — счетчик в окне длиной в период на атомарных
+``cache.add`` + ``cache.incr``. Проверка по IP выполняется первой и не
+обращается к базе (для API — в ``APIThrottleMiddleware``, до сессии и
+аутентификации DRF); проверка по пользователю — после нее. Отклоненные запросы
+считаются по областям (scope) в кеше, см. ``throttle_metrics()``.
+
+Частоты задаются в ``settings.THROTTLE_RATES`` строками вида ``'30/min'``;
+отсутствующая или пустая частота отключает ограничение.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.urls import Resolver404, resolve
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+METRICS_KEY = 'throttle:rejected:{}'
+
+
+def parse_rate(rate):
+    """'30/min' -> (30, 60.0)"""
+    if not rate:
+        return None
+    count, period = rate.split('/')
+    return int(count), float(PERIODS[period])
+
+
+def get_rate(scope):
+    return parse_rate(getattr(settings, 'THROTTLE_RATES', {}).get(scope))
+
+
+def client_ip(request):
+    """IP клиента с учетом THROTTLE_NUM_PROXIES доверенных прокси перед приложением"""
+    num_proxies = getattr(settings, 'THROTTLE_NUM_PROXIES', 0)
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if num_proxies and forwarded:
+        addresses = [address.strip() for address in forwarded.split(',')]
+        return addresses[-min(num_proxies, len(addresses))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+# KEYS[1] — корзина; ARGV — интервал между токенами и допуск (емкость) в секундах.
+# Время берется у Redis, чтобы расхождение часов воркеров не влияло на лимит.
+_GCRA_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local arrival = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now)
+if arrival - now > tolerance then
+    return tostring(arrival - now - tolerance)
+end
+redis.call('SET', KEYS[1], tostring(arrival + interval), 'PX', math.ceil((arrival + interval - now) * 1000) + 1000)
+return '0'
+"""
+
+
+def _redis_cache():
+    """Кеш по умолчанию, если это Redis, иначе None"""
+    from django.core.cache import caches
+    from django.core.cache.backends.redis import RedisCache
+    backend = caches['default']
+    return backend if isinstance(backend, RedisCache) else None
+
+
+def _take_gcra(backend, key, interval, tolerance):
+    client = backend._cache.get_client(write=True)
+    return float(client.eval(_GCRA_SCRIPT, 1, backend.make_and_validate_key(key), interval, tolerance))
+
+
+def _take_window(key, count, period, now):
+    window = int(now // period)
+    window_key = f'{key}:{window}'
+    cache.add(window_key, 0, timeout=math.ceil(period) + 1)
+    if cache.incr(window_key) > count:
+        return (window + 1) * period - now
+    return 0
+
+
+def take(key, rate):
+    """
+    Забирает токен из корзины key. Возвращает 0, если запрос разрешен,
+    иначе число секунд до появления следующего токена.
+    """
+    count, period = rate
+    interval = period / count
+    try:
+        backend = _redis_cache()
+        if backend is not None:
+            return _take_gcra(backend, key, interval, period - interval)
+        return _take_window(key, count, period, time.time())
+    except Exception:
+        # Недоступный кеш не должен блокировать работу приложения
+        return 0
+
+
+def record_rejection(scope):
+    key = METRICS_KEY.format(scope)
+    try:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+    except Exception:
+        pass
+
+
+def throttle_metrics():
+    """Число отклоненных запросов по областям"""
+    scopes = getattr(settings, 'THROTTLE_RATES', {})
+    values = cache.get_many([METRICS_KEY.format(scope) for scope in scopes])
+    return {scope: values.get(METRICS_KEY.format(scope), 0) for scope in scopes}
+
+
+def check_ip(request, scope):
+    rate = get_rate(f'{scope}_ip')
+    if rate is None:
+        return 0
+    wait = take(f'throttle:{scope}_ip:{client_ip(request)}', rate)
+    if wait:
+        record_rejection(f'{scope}_ip')
+    return wait
+
+
+def check_user(request, scope):
+    rate = get_rate(f'{scope}_user')
+    if rate is None or not request.user.is_authenticated:
+        return 0
+    wait = take(f'throttle:{scope}_user:{request.user.pk}', rate)
+    if wait:
+        record_rejection(f'{scope}_user')
+    return wait
+
+
+def throttled_response(request, wait, as_json=False):
+    if as_json or request.headers.get('Accept', '').startswith('application/json'):
+        response = JsonResponse({'detail': 'Слишком много запросов, повторите позже.'}, status=429)
+    else:
+        response = HttpResponse(
+            'Слишком много запросов, повторите позже.',
+            status=429,
+            content_type='text/plain; charset=utf-8',
+        )
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+def throttle(scope, methods=('POST',)):
+    """
+    Декоратор view: ограничивает частоту запросов указанных методов
+    по IP (до любой работы с базой) и по пользователю.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                wait = check_ip(request, scope) or check_user(request, scope)
+                if wait:
+                    return throttled_response(request, wait)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Базовый DRF-троттлинг поверх той же корзины; scope задается в представлении"""
+    check = None
+
+    def allow_request(self, request, view):
+        self.wait_seconds = self.check(request, getattr(view, 'throttle_scope', 'api'))
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class TokenBucketUserThrottle(TokenBucketThrottle):
+    check = staticmethod(check_user)
+
+
+class APIThrottleMiddleware(MiddlewareMixin):
+    """
+    Проверка по IP для DRF-представлений с ``throttle_scope`` до сессии и
+    аутентификации: отклоненный запрос не обращается к базе. Стоит в MIDDLEWARE
+    до SessionMiddleware; проверка по пользователю остается в throttle_classes.
+    """
+
+    def process_request(self, request):
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        scope = getattr(getattr(match.func, 'view_class', None), 'throttle_scope', None)
+        if scope is None:
+            return None
+        wait = check_ip(request, scope)
+        if wait:
+            return throttled_response(request, wait, as_json=True)
+        return None
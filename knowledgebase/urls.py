@@ -27,6 +27,13 @@ urlpatterns = [
     path('article/create/', views.article_create, name='article_create'),
     path('article/edit/<int:article_id>/', views.article_edit, name='article_edit'),
     path('article/delete/<int:article_id>/', views.article_delete, name='article_delete'),
+    path('article/<int:article_id>/revisions/', views.article_revisions, name='article_revisions'),
+    path('article/<int:article_id>/revisions/<int:number>/', views.article_revision_diff, name='article_revision_diff'),
+    path(
+        'article/<int:article_id>/revisions/<int:number>/restore/',
+        views.article_revision_restore,
+        name='article_revision_restore',
+    ),
 
     # Комментарии
     path('comment/delete/<int:comment_id>/', views.comment_delete, name='comment_delete'),
@@ -34,12 +41,27 @@ urlpatterns = [
     # Запросы
     path('requests-page/', views.requests_page_view, name='requests-page'),
     path('requests/', views.optimized_requests_view, name='requests'),
+    path('requests/export/', views.export_requests, name='requests-export'),
+    path('requests/bulk/', views.bulk_request_action, name='requests-bulk'),
     path('requests/<int:request_id>/', views.request_detail, name='request_detail'),
     path('requests/<int:request_id>/change-status/', views.change_request_status, name='change-request-status'),
     path('requests/<int:request_id>/delete/', views.delete_request, name='delete-request'),
     path('requests/<int:request_id>/add-comment/', views.add_comment_to_request, name='add-comment'),
+    path('requests/<int:request_id>/restore/', views.restore_request, name='restore-request'),
+
+    # Уведомления
+    path('notifications/settings/', views.notification_settings, name='notification-settings'),
+
+    # Профили запросов (для сотрудников)
+    path('profiles/', views.request_profiles, name='request-profiles'),
+    path('profiles/<str:profile_id>.<str:kind>', views.request_profile_download, name='request-profile-download'),
 
     # API
     path('api/requests/', views.RequestAPI.as_view(), name='request-api'),
+    path('api/requests/bulk/', views.RequestBulkAPI.as_view(), name='request-bulk-api'),
+    path('api/requests/<int:request_id>/status/', views.RequestStatusAPI.as_view(), name='request-status-api'),
+    path('api/articles/suggest/', views.article_suggestions, name='article-suggest'),
+    path('api/analytics/requests/', views.request_analytics, name='request-analytics'),
+    path('api/analytics/sla/', views.request_sla, name='request-sla'),
 ]
 
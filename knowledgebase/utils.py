@@ -1,5 +1,11 @@
 import re
-from .models import Request
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import Truncator, slugify
+from .concurrency import VersionConflict
+from .models import Request, RequestStatusEvent
 
 
 def auto_classify_request(title, description):
@@ -48,6 +54,35 @@ def auto_assign_request(request_obj):
         return 'admin'
 
 
+OPEN_STATUSES = ('New', 'In Progress')
+
+
+def choose_assignee(request_obj, department_id=None):
+    """
+    Наименее загруженный активный сотрудник роли из auto_assign_request.
+    Сначала ищем в отделе автора, затем среди всех сотрудников роли.
+    Счетчики открытых заявок хранятся в профиле, выбор — один запрос по индексу.
+    """
+    from portal.models import UserProfile
+
+    role = auto_assign_request(request_obj)
+    if department_id is None and request_obj.created_by_id:
+        department_id = (
+            UserProfile.objects.filter(user_id=request_obj.created_by_id)
+            .values_list('department_id', flat=True)
+            .first()
+        )
+    candidates = UserProfile.objects.filter(role=role, user__is_active=True).select_related('user')
+    if request_obj.created_by_id:
+        candidates = candidates.exclude(user_id=request_obj.created_by_id)
+    if department_id:
+        profile = candidates.filter(department_id=department_id).order_by('open_ticket_count', 'id').first()
+        if profile is not None:
+            return profile.user
+    profile = candidates.order_by('open_ticket_count', 'id').first()
+    return profile.user if profile is not None else None
+
+
 def process_email_request(email_subject, email_body, sender_email):
     """
     Обработка заявки, полученной по email
@@ -55,14 +90,137 @@ def process_email_request(email_subject, email_body, sender_email):
     title = email_subject[:255]
     category = auto_classify_request(title, email_body)
     
-    request_obj = Request.objects.create(
+    request_obj = Request(
         title=title,
         description=email_body,
         category=category,
         status='New'
     )
-    
-    auto_assign_request(request_obj)
+    request_obj.assignee = choose_assignee(request_obj)
+    request_obj.save()
     
     return request_obj
 
+
+def filter_requests(queryset, query='', status=''):
+    """
+    Фильтры страницы заявок: поиск по названию/описанию и статус
+    """
+    if query:
+        queryset = queryset.filter(
+            Q(title__icontains=query) | Q(description__icontains=query)
+        )
+    if status:
+        queryset = queryset.filter(status=status)
+    return queryset
+
+
+_URL_ID_PLACEHOLDER = 987654321
+
+
+def _id_url_template(name):
+    """Шаблон URL с {} вместо id: reverse вызывается один раз на страницу, а не на строку"""
+    return reverse(name, args=[_URL_ID_PLACEHOLDER]).replace(str(_URL_ID_PLACEHOLDER), '{}')
+
+
+def request_list_rows(queryset):
+    """
+    Строки списка заявок с заранее вычисленными отображаемыми значениями и URL,
+    чтобы шаблон только подставлял готовые строки.
+    """
+    category_display = dict(Request.CATEGORY_CHOICES)
+    status_display = dict(Request.STATUS_CHOICES)
+    detail_url = _id_url_template('knowledgebase:request_detail')
+    status_url = _id_url_template('knowledgebase:change-request-status')
+    delete_url = _id_url_template('knowledgebase:delete-request')
+    rows = queryset.values_list('id', 'title', 'description', 'category', 'status', 'comment_count', 'version')
+    return [
+        {
+            'id': request_id,
+            'title': title,
+            'description': Truncator(description).words(15),
+            'category': category_display.get(category, category),
+            'status': status_display.get(status, status),
+            'status_class': slugify(status.lower()),
+            'comment_count': comment_count,
+            'detail_url': detail_url.format(request_id),
+            # Версия в URL: смена статуса со страницы, открытой до чужого изменения, будет отклонена
+            'status_url': f'{status_url.format(request_id)}?version={version}',
+            'delete_url': delete_url.format(request_id),
+        }
+        for request_id, title, description, category, status, comment_count, version in rows
+    ]
+
+
+def apply_status_transition(request_obj, new_status, user=None, expected_version=None):
+    """
+    Смена статуса заявки с записью события истории в той же транзакции.
+    Время в предыдущем статусе считается сразу, отчеты не перебирают историю.
+    Обновляются только поля статуса и только если версия заявки не изменилась
+    с момента чтения (или равна expected_version), иначе VersionConflict.
+    Возвращает событие или None, если статус не изменился.
+    """
+    old_status = request_obj.status
+    if new_status == old_status:
+        return None
+
+    now = timezone.now()
+    is_first_response = old_status == 'New' and request_obj.first_response_at is None
+    with transaction.atomic():
+        event = RequestStatusEvent.objects.create(
+            request=request_obj,
+            from_status=old_status,
+            to_status=new_status,
+            category=request_obj.category,
+            changed_by=user if user is not None and user.is_authenticated else None,
+            changed_at=now,
+            seconds_in_previous_status=max(int((now - request_obj.status_changed_at).total_seconds()), 0),
+            seconds_since_created=max(int((now - request_obj.created_at).total_seconds()), 0),
+            is_first_response=is_first_response,
+        )
+        previous = (request_obj.status_changed_at, request_obj.first_response_at)
+        request_obj.status = new_status
+        request_obj.status_changed_at = now
+        if is_first_response:
+            request_obj.first_response_at = now
+        try:
+            request_obj.save_versioned(
+                ['status', 'status_changed_at', 'first_response_at', 'updated_at'],
+                expected_version,
+            )
+        except VersionConflict:
+            request_obj.status = old_status
+            request_obj.status_changed_at, request_obj.first_response_at = previous
+            raise
+    return event
+
+
+def sla_summary(start, end, group_by='category'):
+    """
+    Средние SLA-показатели за период по категориям или сотрудникам:
+    время до первой реакции и время в статусе «В работе» (в секундах)
+    """
+    group_field = {'category': 'category', 'agent': 'changed_by__username'}[group_by]
+    events = RequestStatusEvent.objects.filter(changed_at__gte=start, changed_at__lt=end)
+    first_response = (
+        events.filter(is_first_response=True)
+        .values(group_field)
+        .annotate(avg=Avg('seconds_since_created'), total=Count('id'))
+        .order_by()
+    )
+    in_progress = (
+        events.filter(from_status='In Progress')
+        .values(group_field)
+        .annotate(avg=Avg('seconds_in_previous_status'), total=Count('id'))
+        .order_by()
+    )
+    summary = {}
+    for row in first_response:
+        summary.setdefault(row[group_field] or 'none', {}).update(
+            first_response_avg_seconds=round(row['avg']), first_responses=row['total']
+        )
+    for row in in_progress:
+        summary.setdefault(row[group_field] or 'none', {}).update(
+            in_progress_avg_seconds=round(row['avg']), in_progress_transitions=row['total']
+        )
+    return summary
@@ -1,34 +1,85 @@
+import re
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
 from django.db.models import Q
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Article, Request, Comment
-from .forms import ArticleForm, RequestForm, CommentForm
+from .models import Article, ArchivedRequest, ArticleRevision, Request, Comment, NotificationPreference, Tag
+from .forms import ArticleForm, RequestForm, CommentForm, NotificationPreferenceForm
 from .serializers import RequestSerializer
-from django.http import HttpResponseBadRequest, HttpResponseForbidden
+from .duplicates import find_duplicates
+from .suggestions import suggest_articles
+from .utils import (
+    apply_status_transition,
+    auto_classify_request,
+    choose_assignee,
+    filter_requests,
+    request_list_rows,
+    sla_summary,
+)
+from .export import EXPORT_FORMATS, STREAMERS
+from . import analytics
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotModified,
+    JsonResponse, StreamingHttpResponse,
+)
+from django.utils import timezone
+from django.urls import reverse
 from django.views.decorators.http import require_POST
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from django.views.static import serve
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from django.contrib import messages
+from django.core.exceptions import PermissionDenied
+from django.utils.decorators import method_decorator
+from .concurrency import VersionConflict
+from .db_router import replica_reads
+from . import archive, bulk, media_storage, metrics, profiling, revisions
+from .throttling import TokenBucketUserThrottle, throttle
+from .http_cache import article_detail_validators, article_list_validators, public_conditional
+
+
+TAG_CLOUD_SIZE = 30
+ARTICLE_EDIT_FIELDS = ('title', 'content', 'image', 'video', 'audio')
+
+REQUEST_SORT_OPTIONS = {
+    'activity': '-last_activity_at',
+    'comments': '-comment_count',
+}
 
 
+@replica_reads
+@public_conditional(article_list_validators)
 def index(request):
-    articles = Article.objects.all()
+    articles = Article.objects.prefetch_related('tags')
     query = request.GET.get('query')
     sort_by = request.GET.get('sort_by')
+    tag = request.GET.get('tag')
 
     if query:
         articles = articles.filter(
             Q(title__icontains=query) | Q(content__icontains=query)
         )
 
+    if tag:
+        # Поиск по индексу (tag, article) таблицы связей, без просмотра текста статей
+        articles = articles.filter(article_tags__tag__slug=tag)
+
     if sort_by:
         articles = articles.order_by(sort_by)
 
-    return render(request, 'knowledgebase/index.html', {'articles': articles})
+    return render(request, 'knowledgebase/index.html', {
+        'articles': articles,
+        'tags': Tag.objects.order_by('-article_count', 'name')[:TAG_CLOUD_SIZE],
+        'active_tag': tag,
+    })
 
 
+@throttle('comment')
+@replica_reads
+@public_conditional(article_detail_validators)
 def article_detail(request, article_id):
     article = get_object_or_404(Article, pk=article_id)
     comments = article.comments.select_related('user').all()
@@ -91,33 +142,37 @@ def requests_page_view(request):
         if form.is_valid():
             request_obj = form.save(commit=False)
             request_obj.created_by = request.user
-            from .utils import auto_classify_request
             if not request_obj.category or request_obj.category == 'Uncategorized':
                 request_obj.category = auto_classify_request(
                     request_obj.title, 
                     request_obj.description
                 )
+            duplicates = find_duplicates(request_obj.title, request_obj.description, limit=1)
+            if duplicates:
+                request_obj.duplicate_of = duplicates[0]
+            request_obj.assignee = choose_assignee(request_obj)
             request_obj.save()
             messages.success(request, 'Заявка успешно создана.')
+            if duplicates:
+                messages.warning(
+                    request,
+                    f'Похожая открытая заявка уже существует: #{duplicates[0].id} «{duplicates[0].title}». '
+                    f'Новая заявка связана с ней.'
+                )
             return redirect('knowledgebase:requests-page')
     else:
         form = RequestForm()
 
     query = request.GET.get('query', '')
     status_filter = request.GET.get('status', '')
+    sort = request.GET.get('sort', '')
+    show_archived = request.GET.get('archived') == '1'
     
-    requests = Request.objects.all()
-    
-    if query:
-        requests = requests.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        )
-    
-    if status_filter:
-        requests = requests.filter(status=status_filter)
+    source = ArchivedRequest.objects.all() if show_archived else Request.objects.all()
+    requests = filter_requests(source, query, status_filter)
     
     try:
-        requests = requests.order_by('-created_at')
+        requests = requests.order_by(REQUEST_SORT_OPTIONS.get(sort, '-created_at'))
     except:
         requests = requests.order_by('-id')
     
@@ -126,13 +181,102 @@ def requests_page_view(request):
         'knowledgebase/requests_page.html',
         {
             'form': form, 
-            'requests': requests,
+            'requests': request_list_rows(requests),
             'query': query,
             'status_filter': status_filter,
+            'sort': sort,
+            'show_archived': show_archived,
         },
     )
 
 
+@login_required
+@permission_required('knowledgebase.view_request', raise_exception=True)
+def export_requests(request):
+    """Потоковая выгрузка заявок с фильтрами страницы заявок"""
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки')
+
+    requests = filter_requests(
+        Request.objects.all(),
+        request.GET.get('query', ''),
+        request.GET.get('status', ''),
+    )
+    content_type, extension = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(STREAMERS[export_format](requests), content_type=content_type)
+    filename = f"requests_{timezone.now():%Y%m%d_%H%M%S}.{extension}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+@permission_required('knowledgebase.view_request', raise_exception=True)
+@replica_reads
+def request_analytics(request):
+    """Временные ряды по заявкам из дневной статистики"""
+    import datetime
+
+    today = timezone.localdate()
+    try:
+        end = datetime.date.fromisoformat(request.GET['end']) if request.GET.get('end') else today
+        start = (
+            datetime.date.fromisoformat(request.GET['start']) if request.GET.get('start')
+            else end - datetime.timedelta(days=29)
+        )
+    except ValueError:
+        return HttpResponseBadRequest('Неверный формат даты, ожидается YYYY-MM-DD')
+    if start > end:
+        return HttpResponseBadRequest('Начальная дата позже конечной')
+
+    group_by = request.GET.get('group_by') or None
+    interval = request.GET.get('interval', 'day')
+    if group_by not in (None, *analytics.GROUP_FIELDS) or interval not in analytics.INTERVALS:
+        return HttpResponseBadRequest('Неверные параметры группировки')
+
+    filters = {}
+    for field in ('category', 'status', 'department'):
+        if request.GET.get(field):
+            filters[field] = request.GET[field]
+    if 'department' in filters and not filters['department'].isdigit():
+        return HttpResponseBadRequest('Неверный отдел')
+
+    data = analytics.time_series(start, end, group_by=group_by, interval=interval, filters=filters)
+    data.update({'start': start.isoformat(), 'end': end.isoformat(), 'interval': interval, 'group_by': group_by})
+    return JsonResponse(data)
+
+
+@login_required
+@permission_required('knowledgebase.view_request', raise_exception=True)
+@replica_reads
+def request_sla(request):
+    """SLA-показатели из истории статусов: ?start=&end=&group_by=category|agent"""
+    import datetime
+
+    group_by = request.GET.get('group_by', 'category')
+    if group_by not in ('category', 'agent'):
+        return HttpResponseBadRequest('Неверные параметры группировки')
+    today = timezone.localdate()
+    try:
+        end = datetime.date.fromisoformat(request.GET['end']) if request.GET.get('end') else today
+        start = (
+            datetime.date.fromisoformat(request.GET['start']) if request.GET.get('start')
+            else end - datetime.timedelta(days=29)
+        )
+    except ValueError:
+        return HttpResponseBadRequest('Неверный формат даты, ожидается YYYY-MM-DD')
+
+    tz = timezone.get_current_timezone()
+    start_dt = timezone.make_aware(datetime.datetime.combine(start, datetime.time.min), tz)
+    end_dt = timezone.make_aware(datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min), tz)
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'group_by': group_by,
+        'results': sla_summary(start_dt, end_dt, group_by=group_by),
+    })
+
+
 @login_required
 def optimized_requests_view(request):
     # Optimize query by prefetching related comments
@@ -140,6 +284,12 @@ def optimized_requests_view(request):
     return render(request, 'knowledgebase/requests.html', {'requests': requests})
 
 
+def _expected_version(request):
+    """Версия записи, с которой работал пользователь (поле формы или параметр URL)"""
+    value = request.POST.get('version') or request.GET.get('version')
+    return int(value) if value and value.isdigit() else None
+
+
 @require_POST
 @permission_required('knowledgebase.change_request', raise_exception=True)
 @login_required
@@ -151,12 +301,21 @@ def change_request_status(request, request_id):
     # Проверяем, что статус валидный
     valid_statuses = ['New', 'In Progress', 'Completed', 'Cancelled']
     if new_status in valid_statuses:
-        req.status = new_status
-        req.save()
-        
-        from .signals import send_request_status_notification
-        user_email = req.created_by.email if req.created_by and req.created_by.email else None
-        send_request_status_notification(req, old_status, req.status, user_email=user_email)
+        try:
+            event = apply_status_transition(req, new_status, request.user, _expected_version(request))
+        except VersionConflict as conflict:
+            current = conflict.current()
+            messages.error(
+                request,
+                f'Заявку «{req.title}» уже изменил другой пользователь'
+                + (f' (текущий статус: «{current.get_status_display()}»)' if current else '')
+                + '. Обновите страницу и повторите действие.'
+            )
+            return redirect('knowledgebase:requests-page')
+        if event:
+            from .signals import send_request_status_notification
+            user_email = req.created_by.email if req.created_by and req.created_by.email else None
+            send_request_status_notification(req, old_status, req.status, user_email=user_email)
         
         status_display = req.get_status_display()
         messages.success(request, f'Статус заявки изменен на "{status_display}".')
@@ -176,6 +335,64 @@ def delete_request(request, request_id):
     return redirect('knowledgebase:requests-page')
 
 
+BULK_ACTION_PERMISSIONS = {
+    'status': 'knowledgebase.change_request',
+    'delete': 'knowledgebase.delete_request',
+}
+
+
+def _run_bulk_action(user, action, ids, new_status=None):
+    """
+    Общая часть веб- и API-версии массовых операций.
+    Возвращает исходы по каждому id; ValueError — некорректные данные,
+    PermissionDenied — нет права на действие.
+    """
+    if action not in BULK_ACTION_PERMISSIONS:
+        raise ValueError('Неизвестное действие')
+    if not user.has_perm(BULK_ACTION_PERMISSIONS[action]):
+        raise PermissionDenied
+    ids = bulk.parse_ids(ids)
+    if action == 'delete':
+        return bulk.bulk_delete(ids)
+    outcomes, changed = bulk.bulk_change_status(ids, new_status, user)
+    if changed:
+        from .signals import send_bulk_status_notification
+        send_bulk_status_notification(changed, new_status)
+    return outcomes
+
+
+@login_required
+@require_POST
+def bulk_request_action(request):
+    """Массовая смена статуса или удаление отмеченных на странице заявок"""
+    try:
+        outcomes = _run_bulk_action(
+            request.user,
+            request.POST.get('action'),
+            request.POST.getlist('ids'),
+            request.POST.get('status'),
+        )
+    except PermissionDenied:
+        return HttpResponseForbidden('Недостаточно прав')
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect('knowledgebase:requests-page')
+
+    counts = {}
+    for outcome in outcomes:
+        counts[outcome['result']] = counts.get(outcome['result'], 0) + 1
+    if counts.get(bulk.DELETED):
+        messages.success(request, f'Удалено заявок: {counts[bulk.DELETED]}.')
+    if counts.get(bulk.UPDATED):
+        messages.success(request, f'Статус изменен у заявок: {counts[bulk.UPDATED]}.')
+    if counts.get(bulk.UNCHANGED):
+        messages.info(request, f'Уже были в этом статусе: {counts[bulk.UNCHANGED]}.')
+    if counts.get(bulk.NOT_FOUND):
+        messages.warning(request, f'Не найдено заявок: {counts[bulk.NOT_FOUND]}.')
+    return redirect('knowledgebase:requests-page')
+
+
+@throttle('comment')
 @login_required
 @require_POST
 def add_comment_to_request(request, request_id):
@@ -212,7 +429,10 @@ class RequestAPI(APIView):
     - POST: только авторизованным пользователям
     """
     permission_classes = [IsAuthenticatedOrReadOnly]
+    throttle_classes = [TokenBucketUserThrottle]
+    throttle_scope = 'request_api'
 
+    @method_decorator(replica_reads)
     def get(self, request):
         requests_qs = Request.objects.all()
         serializer = RequestSerializer(requests_qs, many=True)
@@ -221,14 +441,91 @@ class RequestAPI(APIView):
     def post(self, request):
         serializer = RequestSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(created_by=request.user)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            duplicates = find_duplicates(
+                serializer.validated_data['title'],
+                serializer.validated_data['description'],
+            )
+            candidate = Request(created_by=request.user, **serializer.validated_data)
+            serializer.save(
+                created_by=request.user,
+                duplicate_of=duplicates[0] if duplicates else None,
+                assignee=choose_assignee(candidate),
+            )
+            data = dict(serializer.data)
+            data['possible_duplicates'] = [
+                {'id': dup.id, 'title': dup.title, 'similarity': round(dup.similarity, 2)}
+                for dup in duplicates
+            ]
+            return Response(data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class RequestStatusAPI(APIView):
+    """
+    Смена статуса одной заявки с проверкой версии.
+    POST {"status": "Completed", "version": 3}; при несовпадении версии — 409
+    с актуальным состоянием заявки.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketUserThrottle]
+    throttle_scope = 'request_api'
+
+    def post(self, request, request_id):
+        if not request.user.has_perm('knowledgebase.change_request'):
+            raise PermissionDenied
+        req = get_object_or_404(Request, id=request_id)
+        new_status = request.data.get('status')
+        if new_status not in dict(Request.STATUS_CHOICES):
+            return Response({'detail': 'Неверный статус'}, status=status.HTTP_400_BAD_REQUEST)
+        old_status = req.status
+        try:
+            event = apply_status_transition(req, new_status, request.user, request.data.get('version'))
+        except (TypeError, ValueError):
+            return Response({'detail': 'Версия должна быть числом'}, status=status.HTTP_400_BAD_REQUEST)
+        except VersionConflict as conflict:
+            current = conflict.current()
+            return Response({
+                'detail': 'Заявка изменена другим пользователем',
+                'current': RequestSerializer(current).data if current else None,
+            }, status=status.HTTP_409_CONFLICT)
+        if event:
+            from .signals import send_request_status_notification
+            send_request_status_notification(req, old_status, req.status)
+        return Response(RequestSerializer(req).data, status=status.HTTP_200_OK)
+
+
+class RequestBulkAPI(APIView):
+    """
+    Массовые операции над заявками.
+    POST {"action": "status", "ids": [...], "status": "Completed"} или
+    POST {"action": "delete", "ids": [...]}; ответ — исход по каждому id.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketUserThrottle]
+    throttle_scope = 'request_api'
+
+    def post(self, request):
+        ids = request.data.get('ids')
+        if not isinstance(ids, list):
+            return Response({'detail': 'Поле ids должно быть списком'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            outcomes = _run_bulk_action(request.user, request.data.get('action'), ids, request.data.get('status'))
+        except (TypeError, ValueError) as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': outcomes}, status=status.HTTP_200_OK)
+
+
+@throttle('comment')
 @login_required
 def request_detail(request, request_id):
-    req = get_object_or_404(Request, id=request_id)
+    req = Request.objects.filter(id=request_id).first()
+    if req is None:
+        archived = get_object_or_404(ArchivedRequest, id=request_id)
+        return render(request, 'knowledgebase/request_detail.html', {
+            'req': archived,
+            'comments': archived.comments.select_related('user').all(),
+            'archived': True,
+        })
     comments = req.comments.select_related('user').all()
 
     if request.method == 'POST':
@@ -266,6 +563,16 @@ def request_detail(request, request_id):
     })
 
 
+@login_required
+@permission_required('knowledgebase.change_request', raise_exception=True)
+@require_POST
+def restore_request(request, request_id):
+    get_object_or_404(ArchivedRequest, id=request_id)
+    archive.restore_request(request_id)
+    messages.success(request, 'Заявка восстановлена из архива.')
+    return redirect('knowledgebase:request_detail', request_id=request_id)
+
+
 @login_required
 @permission_required('knowledgebase.change_article', raise_exception=True)
 def article_edit(request, article_id):
@@ -275,9 +582,36 @@ def article_edit(request, article_id):
         form = ArticleForm(request.POST, request.FILES, instance=article)
         if form.is_valid():
             article = form.save(commit=False)
+            update_fields = [name for name in form.changed_data if name in ARTICLE_EDIT_FIELDS]
             if not article.author:
                 article.author = request.user
-            article.save()
+                update_fields.append('author')
+            article._edited_by = request.user
+            try:
+                if update_fields:
+                    article.save_versioned([*update_fields, 'updated_at'], form.cleaned_data['version'])
+            except VersionConflict as conflict:
+                current = conflict.current()
+                if current is None:
+                    messages.error(request, 'Статья была удалена другим пользователем.')
+                    return redirect('knowledgebase:index')
+                # Правки пользователя остаются в форме; повторное сохранение
+                # осознанно перезапишет текущую версию
+                data = request.POST.copy()
+                data['version'] = current.version
+                form = ArticleForm(data, request.FILES, instance=current)
+                form.is_valid()
+                form.add_error(None, (
+                    'Статью уже изменил другой пользователь '
+                    f'({timezone.localtime(current.updated_at):%d.%m.%Y %H:%M}). '
+                    'Проверьте изменения и сохраните еще раз, чтобы перезаписать их.'
+                ))
+                return render(
+                    request,
+                    'knowledgebase/article_form.html',
+                    {'form': form, 'article': current},
+                    status=409,
+                )
             messages.success(request, 'Статья успешно обновлена.')
             return redirect('knowledgebase:article_detail', article_id=article.id)
     else:
@@ -290,6 +624,60 @@ def article_edit(request, article_id):
     )
 
 
+@login_required
+@permission_required('knowledgebase.change_article', raise_exception=True)
+def article_revisions(request, article_id):
+    article = get_object_or_404(Article, id=article_id)
+    history = article.revisions.select_related('author').defer('data')
+    return render(request, 'knowledgebase/article_revisions.html', {
+        'article': article,
+        'revisions': history,
+    })
+
+
+@login_required
+@permission_required('knowledgebase.change_article', raise_exception=True)
+def article_revision_diff(request, article_id, number):
+    article = get_object_or_404(Article, id=article_id)
+    revision = get_object_or_404(ArticleRevision.objects.defer('data'), article=article, number=number)
+    try:
+        against = int(request.GET['against']) if request.GET.get('against') else None
+    except ValueError:
+        return HttpResponseBadRequest('Неверный номер ревизии')
+    if against is not None and not article.revisions.filter(number=against).exists():
+        raise Http404('Ревизия не найдена')
+
+    diff = revisions.revision_diff(article.id, number, against)
+    lines = [
+        {'text': line, 'kind': line[:1] if line[:1] in '+-@' and not line.startswith(('+++', '---')) else ''}
+        for line in diff
+    ]
+    return render(request, 'knowledgebase/article_revision_diff.html', {
+        'article': article,
+        'revision': revision,
+        'against': number - 1 if against is None else against,
+        'lines': lines,
+    })
+
+
+@login_required
+@permission_required('knowledgebase.change_article', raise_exception=True)
+@require_POST
+def article_revision_restore(request, article_id, number):
+    article = get_object_or_404(Article, id=article_id)
+    revision = get_object_or_404(ArticleRevision.objects.defer('data'), article=article, number=number)
+    article.title = revision.title
+    article.content = revisions.revision_content(article.id, number)
+    article._edited_by = request.user
+    try:
+        article.save_versioned(['title', 'content', 'updated_at'], _expected_version(request))
+    except VersionConflict:
+        messages.error(request, 'Статью уже изменил другой пользователь. Проверьте историю и повторите восстановление.')
+        return redirect('knowledgebase:article_revisions', article_id=article.id)
+    messages.success(request, f'Статья восстановлена из ревизии #{number}.')
+    return redirect('knowledgebase:article_detail', article_id=article.id)
+
+
 @login_required
 @require_POST
 def comment_delete(request, comment_id):
@@ -329,5 +717,105 @@ def article_delete(request, article_id):
     return redirect('knowledgebase:index')
 
 
+@login_required
+def request_profiles(request):
+    """Последние профили запросов: view, число SQL-запросов и длительность"""
+    if not request.user.is_staff:
+        return HttpResponseForbidden('Недостаточно прав')
+    return render(request, 'knowledgebase/request_profiles.html', {
+        'profiles': profiling.recent_profiles(limit=100),
+        'profiling_enabled': settings.REQUEST_PROFILING_ENABLED,
+    })
+
+
+@login_required
+def request_profile_download(request, profile_id, kind):
+    if not request.user.is_staff:
+        return HttpResponseForbidden('Недостаточно прав')
+    if kind not in profiling.PROFILE_KINDS or not re.fullmatch(r'[\w-]+', profile_id):
+        raise Http404
+    path = profiling.profile_dir() / f'{profile_id}.{kind}'
+    if not path.is_file():
+        raise Http404
+    return FileResponse(
+        path.open('rb'),
+        as_attachment=True,
+        filename=path.name,
+        content_type=profiling.PROFILE_KINDS[kind],
+    )
+
+
+@replica_reads
+def article_suggestions(request):
+    """Подсказки статей по мере ввода названия заявки"""
+    results = [
+        {
+            'id': item['id'],
+            'title': item['title'],
+            'url': reverse('knowledgebase:article_detail', args=[item['id']]),
+        }
+        for item in suggest_articles(request.GET.get('q', ''))
+    ]
+    return JsonResponse({'results': results})
+
+
 def home_view(request):
     return render(request, 'knowledgebase/home.html')
+
+
+@login_required
+def notification_settings(request):
+    """Выбор частоты уведомлений: сразу или сводкой раз в час/день"""
+    preference = NotificationPreference.objects.filter(user=request.user).first() or NotificationPreference(user=request.user)
+    if request.method == 'POST':
+        form = NotificationPreferenceForm(request.POST, instance=preference)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Настройки уведомлений сохранены.')
+            return redirect('knowledgebase:notification-settings')
+    else:
+        form = NotificationPreferenceForm(instance=preference)
+    return render(request, 'knowledgebase/notification_settings.html', {'form': form})
+
+
+def media_blob(request, path):
+    """Файл медиа по хешу содержимого: содержимое по URL не меняется, кешируется на год"""
+    etag = '"%s"' % path.rsplit('/', 1)[-1].split('.', 1)[0]
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = serve(request, path, document_root=media_storage.storage.path(media_storage.BLOB_DIR))
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return HttpResponseForbidden('Недостаточно прав')
+    elif not settings.DEBUG:
+        # Без токена метрики (очереди, задачи, объемы заявок) в продакшене не отдаются
+        return HttpResponseForbidden('Недостаточно прав')
+    body, content_type = metrics.render()
+    return HttpResponse(body, content_type=content_type)
+
+
+def healthz(request):
+    """Процесс жив и обрабатывает запросы (без обращения к базе)"""
+    return HttpResponse('ok', content_type='text/plain')
+
+
+def readyz(request):
+    """Готовность принимать трафик: база доступна; состояние кеша — для информации"""
+    checks = metrics.readiness()
+    ready = checks['database'] is None
+    return JsonResponse(
+        {
+            'status': 'ok' if ready else 'unavailable',
+            'checks': {name: error or 'ok' for name, error in checks.items()},
+        },
+        status=200 if ready else 503,
+    )
@@ -1,4 +1,4 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 from .models import UserProfile, Department, UserRegistrationRequest
@@ -13,7 +13,7 @@ class DepartmentAdmin(admin.ModelAdmin):
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'role', 'department', 'position', 'phone', 'created_at')
+    list_display = ('user', 'role', 'department', 'position', 'phone', 'open_ticket_count', 'created_at')
     list_filter = ('role', 'department', 'created_at')
     search_fields = ('user__username', 'user__email', 'phone', 'position')
     readonly_fields = ('created_at', 'updated_at')
@@ -53,33 +53,16 @@ class UserRegistrationRequestAdmin(admin.ModelAdmin):
     actions = ['approve_registrations', 'reject_registrations']
 
     def approve_registrations(self, request, queryset):
-        from django.contrib.auth.models import User
-        from django.utils import timezone
-        
-        for reg_request in queryset.filter(status='pending'):
-            user = User.objects.create_user(
-                username=reg_request.username,
-                email=reg_request.email,
-                first_name=reg_request.first_name,
-                last_name=reg_request.last_name,
-                is_active=True
-            )
-            
-            UserProfile.objects.create(
-                user=user,
-                role=reg_request.requested_role,
-                department=reg_request.department,
-                phone=reg_request.phone,
-                position=reg_request.position
+        from .registration import approve_registrations
+
+        approved, rejected = approve_registrations(queryset, request.user)
+        self.message_user(request, f"Одобрено запросов: {len(approved)}")
+        if rejected:
+            self.message_user(
+                request,
+                f"Отклонено из-за существующих пользователей: {len(rejected)}",
+                level=messages.WARNING,
             )
-            
-            reg_request.status = 'approved'
-            reg_request.reviewed_by = request.user
-            reg_request.reviewed_at = timezone.now()
-            reg_request.save()
-            
-        
-        self.message_user(request, f"Одобрено запросов: {queryset.filter(status='pending').count()}")
     approve_registrations.short_description = "Одобрить выбранные запросы"
 
     def reject_registrations(self, request, queryset):
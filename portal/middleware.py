@@ -0,0 +1,19 @@
+from django.contrib.auth.middleware import get_user
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from .profiles import get_profile
+
+
+def _user_with_profile(request):
+    user = get_user(request)
+    if user.is_authenticated:
+        get_profile(user)
+    return user
+
+
+class UserProfileMiddleware(MiddlewareMixin):
+    """Прикрепляет закешированный профиль к request.user при первом обращении"""
+
+    def process_request(self, request):
+        request.user = SimpleLazyObject(lambda: _user_with_profile(request))
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-19 13:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0002_userregistrationrequest_password_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='open_ticket_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Открытых назначенных заявок'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['role', 'department', 'open_ticket_count'], name='portal_user_role_1f38bd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['role', 'open_ticket_count'], name='portal_user_role_8681c9_idx'),
+        ),
+    ]
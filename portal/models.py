@@ -50,16 +50,53 @@ class UserProfile(models.Model):
     )
     phone = models.CharField(max_length=20, blank=True, verbose_name='Телефон')
     position = models.CharField(max_length=100, blank=True, verbose_name='Должность')
+    open_ticket_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Открытых назначенных заявок'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = 'Профиль пользователя'
         verbose_name_plural = 'Профили пользователей'
+        indexes = [
+            # Выбор наименее загруженного сотрудника роли/отдела — поиск по индексу
+            models.Index(fields=['role', 'department', 'open_ticket_count']),
+            models.Index(fields=['role', 'open_ticket_count']),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.get_role_display()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Существующий профиль пишется только измененными полями, без изменений — не пишется
+        if self.pk and not args and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            if getattr(self, '_loaded_values', None) is not None:
+                changed = self.changed_fields()
+                if not changed:
+                    return
+                kwargs['update_fields'] = [*changed, 'updated_at']
+        super().save(*args, **kwargs)
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+
+    def changed_fields(self):
+        """Поля, измененные с момента загрузки или последнего сохранения"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return [field.name for field in self._meta.concrete_fields if not field.primary_key]
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in loaded and getattr(self, field.attname) != loaded[field.attname]
+        ]
+
     @property
     def is_admin(self):
         return self.role == 'admin' or self.user.is_superuser
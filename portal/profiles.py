@@ -0,0 +1,61 @@
+"""
+Профиль и роль пользователя с кешированием.
+
+Профиль создается только через ``ensure_profile``. ``get_profile`` читает его
+из кеша (ключ включает дату регистрации, чтобы повторно использованный id не
+получил чужой профиль) и прикрепляет к объекту пользователя, так что
+``user.profile`` в представлениях и шаблонах не делает запросов. Кеш
+сбрасывается сигналами при сохранении и удалении профиля.
+
+Счетчик ``open_ticket_count`` меняется через ``update()`` без сигналов, поэтому
+в закешированном профиле он может быть устаревшим — для назначения заявок
+он читается из базы.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserProfile
+
+
+PROFILE_CACHE_KEY = 'portal:profile:{}:{}'
+
+
+def _cache_key(user_id, date_joined):
+    return PROFILE_CACHE_KEY.format(user_id, int(date_joined.timestamp()) if date_joined else 0)
+
+
+def ensure_profile(user, **defaults):
+    """Единственное место создания профиля"""
+    profile, _ = UserProfile.objects.get_or_create(user=user, defaults=defaults)
+    return profile
+
+
+def attach_profile(user, profile):
+    """Кладет профиль в кеш связи user.profile и user в кеш profile.user"""
+    UserProfile._meta.get_field('user').remote_field.set_cached_value(user, profile)
+    profile.user = user
+    return user
+
+
+def get_profile(user):
+    if UserProfile._meta.get_field('user').remote_field.is_cached(user):
+        return user.profile
+    key = _cache_key(user.pk, user.date_joined)
+    profile = cache.get(key)
+    if profile is None:
+        profile = UserProfile.objects.select_related('department').filter(user=user).first()
+        if profile is None:
+            profile = ensure_profile(user)
+        cache.set(key, profile, getattr(settings, 'PROFILE_CACHE_TIMEOUT', 300))
+    attach_profile(user, profile)
+    return profile
+
+
+def get_role(user):
+    if not user.is_authenticated:
+        return None
+    return get_profile(user).role
+
+
+def invalidate_profile(user):
+    cache.delete(_cache_key(user.pk, user.date_joined))
@@ -0,0 +1,149 @@
+"""
+Пакетное одобрение запросов на регистрацию.
+
+Пароли хешируются в пуле процессов (PBKDF2 нагружает CPU), пользователи и профили
+создаются через bulk_create в одной транзакции — сигналы post_save при этом
+не вызываются, поэтому профили не создаются и не пересохраняются повторно.
+Письма отправляются в фоновом потоке после фиксации транзакции.
+"""
+import secrets
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UserProfile, UserRegistrationRequest
+
+
+# Меньше этого числа паролей пул процессов не окупает свой запуск
+PARALLEL_HASH_THRESHOLD = 8
+
+_email_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='registration-email')
+
+
+def hash_passwords(passwords):
+    """Хеширует пароли, при большом объеме — параллельно в пуле процессов"""
+    if len(passwords) < PARALLEL_HASH_THRESHOLD:
+        return [make_password(password) for password in passwords]
+    workers = getattr(settings, 'REGISTRATION_HASH_WORKERS', None)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(make_password, passwords, chunksize=4))
+
+
+def send_approval_emails(approved):
+    """Одно письмо каждому пользователю, все письма через одно SMTP-соединение"""
+    messages = []
+    for username, email, password_message in approved:
+        if not email:
+            continue
+        messages.append(EmailMessage(
+            subject='Ваш запрос на регистрацию одобрен',
+            body=f'Ваш запрос на регистрацию одобрен администратором.\n\n'
+                 f'Ваш логин: {username}\n'
+                 f'Пароль: {password_message}\n\n'
+                 f'Пожалуйста, войдите в систему по ссылке ниже.\n\n'
+                 f'Ссылка для входа: {settings.BASE_URL}/accounts/login/\n\n'
+                 f'После входа вы сможете изменить пароль в личном кабинете.',
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[email],
+        ))
+    if not messages:
+        return 0
+    try:
+        return get_connection(fail_silently=True).send_messages(messages) or 0
+    except Exception:
+        import traceback
+        print(f"Ошибка отправки email при пакетном одобрении: {traceback.format_exc()}")
+        return 0
+
+
+def approve_registrations(queryset, reviewer):
+    """
+    Одобряет ожидающие запросы из queryset.
+    Возвращает (одобренные, отклоненные) списки запросов на регистрацию.
+    """
+    pending = list(queryset.filter(status='pending'))
+    if not pending:
+        return [], []
+
+    now = timezone.now()
+    taken_usernames = set(
+        User.objects.filter(username__in=[reg.username for reg in pending]).values_list('username', flat=True)
+    )
+    taken_emails = set(
+        User.objects.filter(email__in=[reg.email for reg in pending if reg.email]).values_list('email', flat=True)
+    )
+
+    approved, rejected = [], []
+    for reg_request in pending:
+        if reg_request.username in taken_usernames:
+            reg_request.rejection_reason = f'Пользователь с именем "{reg_request.username}" уже существует в системе.'
+        elif reg_request.email and reg_request.email in taken_emails:
+            reg_request.rejection_reason = f'Пользователь с email "{reg_request.email}" уже существует в системе.'
+        else:
+            approved.append(reg_request)
+            taken_usernames.add(reg_request.username)
+            if reg_request.email:
+                taken_emails.add(reg_request.email)
+            continue
+        reg_request.status = 'rejected'
+        reg_request.reviewed_by = reviewer
+        reg_request.reviewed_at = now
+        rejected.append(reg_request)
+
+    raw_passwords = [reg.password_hash or secrets.token_urlsafe(12) for reg in approved]
+    hashed_passwords = hash_passwords(raw_passwords)
+
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(
+                username=reg.username,
+                email=reg.email,
+                first_name=reg.first_name,
+                last_name=reg.last_name,
+                password=hashed,
+                is_active=True,
+                is_staff=reg.requested_role in ['admin', 'moderator'],
+                date_joined=now,
+            )
+            for reg, hashed in zip(approved, hashed_passwords)
+        ])
+        if not all(user.pk for user in users):
+            # СУБД без RETURNING для массовой вставки
+            ids = dict(User.objects.filter(username__in=[u.username for u in users]).values_list('username', 'id'))
+            for user in users:
+                user.pk = ids[user.username]
+        UserProfile.objects.bulk_create([
+            UserProfile(
+                user=user,
+                role=reg.requested_role,
+                department_id=reg.department_id,
+                phone=reg.phone,
+                position=reg.position,
+            )
+            for reg, user in zip(approved, users)
+        ])
+        for reg_request in approved:
+            reg_request.status = 'approved'
+            reg_request.reviewed_by = reviewer
+            reg_request.reviewed_at = now
+        UserRegistrationRequest.objects.bulk_update(
+            approved + rejected,
+            ['status', 'reviewed_by', 'reviewed_at', 'rejection_reason'],
+        )
+
+        emails = [
+            (
+                reg.username,
+                reg.email,
+                'пароль, указанный при регистрации' if reg.password_hash else raw_password,
+            )
+            for reg, raw_password in zip(approved, raw_passwords)
+        ]
+        transaction.on_commit(lambda: _email_executor.submit(send_approval_emails, emails))
+
+    return approved, rejected
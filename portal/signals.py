@@ -1,25 +1,35 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from .models import UserProfile
+from .profiles import ensure_profile, invalidate_profile
 
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     """Автоматически создаем профиль при создании пользователя"""
     if created:
-        UserProfile.objects.get_or_create(user=instance)
+        ensure_profile(instance)
 
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    """Сохраняем профиль при сохранении пользователя"""
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
-
-
-
-
-
-
-
+    """
+    Сохраняем профиль вместе с пользователем, только если поля профиля изменились.
+    Обновление last_login при входе и прочие сохранения пользователя профиль не трогают.
+    """
+    if not UserProfile._meta.get_field('user').remote_field.is_cached(instance):
+        return
+    profile = instance.profile
+    if profile.pk is not None:
+        profile.save()
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    try:
+        user = instance.user
+    except User.DoesNotExist:
+        return
+    invalidate_profile(user)
@@ -1,3 +1,93 @@
 from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core import mail
 
+from .models import UserProfile, UserRegistrationRequest
+from . import registration
 
+
+class BulkRegistrationApprovalTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass123')
+        for i in range(3):
+            UserRegistrationRequest.objects.create(
+                username=f'newuser{i}',
+                email=f'newuser{i}@example.com',
+                requested_role='support' if i else 'moderator',
+                password_hash='StrongPass123!',
+            )
+        User.objects.create_user(username='taken', email='taken@example.com')
+        UserRegistrationRequest.objects.create(username='taken', email='other@example.com')
+
+    def test_approves_in_bulk_and_rejects_conflicts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            approved, rejected = registration.approve_registrations(
+                UserRegistrationRequest.objects.all(), self.admin
+            )
+        registration._email_executor.submit(lambda: None).result()
+
+        self.assertEqual(len(approved), 3)
+        self.assertEqual([reg.username for reg in rejected], ['taken'])
+        user = User.objects.get(username='newuser0')
+        self.assertTrue(user.check_password('StrongPass123!'))
+        self.assertTrue(user.is_staff)
+        self.assertEqual(UserProfile.objects.get(user__username='newuser1').role, 'support')
+        self.assertEqual(
+            UserRegistrationRequest.objects.filter(status='approved', reviewed_by=self.admin).count(), 3
+        )
+        self.assertEqual(UserRegistrationRequest.objects.get(username='taken').status, 'rejected')
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f'newuser{i}@example.com' for i in range(3)])
+
+
+class CachedProfileTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='worker', password='testpass123')
+        profile = UserProfile.objects.get(user=self.user)
+        profile.role = 'support'
+        profile.save()
+
+    def _profile_queries(self, queries):
+        return [q['sql'] for q in queries if 'portal_userprofile' in q['sql']]
+
+    def test_login_does_not_write_profile(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.client.login(username='worker', password='testpass123'))
+        self.assertEqual(self._profile_queries(queries), [])
+        # Устаревший объект пользователя не затирает роль при входе
+        self.client.force_login(self.user)
+        self.assertEqual(UserProfile.objects.get(user=self.user).role, 'support')
+
+    def test_dashboard_reads_profile_from_cache(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.urls import reverse
+        self.client.force_login(self.user)
+        self.client.get(reverse('portal:dashboard'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('portal:dashboard'))
+        self.assertTemplateUsed(response, 'portal/dashboard_support.html')
+        self.assertEqual(self._profile_queries(queries), [])
+
+        profile = UserProfile.objects.get(user=self.user)
+        profile.role = 'moderator'
+        profile.save()
+        response = self.client.get(reverse('portal:dashboard'))
+        self.assertTemplateUsed(response, 'portal/dashboard_moderator.html')
+
+    def test_unchanged_profile_is_not_saved(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        profile = UserProfile.objects.get(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            profile.save()
+        self.assertEqual(len(queries), 0)
+        profile.phone = '123'
+        with CaptureQueriesContext(connection) as queries:
+            profile.save()
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('open_ticket_count', updates[0])
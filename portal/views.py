@@ -9,6 +9,7 @@ from django.contrib.auth.models import User
 from django.db.models import Count, Q
 from django.db import IntegrityError
 from .models import UserProfile, UserRegistrationRequest, Department
+from .profiles import ensure_profile, get_profile
 from .forms import (
     UserRegistrationRequestForm, 
     UserProfileForm, 
@@ -28,7 +29,7 @@ def portal_home(request):
 @login_required
 def dashboard(request):
     """Личный кабинет в зависимости от роли"""
-    profile, created = UserProfile.objects.get_or_create(user=request.user)
+    profile = get_profile(request.user)
     
     context = {
         'profile': profile,
@@ -39,14 +40,14 @@ def dashboard(request):
     if profile.role == 'user':
         context['my_requests'] = Request.objects.filter(
             created_by=request.user
-        )[:5]
+        ).order_by('-created_at')[:5]
         context['my_requests_count'] = Request.objects.filter(created_by=request.user).count()
         context['my_comments'] = Comment.objects.filter(user=request.user)[:5]
         return render(request, 'portal/dashboard_user.html', context)
     
     # Статистика для модератора
     elif profile.role == 'moderator':
-        context['pending_requests'] = Request.objects.filter(status='New')[:10]
+        context['pending_requests'] = Request.objects.filter(status='New').order_by('-created_at')[:10]
         context['pending_registrations'] = UserRegistrationRequest.objects.filter(status='pending')[:5]
         context['total_requests'] = Request.objects.count()
         context['total_articles'] = Article.objects.count()
@@ -66,10 +67,11 @@ def dashboard(request):
     elif profile.role == 'support':
         context['active_requests'] = Request.objects.filter(
             Q(status='New') | Q(status='In Progress')
-        )[:10]
+        ).order_by('-created_at')[:10]
         context['my_assigned_requests'] = Request.objects.filter(
+            assignee=request.user,
             status__in=['New', 'In Progress']
-        )[:10]
+        ).order_by('-created_at')[:10]
         return render(request, 'portal/dashboard_support.html', context)
     
     # По умолчанию - обычный пользователь
@@ -122,7 +124,7 @@ def register_success(request):
 @login_required
 def profile_view(request):
     """Просмотр и редактирование профиля пользователя"""
-    profile, created = UserProfile.objects.get_or_create(user=request.user)
+    profile = get_profile(request.user)
     
     if request.method == 'POST':
         form = UserProfileForm(request.POST, instance=profile, user=request.user)
@@ -260,7 +262,7 @@ def approve_registration(request, request_id):
             )
             return redirect('portal:registration_requests')
         
-        profile, created = UserProfile.objects.get_or_create(user=user)
+        profile = ensure_profile(user)
         profile.role = reg_request.requested_role
         profile.department = reg_request.department
         profile.phone = reg_request.phone